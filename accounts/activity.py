@@ -0,0 +1,176 @@
+"""
+كاتب سجل النشاط المؤجل
+Buffered, asynchronous writer for ActivityLog
+
+السجلات تُضاف إلى طابور محدود في الذاكرة ويكتبها خيط خلفي واحد بعبارات
+bulk_create عند بلوغ حجم الدفعة أو مرور الفترة الزمنية، وعند إيقاف العملية.
+- خيط كتابة واحد يحفظ ترتيب السجلات (ومنها ترتيب سجلات كل مستخدم)
+- عند امتلاء الطابور ينتظر المستدعي مهلة قصيرة (ضغط عكسي) ثم يُسقط السجل ويُحتسب
+- الإحصائيات (المضاف، المكتوب، المُسقط، الفاشل) متاحة عبر stats()
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class PendingActivity(NamedTuple):
+    user_id: int
+    action: str
+    details: str
+    ip_address: Optional[str]
+    created_at: datetime
+
+
+class ActivityLogBuffer:
+    """طابور سجلات النشاط مع خيط كتابة خلفي"""
+
+    def __init__(self, max_size: int = 10000, flush_size: int = 200,
+                 flush_interval: float = 2.0, block_timeout: float = 0.05):
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    @classmethod
+    def from_settings(cls) -> 'ActivityLogBuffer':
+        return cls(
+            max_size=getattr(settings, 'ACTIVITY_LOG_BUFFER_SIZE', 10000),
+            flush_size=getattr(settings, 'ACTIVITY_LOG_FLUSH_SIZE', 200),
+            flush_interval=getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 2.0),
+        )
+
+    def _bump(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            data = {key: self._stats[key] for key in ('enqueued', 'flushed', 'dropped', 'failed', 'batches')}
+        data['pending'] = self._queue.qsize()
+        return data
+
+    # ==================== Producer ====================
+
+    def log(self, user_id: int, action: str, details: str = '', ip_address: Optional[str] = None,
+            created_at: Optional[datetime] = None) -> bool:
+        """إضافة سجل. يعيد False إذا أُسقط لامتلاء الطابور"""
+        entry = PendingActivity(user_id, action, details, ip_address, created_at or timezone.now())
+        if self._closed:
+            # بعد الإيقاف (atexit) لا يوجد خيط كتابة
+            self._write([entry])
+            return True
+
+        self._ensure_started()
+        try:
+            self._queue.put(entry, timeout=self.block_timeout)
+        except queue.Full:
+            self._bump('dropped')
+            dropped = self.stats()['dropped']
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Activity log buffer full ({self.max_size}); dropped {dropped} entries so far")
+            return False
+        self._bump('enqueued')
+        return True
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                atexit.register(self.close)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='activity-log', daemon=True)
+                self._thread.start()
+
+    # ==================== Writer ====================
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+            else:
+                connections.close_all()
+        connections.close_all()
+
+    def _collect(self) -> List[PendingActivity]:
+        """انتظار أول سجل ثم التجميع حتى حجم الدفعة أو انقضاء الفترة"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[PendingActivity]):
+        from .models import ActivityLog
+
+        try:
+            ActivityLog.objects.bulk_create([
+                ActivityLog(
+                    user_id=entry.user_id,
+                    action=entry.action,
+                    details=entry.details,
+                    ip_address=entry.ip_address,
+                    created_at=entry.created_at,
+                )
+                for entry in batch
+            ], batch_size=self.flush_size)
+        except Exception as e:
+            self._bump('failed', len(batch))
+            logger.exception(f"Failed to write {len(batch)} activity log entries: {e}")
+            return
+        self._bump('flushed', len(batch))
+        self._bump('batches')
+
+    def drain(self):
+        """كتابة ما تبقى في الطابور من الخيط الحالي"""
+        while True:
+            batch = []
+            while len(batch) < self.flush_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout: float = 10.0):
+        """إيقاف خيط الكتابة بعد دفعته الحالية ثم كتابة الباقي (عند إيقاف العامل)"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._closed = True
+        self.drain()
+        stats = self.stats()
+        if stats['enqueued'] or stats['dropped']:
+            logger.info(
+                f"Activity log buffer closed: flushed={stats['flushed']} dropped={stats['dropped']} "
+                f"failed={stats['failed']} batches={stats['batches']}"
+            )
+
+
+activity_log = ActivityLogBuffer.from_settings()
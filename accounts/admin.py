@@ -153,11 +153,20 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def mark_as_read(self, request, queryset):
         queryset.update(is_read=True)
+        self._invalidate_counters(queryset)
     mark_as_read.short_description = _('تحديد كمقروء')
     
     def mark_as_unread(self, request, queryset):
         queryset.update(is_read=False)
+        self._invalidate_counters(queryset)
     mark_as_unread.short_description = _('تحديد كغير مقروء')
+    
+    def _invalidate_counters(self, queryset):
+        from dashboard.counters import UserCounters
+        UserCounters.invalidate(
+            queryset.values_list('user_id', flat=True).distinct(),
+            UserCounters.NOTIFICATIONS, UserCounters.RECENT_NOTIFICATIONS
+        )
 
 
 @admin.register(ActivityLog)
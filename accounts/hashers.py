@@ -0,0 +1,18 @@
+"""
+مُجزّئ كلمات المرور لأول دخول
+Cheap PBKDF2 variant for bulk-provisioned accounts, upgraded on first login
+
+الحسابات المستوردة بكلمات مرور مولّدة تُجزّأ بعدد تكرارات أقل. هذا المُجزّئ
+مدرج في PASSWORD_HASHERS بعد المُجزّئ المفضل، فعند أول دخول ناجح يعيد Django
+تجزئة كلمة المرور بالمُجزّئ المفضل تلقائياً (check_password -> setter).
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class FirstLoginPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    algorithm = 'pbkdf2_sha256_first_login'
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PROVISIONING_FAST_HASH_ITERATIONS', 10000)
@@ -0,0 +1,94 @@
+"""
+أمر إدارة: قياس سرعة تجهيز الحسابات بالجملة (حساب/ثانية)
+Management Command: Benchmark bulk account provisioning throughput
+
+يقيس التجزئة المتسلسلة مقابل مجمع العمليات، بالمُجزّئ المفضل ومُجزّئ أول الدخول،
+مع إدراج الحسابات بـ bulk_create داخل معاملة يُتراجع عنها (لا يبقى أثر في القاعدة).
+
+Usage:
+    python manage.py benchmark_provisioning
+    python manage.py benchmark_provisioning --count 2000 --workers 8
+    python manage.py benchmark_provisioning --no-insert
+"""
+import os
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.provisioning import PasswordHashPool
+from dashboard.importer import generate_password
+
+
+class Command(BaseCommand):
+    help = 'قياس عدد الحسابات المجهزة في الثانية (تجزئة كلمات المرور + الإدراج بالجملة)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=500,
+            help='عدد الحسابات في كل قياس (افتراضي: 500)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='عدد عمليات مجمع التجزئة (افتراضي: عدد الأنوية)'
+        )
+        parser.add_argument(
+            '--no-insert',
+            action='store_true',
+            help='قياس التجزئة فقط دون الإدراج'
+        )
+    
+    def handle(self, *args, **options):
+        count = options['count']
+        workers = options['workers']
+        self.stdout.write(f'الحسابات: {count}  الأنوية: {os.cpu_count()}  عمليات المجمع: {workers}')
+        
+        results = []
+        for label, pool_workers, fast in (
+            ('serial', 1, False),
+            ('pool', workers, False),
+            ('serial + fast-first-login', 1, True),
+            ('pool + fast-first-login', workers, True),
+        ):
+            if pool_workers > 1 and workers < 2:
+                continue
+            pool = PasswordHashPool(workers=pool_workers, min_parallel=0)
+            try:
+                # تشغيل تمهيدي لبدء العمليات خارج القياس
+                pool.hash_many([generate_password()] * pool_workers * 2, fast=fast)
+                elapsed = self.run_once(pool, count, fast, insert=not options['no_insert'])
+            finally:
+                pool.shutdown()
+            rate = count / elapsed if elapsed else 0
+            results.append((label, elapsed, rate))
+            self.stdout.write(f'  {label:<28} {elapsed:8.2f}s  {rate:10.1f} حساب/ثانية')
+        
+        baseline = results[0][2]
+        best = max(results, key=lambda result: result[2])
+        if baseline:
+            self.stdout.write(
+                self.style.SUCCESS(f'الأسرع: {best[0]} ({best[2] / baseline:.1f}x مقارنة بالتسلسلي)')
+            )
+    
+    def run_once(self, pool, count, fast, insert=True):
+        User = get_user_model()
+        tag = uuid.uuid4().hex[:8]
+        passwords = [generate_password() for _ in range(count)]
+        
+        started = time.perf_counter()
+        hashes = pool.hash_many(passwords, fast=fast)
+        if insert:
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(username=f'bench_{tag}_{i}', email=f'bench_{tag}_{i}@example.com',
+                         password=encoded, user_type='student')
+                    for i, encoded in enumerate(hashes)
+                ], batch_size=500)
+                transaction.set_rollback(True)
+        return time.perf_counter() - started
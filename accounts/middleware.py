@@ -0,0 +1,18 @@
+"""
+Middleware for accounts
+وسيط الحسابات
+"""
+from .outbox import outbox
+
+
+class NotificationOutboxMiddleware:
+    """
+    تجميع الإشعارات الداخلية الناتجة عن الطلب وكتابتها دفعة واحدة في نهايته
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with outbox.batch():
+            return self.get_response(request)
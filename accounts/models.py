@@ -4,6 +4,7 @@ User Models for Tartil
 """
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -209,7 +210,8 @@ class ActivityLog(models.Model):
     action = models.CharField(_('الإجراء'), max_length=200)
     details = models.TextField(_('التفاصيل'), blank=True)
     ip_address = models.GenericIPAddressField(_('عنوان IP'), null=True, blank=True)
-    created_at = models.DateTimeField(_('التاريخ'), auto_now_add=True)
+    # وقت الحدث نفسه، لا وقت كتابة الدفعة (accounts.activity)
+    created_at = models.DateTimeField(_('التاريخ'), default=timezone.now, editable=False)
 
     class Meta:
         verbose_name = _('سجل نشاط')
@@ -0,0 +1,203 @@
+"""
+صندوق صادر للإشعارات الداخلية
+Deferred, batched writer for in-app notifications
+
+الإشارات تضيف الإشعار كصف خفيف (tuple) بدلاً من إنشائه فوراً:
+- داخل معاملة: يُكتب بعد نجاح المعاملة (transaction.on_commit)، ويُهمل عند التراجع
+- داخل نطاق batch() (كل طلب HTTP عبر NotificationOutboxMiddleware): تُجمع الإشعارات
+  وتُكتب بعبارة bulk_create واحدة عند نهاية النطاق
+- مع تفعيل الكاتب الخلفي: تُسلم الدفعة لخيط خلفي فلا تؤثر الكتابة على زمن الطلب
+"""
+import atexit
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from typing import List, NamedTuple
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class PendingNotification(NamedTuple):
+    user_id: int
+    notification_type: str
+    title: str
+    message: str
+    link: str = ''
+
+
+class _CommitHook:
+    """دفعة إشعارات مرتبطة بمستوى معاملة (أو نقطة حفظ) واحد"""
+
+    def __init__(self, outbox: 'NotificationOutbox', level: tuple):
+        self.outbox = outbox
+        self.level = level
+        self.items: List[PendingNotification] = []
+
+    def __call__(self):
+        hooks = self.outbox._state().hooks
+        if hooks.get(self.level) is self:
+            del hooks[self.level]
+        self.outbox._dispatch(self.items)
+
+
+class BackgroundFlusher:
+    """خيط خلفي يكتب دفعات الإشعارات المتراكمة بعبارات bulk_create"""
+
+    def __init__(self, batch_size: int = 500, interval: float = 1.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, items: List[PendingNotification]):
+        self._ensure_started()
+        self._queue.put(items)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                atexit.register(self.drain)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='notification-outbox', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                items = list(self._queue.get(timeout=self.interval))
+            except queue.Empty:
+                connections.close_all()
+                continue
+            self._write(items)
+
+    def _write(self, items: List[PendingNotification]):
+        # تجميع ما تراكم في الطابور حتى حجم الدفعة
+        while len(items) < self.batch_size:
+            try:
+                items.extend(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            write_notifications(items, self.batch_size)
+        except Exception as e:
+            logger.exception(f"Failed to write {len(items)} queued notifications: {e}")
+
+    def drain(self):
+        """كتابة كل ما تبقى في الطابور (عند إيقاف العملية)"""
+        items = []
+        while True:
+            try:
+                items.extend(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if items:
+            self._write(items)
+
+
+def write_notifications(items: List[PendingNotification], batch_size: int = 500):
+    """إنشاء الإشعارات بعبارة bulk_create واحدة وتحديث العدادات ونشرها للبث الحي"""
+    from dashboard.counters import UserCounters
+    from dashboard.live import ACCOUNTS, hub, notification_event
+    from .models import Notification
+
+    created = Notification.objects.bulk_create([
+        Notification(
+            user_id=item.user_id,
+            notification_type=item.notification_type,
+            title=item.title,
+            message=item.message,
+            link=item.link,
+        )
+        for item in items
+    ], batch_size=batch_size)
+
+    # bulk_create لا يرسل post_save، لذا تُحدّث العدادات ويُنشر البث هنا
+    UserCounters.invalidate(
+        {item.user_id for item in items}, UserCounters.NOTIFICATIONS, UserCounters.RECENT_NOTIFICATIONS
+    )
+    hub.publish_on_commit(
+        (notification.user_id, notification_event(ACCOUNTS, notification)) for notification in created
+    )
+
+
+class NotificationOutbox:
+    """الصندوق الصادر: حالته محلية لكل خيط (طلب)"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._flusher = None
+
+    @property
+    def background_enabled(self) -> bool:
+        return getattr(settings, 'NOTIFICATION_OUTBOX_BACKGROUND', False)
+
+    def _state(self):
+        local = self._local
+        if not hasattr(local, 'hooks'):
+            local.hooks = {}
+            local.scopes = []
+        return local
+
+    def enqueue(self, user_id: int, notification_type: str, title: str, message: str, link: str = ''):
+        item = PendingNotification(user_id, notification_type, title, message, link)
+        state = self._state()
+        if not connection.in_atomic_block:
+            # خطافات المعاملات المتراجع عنها لم تعد مسجلة
+            state.hooks.clear()
+            self._dispatch([item])
+            return
+
+        # خطاف واحد لكل مستوى نقطة حفظ: التراجع عن نقطة الحفظ يسقط خطافها مع إشعاراتها
+        level = tuple(connection.savepoint_ids)
+        hook = state.hooks.get(level)
+        if hook is None or not any(func is hook for _, func, _ in connection.run_on_commit):
+            hook = state.hooks[level] = _CommitHook(self, level)
+            transaction.on_commit(hook)
+        hook.items.append(item)
+
+    def _dispatch(self, items: List[PendingNotification], background: bool = None):
+        """تسليم إشعارات ملتزمة: إلى النطاق الحالي، أو الكاتب الخلفي، أو الكتابة مباشرة"""
+        if not items:
+            return
+        if background is None:
+            background = self.background_enabled
+        state = self._state()
+        if state.scopes:
+            state.scopes[-1].extend(items)
+        elif background:
+            self.flusher.submit(items)
+        else:
+            write_notifications(items)
+
+    @property
+    def flusher(self) -> BackgroundFlusher:
+        if self._flusher is None:
+            self._flusher = BackgroundFlusher(
+                batch_size=getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 500),
+            )
+        return self._flusher
+
+    @contextmanager
+    def batch(self, background: bool = None):
+        """
+        تجميع الإشعارات الملتزمة داخل النطاق وكتابتها دفعة واحدة عند الخروج
+
+        background=True يسلم الدفعة للكاتب الخلفي (مناسب للعمليات الجماعية مثل الاستيراد).
+        """
+        state = self._state()
+        buffer: List[PendingNotification] = []
+        state.scopes.append(buffer)
+        try:
+            yield
+        finally:
+            # ما وصل للنطاق ملتزم فعلاً، فيُكتب حتى لو انتهى النطاق باستثناء
+            state.scopes.pop()
+            self._dispatch(buffer, background)
+
+
+outbox = NotificationOutbox()
@@ -0,0 +1,127 @@
+"""
+تجهيز الحسابات بالجملة
+Parallel password hashing for bulk account provisioning
+
+تجزئة PBKDF2 (مئات آلاف التكرارات) هي الكلفة الغالبة عند إنشاء آلاف الحسابات،
+وهي عمل معالج خالص لا يتوازى في الخيوط (GIL). لذلك تُوزع كلمات المرور على مجمع
+عمليات بعدد الأنوية (PASSWORD_HASH_WORKERS) ثم تُدرج الحسابات بـ bulk_create.
+- القوائم الصغيرة تُجزأ في العملية الحالية (بدء العمليات أغلى منها)
+- مع PROVISIONING_FAST_HASHER تُجزأ بمُجزّئ أول الدخول الأرخص (accounts.hashers)
+  ويرقّيها Django إلى المُجزّئ المفضل عند أول دخول ناجح
+- العمليات تبدأ بـ forkserver (أو spawn) لا fork: العملية الأم فيها خيوط (عامل الويب،
+  كتّاب الخلفية) وfork منها قد يورث أقفالاً محجوزة فتتوقف العملية الناتجة
+- عند تعذر المجمع (بيئة لا تسمح بالعمليات) يُرجع إلى التجزئة المتسلسلة
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+FAST_HASHER_ALGORITHM = 'pbkdf2_sha256_first_login'
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _hash_chunk(algorithm: str, passwords: Sequence[str]) -> List[str]:
+    hasher = get_hasher(algorithm)
+    return [hasher.encode(password, hasher.salt()) for password in passwords]
+
+
+class PasswordHashPool:
+    """مجمع عمليات كسول لتجزئة كلمات المرور"""
+
+    def __init__(self, workers: Optional[int] = None, min_parallel: int = 64, chunk_size: int = 32):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_parallel = min_parallel
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._atexit_registered = False
+
+    @classmethod
+    def from_settings(cls) -> 'PasswordHashPool':
+        return cls(
+            workers=getattr(settings, 'PASSWORD_HASH_WORKERS', None),
+            min_parallel=getattr(settings, 'PASSWORD_HASH_MIN_PARALLEL', 64),
+        )
+
+    def algorithm(self, fast: Optional[bool] = None) -> str:
+        if fast is None:
+            fast = getattr(settings, 'PROVISIONING_FAST_HASHER', False)
+        return FAST_HASHER_ALGORITHM if fast else 'default'
+
+    @staticmethod
+    def _mp_context():
+        """سياق بدء آمن من عملية متعددة الخيوط (forkserver، أو spawn حيث لا يتوفر)"""
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        return multiprocessing.get_context(method)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=self._mp_context(), initializer=_init_worker
+                )
+                if not self._atexit_registered:
+                    atexit.register(self.shutdown)
+                    self._atexit_registered = True
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def hash_many(self, passwords: Sequence[str], fast: Optional[bool] = None) -> List[str]:
+        """تجزئة قائمة كلمات مرور مع الحفاظ على ترتيبها"""
+        algorithm = self.algorithm(fast)
+        if self.workers < 2 or len(passwords) < self.min_parallel:
+            return _hash_chunk(algorithm, passwords)
+
+        chunks = [passwords[i:i + self.chunk_size] for i in range(0, len(passwords), self.chunk_size)]
+        try:
+            executor = self._get_executor()
+            results = executor.map(_hash_chunk, [algorithm] * len(chunks), chunks)
+            return [encoded for chunk in results for encoded in chunk]
+        except Exception as e:
+            # مجمع معطوب (عملية عاملة انتهت) يُعاد إنشاؤه في الاستدعاء التالي
+            logger.warning(f"Password hash pool failed, hashing serially: {e}")
+            self.shutdown()
+            return _hash_chunk(algorithm, passwords)
+
+
+password_hash_pool = PasswordHashPool.from_settings()
+
+
+def hash_passwords(passwords: Sequence[str], fast: Optional[bool] = None) -> List[str]:
+    return password_hash_pool.hash_many(list(passwords), fast=fast)
+
+
+def bulk_create_users(users: list, passwords: Sequence[str], fast: Optional[bool] = None,
+                      batch_size: int = 500) -> list:
+    """
+    تجزئة كلمات المرور بالتوازي ثم إدراج المستخدمين بـ bulk_create
+
+    bulk_create لا يرسل post_save؛ على المستدعي تحديث ما تعتمد عليه الإشارات.
+    """
+    User = get_user_model()
+    for user, encoded in zip(users, hash_passwords(passwords, fast=fast)):
+        user.password = encoded
+    with transaction.atomic():
+        return User.objects.bulk_create(users, batch_size=batch_size)
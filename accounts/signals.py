@@ -2,10 +2,13 @@
 Signals for automatic notifications
 الإشارات لإنشاء الإشعارات التلقائية
 """
+from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 from .utils import (
+    activity_event_enabled,
+    log_activity,
     notify_recitation_recorded,
     notify_attendance_recorded,
     notify_badge_earned,
@@ -25,6 +28,8 @@ def on_recitation_saved(sender, instance, created, **kwargs):
     """
     if created:
         notify_recitation_recorded(instance)
+        if activity_event_enabled('recitation'):
+            log_activity(instance.student_id, 'تسجيل تسميع', instance.surah_start.name_arabic)
 
 
 @receiver(post_save, sender='halaqat.Attendance')
@@ -34,6 +39,8 @@ def on_attendance_saved(sender, instance, created, **kwargs):
     """
     if created:
         notify_attendance_recorded(instance)
+        if activity_event_enabled('attendance'):
+            log_activity(instance.student_id, 'حضور جلسة', instance.get_status_display())
 
 
 @receiver(post_save, sender='gamification.StudentBadge')
@@ -108,3 +115,18 @@ def on_memorization_progress_saved(sender, instance, created, **kwargs):
             pass
     elif created and instance.is_memorized:
         notify_memorization_progress_completed(instance)
+
+
+@receiver(user_logged_in)
+def on_user_logged_in(sender, request, user, **kwargs):
+    """
+    تسجيل الدخول في سجل النشاط (كتابة مؤجلة، عند تفعيل الحدث login)
+    """
+    if activity_event_enabled('login'):
+        log_activity(user, 'تسجيل الدخول', request=request)
+
+
+@receiver(user_logged_out)
+def on_user_logged_out(sender, request, user, **kwargs):
+    if user is not None and activity_event_enabled('logout'):
+        log_activity(user, 'تسجيل الخروج', request=request)
@@ -8,19 +8,19 @@ from django.utils import timezone
 
 def create_notification(user, notification_type, title, message, link=''):
     """
-    إنشاء إشعار جديد للمستخدم
+    إضافة إشعار للمستخدم إلى الصندوق الصادر (يُكتب بعد نجاح المعاملة ضمن دفعة)
     
     Args:
-        user: المستخدم المستهدف
+        user: المستخدم المستهدف أو معرّفه
         notification_type: نوع الإشعار (session, grade, badge, system, reminder)
         title: عنوان الإشعار
         message: نص الإشعار
         link: رابط اختياري
     """
-    from .models import Notification
+    from .outbox import outbox
     
-    return Notification.objects.create(
-        user=user,
+    outbox.enqueue(
+        user_id=getattr(user, 'pk', user),
         notification_type=notification_type,
         title=title,
         message=message,
@@ -28,11 +28,53 @@ def create_notification(user, notification_type, title, message, link=''):
     )
 
 
+def log_activity(user, action, details='', request=None, ip_address=None):
+    """
+    تسجيل نشاط للمستخدم عبر الكاتب المؤجل (accounts.activity)
+    
+    السجل يُضاف بعد نجاح المعاملة الحالية (transaction.on_commit) ويُهمل عند التراجع،
+    بوقت الاستدعاء لا وقت الكتابة.
+    
+    Args:
+        user: المستخدم أو معرّفه
+        action: الإجراء
+        details: تفاصيل اختيارية
+        request: الطلب الحالي لاستخراج عنوان IP
+        ip_address: عنوان IP صريح
+    """
+    from django.conf import settings
+    from django.db import transaction
+    from .activity import activity_log
+    from .models import ActivityLog
+    
+    if ip_address is None and request is not None:
+        ip_address = request.META.get('REMOTE_ADDR') or None
+    user_id = getattr(user, 'pk', user)
+    created_at = timezone.now()
+    
+    if getattr(settings, 'ACTIVITY_LOG_BUFFERED', True):
+        transaction.on_commit(lambda: activity_log.log(user_id, action, details, ip_address, created_at))
+    else:
+        transaction.on_commit(lambda: ActivityLog.objects.create(
+            user_id=user_id, action=action, details=details, ip_address=ip_address, created_at=created_at
+        ))
+
+
+def activity_event_enabled(event):
+    """
+    هل التسجيل التلقائي مفعّل لهذا الحدث (login, logout, recitation, attendance)
+    
+    معطّل افتراضياً: كل حدث مفعّل يضيف كتابة على قاعدة البيانات (ACTIVITY_LOG_EVENTS)
+    """
+    from django.conf import settings
+    
+    return event in getattr(settings, 'ACTIVITY_LOG_EVENTS', ())
+
+
 def notify_recitation_recorded(recitation_record):
     """
     إشعار الطالب عند تسجيل تسميع جديد
     """
-    student = recitation_record.student
     surah = recitation_record.surah_start.name_arabic
     grade = recitation_record.grade
     
@@ -40,7 +82,7 @@ def notify_recitation_recorded(recitation_record):
     message = f"قام الشيخ بتسجيل تسميعك لسورة {surah} بدرجة {grade}/100"
     
     create_notification(
-        user=student,
+        user=recitation_record.student_id,
         notification_type='grade',
         title=title,
         message=message,
@@ -52,7 +94,6 @@ def notify_attendance_recorded(attendance):
     """
     إشعار الطالب عند تسجيل الحضور
     """
-    student = attendance.student
     session = attendance.session
     status_display = attendance.get_status_display()
     
@@ -60,7 +101,7 @@ def notify_attendance_recorded(attendance):
     message = f"تم تسجيل {status_display} في جلسة {session.halaqa.name} بتاريخ {session.date}"
     
     create_notification(
-        user=student,
+        user=attendance.student_id,
         notification_type='session',
         title=title,
         message=message,
@@ -72,14 +113,13 @@ def notify_badge_earned(student_badge):
     """
     إشعار الطالب عند حصوله على وسام جديد
     """
-    student = student_badge.student
     badge = student_badge.badge
     
     title = f"🎉 مبروك! حصلت على وسام {badge.name}"
     message = f"تهانينا! لقد حصلت على الوسام {badge.name} ({badge.get_level_display()})"
     
     create_notification(
-        user=student,
+        user=student_badge.student_id,
         notification_type='badge',
         title=title,
         message=message,
@@ -91,7 +131,6 @@ def notify_points_added(points_log):
     """
     إشعار الطالب عند إضافة نقاط
     """
-    student = points_log.student
     points = points_log.points
     
     if points > 0:
@@ -102,7 +141,7 @@ def notify_points_added(points_log):
         message = f"تم خصم {abs(points)} نقطة من رصيدك. السبب: {points_log.reason}"
     
     create_notification(
-        user=student,
+        user=points_log.student_id,
         notification_type='grade',
         title=title,
         message=message,
@@ -121,37 +160,31 @@ def notify_session_created(session, students=None):
         students = HalaqaEnrollment.objects.filter(
             halaqa=halaqa,
             status='active'
-        ).values_list('student', flat=True)
+        ).values_list('student_id', flat=True)
     
     title = f"جلسة جديدة في {halaqa.name}"
     message = f"تم جدولة جلسة جديدة في {halaqa.name} بتاريخ {session.date} الساعة {session.start_time}"
+    link = reverse('halaqat:my_halaqat')
     
-    for student_id in students:
-        from .models import CustomUser
-        try:
-            student = CustomUser.objects.get(pk=student_id)
-            create_notification(
-                user=student,
-                notification_type='session',
-                title=title,
-                message=message,
-                link=reverse('halaqat:my_halaqat')
-            )
-        except CustomUser.DoesNotExist:
-            pass
+    for student in students:
+        create_notification(
+            user=student,
+            notification_type='session',
+            title=title,
+            message=message,
+            link=link
+        )
 
 
 def notify_certificate_issued(certificate):
     """
     إشعار الطالب عند إصدار شهادة جديدة
     """
-    student = certificate.student
-    
     title = "🎓 تم إصدار شهادة جديدة"
     message = f"تهانينا! تم إصدار شهادة {certificate.degree_title or 'جديدة'} لك."
     
     create_notification(
-        user=student,
+        user=certificate.student_id,
         notification_type='badge',
         title=title,
         message=message,
@@ -163,14 +196,13 @@ def notify_achievement_unlocked(student_achievement):
     """
     إشعار الطالب عند إنجاز إنجاز جديد
     """
-    student = student_achievement.student
     achievement = student_achievement.achievement
     
     title = f"🏆 إنجاز جديد: {achievement.name}"
     message = f"مبروك! لقد أكملت الإنجاز: {achievement.description}"
     
     create_notification(
-        user=student,
+        user=student_achievement.student_id,
         notification_type='badge',
         title=title,
         message=message,
@@ -182,7 +214,6 @@ def notify_new_halaqa_enrollment(enrollment):
     """
     إشعار الشيخ عند تسجيل طالب جديد في حلقته
     """
-    sheikh = enrollment.halaqa.sheikh
     student = enrollment.student
     halaqa = enrollment.halaqa
     
@@ -190,7 +221,7 @@ def notify_new_halaqa_enrollment(enrollment):
     message = f"قام {student.get_full_name()} بالتسجيل في حلقة {halaqa.name}"
     
     create_notification(
-        user=sheikh,
+        user=halaqa.sheikh_id,
         notification_type='system',
         title=title,
         message=message,
@@ -236,14 +267,13 @@ def notify_memorization_progress_completed(progress):
     """
     إشعار عند إكمال حفظ سورة
     """
-    student = progress.student
     surah = progress.surah
     
     title = f"📖 حفظت سورة {surah.name_arabic}"
     message = f"مبروك! لقد أكملت حفظ سورة {surah.name_arabic} بنجاح."
     
     create_notification(
-        user=student,
+        user=progress.student_id,
         notification_type='badge',
         title=title,
         message=message,
@@ -264,4 +294,8 @@ def mark_all_notifications_as_read(user):
     تحديد جميع إشعارات المستخدم كمقروءة
     """
     from .models import Notification
-    return Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+    from dashboard.counters import UserCounters
+    
+    updated = Notification.objects.filter(user=user, is_read=False).update(is_read=True)
+    UserCounters.invalidate([user.pk], UserCounters.NOTIFICATIONS, UserCounters.RECENT_NOTIFICATIONS)
+    return updated
@@ -12,19 +12,12 @@ def notifications_context(request):
         return {'unread_notifications_count': 0}
     
     try:
-        from accounts.models import Notification
-        unread_count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
-        
-        recent_notifications = Notification.objects.filter(
-            user=request.user
-        ).order_by('-created_at')[:5]
+        from dashboard.counters import UserCounters, get_user_counters
+        counters = get_user_counters(request)
         
         return {
-            'unread_notifications_count': unread_count,
-            'recent_notifications': recent_notifications,
+            'unread_notifications_count': counters[UserCounters.NOTIFICATIONS],
+            'recent_notifications': counters[UserCounters.RECENT_NOTIFICATIONS],
         }
     except:
         return {'unread_notifications_count': 0}
@@ -37,6 +30,7 @@ def courses_context(request):
     
     try:
         from .models import StudentCurriculum, LessonReminder
+        from dashboard.counters import UserCounters, get_user_counters
         
         # مقررات الطلب
         my_curriculums = StudentCurriculum.objects.filter(
@@ -44,7 +38,7 @@ def courses_context(request):
             status__in=['not_started', 'in_progress']
         ).select_related('curriculum')[:3]
         
-        # دروس اليوم
+        # دروس اليوم (العدد من عدادات المستخدم، والقائمة تُقرأ فقط إذا استُخدمت)
         today = date.today()
         today_lessons = LessonReminder.objects.filter(
             student_curriculum__student=request.user,
@@ -54,7 +48,7 @@ def courses_context(request):
         
         return {
             'my_curriculums': my_curriculums,
-            'today_lessons_count': today_lessons.count(),
+            'today_lessons_count': get_user_counters(request)[UserCounters.TODAY_LESSONS],
             'today_lessons': today_lessons[:5],
         }
     except:
@@ -10,10 +10,11 @@ from django.urls import path, reverse
 from django.http import JsonResponse
 from django.shortcuts import render
 
+from .counters import UserCounters
 from .models import (
     DashboardSettings, DashboardWidget, DashboardLayout,
     DashboardLayoutWidget, AdminActionLog, BulkAction,
-    Message, Notification, Alert, ExcelImportJob
+    Message, MessageStatus, Notification, Alert, ExcelImportJob, ExportJob
 )
 
 User = get_user_model()
@@ -27,6 +28,15 @@ class DashboardLayoutWidgetInline(admin.TabularInline):
     autocomplete_fields = ['widget']
 
 
+class MessageStatusInline(admin.TabularInline):
+    model = MessageStatus
+    extra = 0
+    fields = ['user', 'read_at', 'is_archived']
+    raw_id_fields = ['user']
+    verbose_name = _('مستلم')
+    verbose_name_plural = _('المستلمون')
+
+
 # ==================== Dashboard Settings Admin ====================
 
 @admin.register(DashboardSettings)
@@ -322,12 +332,12 @@ class MessageAdmin(admin.ModelAdmin):
     list_display = ['subject', 'sender', 'message_type', 'priority', 'created_at', 'is_draft']
     list_filter = ['message_type', 'priority', 'is_draft', 'created_at']
     search_fields = ['subject', 'content', 'sender__username', 'sender__first_name']
-    filter_horizontal = ['recipients', 'read_by']
     readonly_fields = ['created_at', 'updated_at']
+    inlines = [MessageStatusInline]
     
     fieldsets = (
         (_('معلومات أساسية'), {
-            'fields': ('sender', 'recipients', 'message_type', 'priority')
+            'fields': ('sender', 'message_type', 'priority')
         }),
         (_('المحتوى'), {
             'fields': ('subject', 'content')
@@ -337,13 +347,19 @@ class MessageAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         (_('الحالة'), {
-            'fields': ('is_draft', 'is_archived', 'read_by')
+            'fields': ('is_draft', 'is_archived')
         }),
         (_('التواريخ'), {
             'fields': ('expires_at', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+    
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        # حذف صفوف الحالة لا يرسل إشارة (حتى يبقى الحذف المتتالي للرسائل سريعاً)
+        deleted = getattr(formset, 'deleted_objects', [])
+        UserCounters.invalidate([status.user_id for status in deleted], UserCounters.MESSAGES)
 
 
 # ==================== Notifications Admin ====================
@@ -417,6 +433,7 @@ class ExcelImportJobAdmin(admin.ModelAdmin):
     search_fields = ['file_name']
     readonly_fields = [
         'total_rows', 'success_count', 'failed_count', 'skipped_count',
+        'processed_rows', 'checkpoint_at', 'error_message',
         'errors_log', 'created_users', 'created_halaqat',
         'started_at', 'completed_at', 'created_at'
     ]
@@ -429,7 +446,7 @@ class ExcelImportJobAdmin(admin.ModelAdmin):
             'fields': ('create_accounts', 'auto_distribute', 'distribution_count')
         }),
         (_('الحالة'), {
-            'fields': ('status',)
+            'fields': ('status', 'processed_rows', 'checkpoint_at', 'cancel_requested', 'error_message')
         }),
         (_('النتائج'), {
             'fields': ('total_rows', 'success_count', 'failed_count', 'skipped_count'),
@@ -456,6 +473,7 @@ class ExcelImportJobAdmin(admin.ModelAdmin):
             'completed': '#198754',
             'partial': '#ffc107',
             'failed': '#dc3545',
+            'cancelled': '#fd7e14',
         }
         return format_html(
             '<span style="background-color: {}; color: white; padding: 3px 10px; '
@@ -464,3 +482,11 @@ class ExcelImportJobAdmin(admin.ModelAdmin):
             obj.get_status_display()
         )
     status_badge.short_description = _('الحالة')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'report_type', 'export_format', 'status', 'row_count', 'created_by', 'created_at']
+    list_filter = ['report_type', 'export_format', 'status', 'created_at']
+    readonly_fields = ['file', 'row_count', 'error_message', 'started_at', 'completed_at', 'created_at']
+    raw_id_fields = ['created_by']
@@ -0,0 +1,198 @@
+"""
+محلل ظهور التنبيهات - Precompiled alert visibility resolver
+
+تُحمّل التنبيهات النشطة مرة واحدة لكل جيل (generation) في الكاش، وتُجمّع مسبقاً
+حسب الدور وحسب المستخدم المستهدف. الإغلاقات (show_once) تُخزن لكل مستخدم كصف
+معرفات صغير. ظهور التنبيهات لطلب ما يُحسب في الذاكرة دون استعلامات في الحالة المعتادة.
+
+أي تعديل على التنبيهات أو مستهدفيها يرفع الجيل (dashboard.signals). الجيل واللقطة
+والإغلاقات في الكاش المشترك (caches['shared']) فيراها كل العمال؛ نسخة العملية
+من اللقطة تُستعمل LOCAL_TTL ثوانٍ فقط قبل مقارنة جيلها بالكاش المشترك.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+
+class CompiledAlert(NamedTuple):
+    """نسخة خفيفة من التنبيه تكفي للعرض والتحقق من الظهور"""
+    id: int
+    alert_type: str
+    title: str
+    message: str
+    dismissible: bool
+    show_once: bool
+    start_date: datetime
+    end_date: Optional[datetime]
+    created_at: datetime
+    roles: FrozenSet[str]
+
+    def get_alert_type_display(self):
+        from .models import Alert
+        return Alert.AlertType(self.alert_type).label
+
+    def is_current(self, now: datetime) -> bool:
+        return self.start_date <= now and (self.end_date is None or now <= self.end_date)
+
+
+class AlertSnapshot:
+    """التنبيهات النشطة مجمّعة حسب الدور وحسب المستخدم المستهدف"""
+
+    def __init__(self, alerts: List[CompiledAlert], targets: Dict[int, FrozenSet[int]], roles: List[str]):
+        self.by_role: Dict[Optional[str], Tuple[CompiledAlert, ...]] = {}
+        by_user = defaultdict(list)
+
+        untargeted = [alert for alert in alerts if alert.id not in targets]
+        # None للزائر المجهول: التنبيهات العامة فقط
+        for role in [None, *roles]:
+            self.by_role[role] = tuple(
+                alert for alert in untargeted if not alert.roles or (role and role in alert.roles)
+            )
+        for alert in alerts:
+            for user_id in targets.get(alert.id, ()):
+                by_user[user_id].append(alert)
+        self.by_user: Dict[int, Tuple[CompiledAlert, ...]] = {
+            user_id: tuple(user_alerts) for user_id, user_alerts in by_user.items()
+        }
+
+    def candidates(self, user_id: Optional[int], role: Optional[str]) -> List[CompiledAlert]:
+        alerts = list(self.by_role.get(role, self.by_role[None]))
+        targeted = [
+            alert for alert in self.by_user.get(user_id, ())
+            if not alert.roles or role in alert.roles
+        ]
+        if targeted:
+            alerts = sorted(alerts + targeted, key=lambda alert: alert.created_at, reverse=True)
+        return alerts
+
+
+class AlertResolver:
+    """حساب التنبيهات المرئية لمستخدم من اللقطة المجمّعة"""
+
+    GENERATION_KEY = 'alerts:generation'
+    SNAPSHOT_KEY = 'alerts:snapshot:{generation}'
+    DISMISSED_KEY = 'alerts:dismissed:{user_id}'
+    CACHE_ALIAS = 'shared'
+    CACHE_TIMEOUT = 3600
+    # مدة الوثوق بنسخة العملية دون الرجوع إلى جيل الكاش المشترك (ثوانٍ)
+    LOCAL_TTL = 5
+
+    def __init__(self):
+        # نسخة العملية من آخر لقطة لتجنب فك تسلسلها من الكاش في كل طلب:
+        # (الجيل، اللقطة، وقت آخر تحقق)
+        self._local: Tuple[Optional[int], Optional[AlertSnapshot], float] = (None, None, 0.0)
+
+    @property
+    def cache(self):
+        return caches[self.CACHE_ALIAS]
+
+    # ==================== Snapshot ====================
+
+    def generation(self) -> int:
+        generation = self.cache.get(self.GENERATION_KEY)
+        if generation is None:
+            self.cache.add(self.GENERATION_KEY, 1, None)
+            generation = self.cache.get(self.GENERATION_KEY, 1)
+        return generation
+
+    def bump_generation(self):
+        """إبطال اللقطة بعد أي تعديل على التنبيهات، عند نجاح المعاملة الحالية"""
+        # الرفع قبل الالتزام يسمح لطلب آخر ببناء لقطة من البيانات القديمة وتخزينها تحت الجيل الجديد
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        try:
+            self.cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            self.cache.add(self.GENERATION_KEY, 1, None)
+        self._local = (None, None, 0.0)
+
+    def snapshot(self) -> AlertSnapshot:
+        local_generation, snapshot, checked_at = self._local
+        now = time.monotonic()
+        if snapshot is not None and now - checked_at < self.LOCAL_TTL:
+            return snapshot
+
+        generation = self.generation()
+        if local_generation != generation or snapshot is None:
+            key = self.SNAPSHOT_KEY.format(generation=generation)
+            snapshot = self.cache.get(key)
+            if snapshot is None:
+                snapshot = self.build_snapshot()
+                self.cache.set(key, snapshot, self.CACHE_TIMEOUT)
+        self._local = (generation, snapshot, now)
+        return snapshot
+
+    def build_snapshot(self) -> AlertSnapshot:
+        """استعلامان: التنبيهات النشطة، ثم مستهدفوها"""
+        from accounts.models import CustomUser
+        from .models import Alert
+
+        rows = Alert.objects.filter(is_active=True).filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=timezone.now())
+        ).order_by('-created_at').values(
+            'id', 'alert_type', 'title', 'message', 'dismissible', 'show_once',
+            'start_date', 'end_date', 'created_at', 'target_roles',
+        )
+        alerts = [
+            CompiledAlert(roles=frozenset(row.pop('target_roles') or ()), **row)
+            for row in rows
+        ]
+
+        field = Alert.target_users.field
+        through = field.remote_field.through
+        user_column = through._meta.get_field(field.m2m_reverse_field_name()).attname
+        targets = defaultdict(set)
+        pairs = through.objects.filter(alert_id__in=[alert.id for alert in alerts]).values_list('alert_id', user_column)
+        for alert_id, user_id in pairs:
+            targets[alert_id].add(user_id)
+
+        return AlertSnapshot(
+            alerts,
+            {alert_id: frozenset(user_ids) for alert_id, user_ids in targets.items()},
+            list(CustomUser.UserType.values),
+        )
+
+    # ==================== Dismissals ====================
+
+    def dismissed_ids(self, user_id: int) -> FrozenSet[int]:
+        key = self.DISMISSED_KEY.format(user_id=user_id)
+        dismissed = self.cache.get(key)
+        if dismissed is None:
+            from .models import Alert
+            dismissed = tuple(sorted(Alert.objects.filter(
+                dismissed_by=user_id, is_active=True, show_once=True
+            ).values_list('pk', flat=True)))
+            self.cache.set(key, dismissed, self.CACHE_TIMEOUT)
+        return frozenset(dismissed)
+
+    def invalidate_dismissed(self, user_ids):
+        self.cache.delete_many([self.DISMISSED_KEY.format(user_id=user_id) for user_id in set(user_ids)])
+
+    # ==================== Resolution ====================
+
+    def for_user(self, user, now: datetime = None) -> List[CompiledAlert]:
+        """التنبيهات المرئية للمستخدم (أو للزائر) الآن"""
+        now = now or timezone.now()
+        if user.is_authenticated:
+            user_id, role = user.pk, user.user_type
+        else:
+            user_id, role = None, None
+
+        visible = [alert for alert in self.snapshot().candidates(user_id, role) if alert.is_current(now)]
+        if user_id and any(alert.show_once for alert in visible):
+            dismissed = self.dismissed_ids(user_id)
+            visible = [alert for alert in visible if not (alert.show_once and alert.id in dismissed)]
+        return visible
+
+    def is_visible(self, alert_id: int, user) -> bool:
+        return any(alert.id == alert_id for alert in self.for_user(user))
+
+
+alert_resolver = AlertResolver()
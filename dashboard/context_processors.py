@@ -1,7 +1,10 @@
 """
 معالجات السياق للداشبورد
 """
-from .models import Message, Notification
+from django.utils.functional import SimpleLazyObject
+
+from .alerts import alert_resolver
+from .counters import UserCounters, get_user_counters
 
 
 def dashboard_notifications(request):
@@ -9,19 +12,20 @@ def dashboard_notifications(request):
     if not request.user.is_authenticated:
         return {}
     
+    counters = get_user_counters(request)
+    
     # عدد الرسائل غير المقروءة
-    unread_messages = Message.objects.filter(
-        recipients=request.user,
-        is_archived=False
-    ).exclude(read_by=request.user).count()
+    unread_messages = counters[UserCounters.MESSAGES]
     
     # عدد الإشعارات غير المقروءة
-    unread_notifications = Notification.objects.filter(
-        user=request.user,
-        is_read=False
-    ).count()
+    unread_notifications = counters[UserCounters.DASHBOARD_NOTIFICATIONS]
     
     return {
         'unread_messages_count': unread_messages if unread_messages > 0 else '',
         'unread_notifications_count': unread_notifications if unread_notifications > 0 else '',
     }
+
+
+def active_alerts(request):
+    """التنبيهات المرئية للمستخدم، تُحسب فقط إذا استخدمها القالب"""
+    return {'active_alerts': SimpleLazyObject(lambda: alert_resolver.for_user(request.user))}
@@ -0,0 +1,111 @@
+"""
+عدادات المستخدم المخزنة مؤقتاً
+Per-user counters cache for the context processors
+
+كل عداد في مفتاح مستقل في الكاش المشترك (caches['shared'])، وتُقرأ كلها بقراءة
+كاش واحدة (get_many) لكل طلب. أي كتابة (من عامل ويب أو عامل الإشعارات أو أمر
+إدارة) تحذف عداد المستخدم المتأثر فقط بعد نجاح المعاملة ليُعاد حسابه بعدّ مفهرس
+عند الطلب التالي. لا زيادة مباشرة (incr): زيادة الكاش الملفي قراءة ثم كتابة
+فتضيع الزيادات المتزامنة من عمليات مختلفة.
+"""
+from datetime import date
+from typing import Dict, Iterable
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+class UserCounters:
+    """قراءة وتحديث عدادات مستخدم واحد"""
+
+    CACHE_ALIAS = 'shared'
+    CACHE_KEY = 'user_counters:{user_id}:{name}'
+    CACHE_TIMEOUT = 3600
+    RECENT_NOTIFICATIONS_LIMIT = 5
+
+    NOTIFICATIONS = 'notifications'
+    RECENT_NOTIFICATIONS = 'recent_notifications'
+    DASHBOARD_NOTIFICATIONS = 'dashboard_notifications'
+    MESSAGES = 'messages'
+    TODAY_LESSONS = 'today_lessons'
+
+    def __init__(self, user):
+        self.user = user
+
+    @classmethod
+    def cache(cls):
+        return caches[cls.CACHE_ALIAS]
+
+    @classmethod
+    def key(cls, user_id: int, name: str, day: date = None) -> str:
+        if name == cls.TODAY_LESSONS:
+            name = f"{name}:{(day or date.today()).isoformat()}"
+        return cls.CACHE_KEY.format(user_id=user_id, name=name)
+
+    def names(self):
+        names = [self.NOTIFICATIONS, self.RECENT_NOTIFICATIONS, self.DASHBOARD_NOTIFICATIONS, self.MESSAGES]
+        if self.user.is_student:
+            names.append(self.TODAY_LESSONS)
+        return names
+
+    def get(self) -> Dict[str, object]:
+        """كل العدادات بقراءة كاش واحدة، مع حساب الناقص فقط"""
+        keys = {self.key(self.user.pk, name): name for name in self.names()}
+        cache = self.cache()
+        cached = cache.get_many(keys.keys())
+
+        values = {keys[key]: value for key, value in cached.items()}
+        missing = {key: name for key, name in keys.items() if key not in cached}
+        if missing:
+            computed = {key: getattr(self, f"_compute_{name}")() for key, name in missing.items()}
+            cache.set_many(computed, self.CACHE_TIMEOUT)
+            values.update((missing[key], value) for key, value in computed.items())
+        return values
+
+    # ==================== Computation ====================
+
+    def _compute_notifications(self) -> int:
+        from accounts.models import Notification
+        return Notification.objects.filter(user=self.user, is_read=False).count()
+
+    def _compute_recent_notifications(self):
+        from accounts.models import Notification
+        return list(
+            Notification.objects.filter(user=self.user)
+            .order_by('-created_at')
+            .values('id', 'title', 'is_read', 'link', 'notification_type', 'created_at')[:self.RECENT_NOTIFICATIONS_LIMIT]
+        )
+
+    def _compute_dashboard_notifications(self) -> int:
+        from .models import Notification
+        return Notification.objects.filter(user=self.user, is_read=False).count()
+
+    def _compute_messages(self) -> int:
+        from .models import MessageStatus
+        # الفهرس الجزئي لغير المقروء
+        return MessageStatus.objects.filter(user=self.user, read_at__isnull=True, is_archived=False).count()
+
+    def _compute_today_lessons(self) -> int:
+        from courses.models import LessonReminder
+        return LessonReminder.objects.filter(
+            student_curriculum__student=self.user,
+            scheduled_date=date.today(),
+            is_completed=False
+        ).count()
+
+    # ==================== Write path ====================
+
+    @classmethod
+    def invalidate(cls, user_ids: Iterable[int], *names: str, day: date = None):
+        """حذف عدادات محددة لمستخدمين محددين بعد نجاح المعاملة الحالية"""
+        keys = [cls.key(user_id, name, day) for user_id in set(user_ids) for name in names]
+        if keys:
+            # الحذف قبل الالتزام يسمح لطلب آخر بإعادة حساب القيمة القديمة وتخزينها
+            transaction.on_commit(lambda: cls.cache().delete_many(keys))
+
+
+def get_user_counters(request) -> Dict[str, object]:
+    """عدادات المستخدم الحالي، مرة واحدة لكل طلب مهما تعدد معالجو السياق"""
+    if not hasattr(request, '_user_counters'):
+        request._user_counters = UserCounters(request.user).get()
+    return request._user_counters
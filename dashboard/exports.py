@@ -0,0 +1,416 @@
+"""
+محرك التصدير المتدفق - Streaming report export
+
+التقارير تُعرّف كورقة (ExportSheet): عناوين أعمدة ومولّد صفوف يقرأ
+.values_list().iterator() على دفعات، فلا يُحمّل الاستعلام كاملاً في الذاكرة.
+- CSV و NDJSON تُرسل عبر StreamingHttpResponse صفاً بصف
+- Excel يُكتب بمصنف openpyxl للكتابة فقط (write_only) إلى ملف مؤقت ثم يُرسل بالقطع
+- التصدير الأكبر من EXPORT_BACKGROUND_THRESHOLD صفاً يصبح ExportJob ينفذه عامل
+  التصدير المستقل (python manage.py run_export_worker) وينتج ملفاً للتحميل مع إشعار
+  للمستخدم؛ العامل يعيد أخذ العمليات المتوقفة (STALE_AFTER) تلقائياً. مع
+  EXPORT_RUN_IN_WEB تُنفذ في خيط خلفي داخل عملية الويب (للتطوير)
+"""
+import csv
+import json
+import logging
+import queue
+import tempfile
+import threading
+from datetime import date
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Avg, Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class ExportSheet(NamedTuple):
+    """ورقة تصدير: عنوان، أعمدة، وصفوف تُولّد عند الكتابة"""
+    title: str
+    headers: Sequence[str]
+    rows: Callable[[], Iterable[Sequence]]
+    # تقدير عدد الصفوف (استعلام COUNT) لتقرير التصدير في الخلفية
+    count: Callable[[], int]
+
+
+def _full_name(first_name, last_name, fallback=''):
+    return f"{first_name or ''} {last_name or ''}".strip() or fallback
+
+
+# ==================== Report sheets ====================
+
+def overview_sheet(start_date: date, end_date: date) -> ExportSheet:
+    from .rollups import attendance_count, daily_rollups, recitations_count
+
+    def rows():
+        totals = daily_rollups.totals(start_date, end_date)
+        recitations = recitations_count(totals)
+        return [
+            ('مستخدمين جدد', totals['new_users']),
+            ('طلاب جدد', totals['new_students']),
+            ('جلسات منعقدة', totals['sessions_count']),
+            ('تسميعات', recitations),
+            ('متوسط الدرجات', round(totals['grade_sum'] / recitations, 2) if recitations else 0),
+            ('سجلات حضور', attendance_count(totals)),
+        ]
+
+    return ExportSheet('Overview', ('المعيار', 'القيمة'), rows, lambda: 6)
+
+
+def students_sheet(start_date: date, end_date: date) -> ExportSheet:
+    from django.contrib.auth import get_user_model
+    from halaqat.models import Attendance
+    from recitation.models import RecitationRecord
+
+    User = get_user_model()
+    date_range = (start_date, end_date)
+    attendances = Attendance.objects.filter(student=OuterRef('pk'), session__date__range=date_range)
+    recitations = RecitationRecord.objects.filter(student=OuterRef('pk'), created_at__date__range=date_range)
+
+    def per_student(queryset, aggregate, output_field):
+        return Subquery(
+            queryset.order_by().values('student').annotate(value=aggregate).values('value'),
+            output_field=output_field,
+        )
+
+    queryset = User.objects.filter(user_type='student').annotate(
+        sessions_count=Coalesce(per_student(attendances, Count('id'), IntegerField()), 0),
+        recitations_count=Coalesce(per_student(recitations, Count('id'), IntegerField()), 0),
+        avg_grade=per_student(recitations, Avg('grade'), RecitationRecord._meta.get_field('grade')),
+    ).order_by('-recitations_count', 'pk')
+
+    def rows():
+        values = queryset.values_list(
+            'first_name', 'last_name', 'username', 'email', 'sessions_count', 'recitations_count', 'avg_grade',
+        )
+        for first_name, last_name, username, email, sessions_count, recitations_count, avg_grade in values.iterator(CHUNK_SIZE):
+            yield (
+                _full_name(first_name, last_name, username), username, email,
+                sessions_count, recitations_count, round(avg_grade or 0, 2),
+                # pages_count تقديري: صفحة لكل تسميع (RecitationRecord.pages_count)
+                recitations_count,
+            )
+
+    return ExportSheet(
+        'Students',
+        ('الاسم', 'اسم المستخدم', 'البريد', 'الجلسات', 'التسميعات', 'متوسط الدرجة', 'الصفحات'),
+        rows,
+        User.objects.filter(user_type='student').count,
+    )
+
+
+def halaqat_sheet(start_date: date, end_date: date) -> ExportSheet:
+    from halaqat.models import Halaqa, HalaqaEnrollment, Session
+
+    statuses = dict(Halaqa.HalaqaStatus.choices)
+    sessions = Session.objects.filter(halaqa=OuterRef('pk'), date__range=(start_date, end_date))
+    enrollments = HalaqaEnrollment.objects.filter(halaqa=OuterRef('pk'), status='active')
+
+    def per_halaqa(queryset):
+        return Coalesce(Subquery(
+            queryset.order_by().values('halaqa').annotate(value=Count('id')).values('value'),
+            output_field=IntegerField(),
+        ), 0)
+
+    queryset = Halaqa.objects.annotate(
+        sessions_count=per_halaqa(sessions),
+        students_count=per_halaqa(enrollments),
+    ).order_by('-sessions_count', 'pk')
+
+    def rows():
+        values = queryset.values_list(
+            'name', 'sheikh__first_name', 'sheikh__last_name', 'students_count', 'sessions_count', 'status',
+        )
+        for name, first_name, last_name, students_count, sessions_count, status in values.iterator(CHUNK_SIZE):
+            yield (
+                name, _full_name(first_name, last_name, '-'), students_count, sessions_count,
+                str(statuses.get(status, status)),
+            )
+
+    return ExportSheet(
+        'Halaqat',
+        ('اسم الحلقة', 'الشيخ', 'عدد الطلاب', 'الجلسات', 'الحالة'),
+        rows,
+        Halaqa.objects.count,
+    )
+
+
+def recitations_sheet(start_date: date, end_date: date) -> ExportSheet:
+    from recitation.models import RecitationRecord
+
+    types = dict(RecitationRecord.RecitationType.choices)
+    queryset = RecitationRecord.objects.filter(created_at__date__range=(start_date, end_date)).order_by('-created_at')
+
+    def rows():
+        values = queryset.values_list(
+            'student__first_name', 'student__last_name', 'surah_start__name_arabic',
+            'recitation_type', 'grade', 'created_at',
+        )
+        for first_name, last_name, surah, recitation_type, grade, created_at in values.iterator(CHUNK_SIZE):
+            yield (
+                _full_name(first_name, last_name, '-'), surah or '-',
+                str(types.get(recitation_type, recitation_type)), grade,
+                timezone.localtime(created_at).strftime('%Y-%m-%d'),
+            )
+
+    return ExportSheet(
+        'Recitations',
+        ('الطالب', 'السورة', 'النوع', 'الدرجة', 'التاريخ'),
+        rows,
+        queryset.count,
+    )
+
+
+REPORT_SHEETS = {
+    'overview': overview_sheet,
+    'students': students_sheet,
+    'halaqat': halaqat_sheet,
+    'recitations': recitations_sheet,
+}
+
+
+def report_sheet(report_type: str, start_date: date, end_date: date) -> ExportSheet:
+    return REPORT_SHEETS.get(report_type, overview_sheet)(start_date, end_date)
+
+
+def records_sheet(title: str, records: List[dict]) -> ExportSheet:
+    """ورقة من قائمة قواميس (مثل ExcelImportJob.created_users)؛ الأعمدة اتحاد المفاتيح بترتيب ظهورها"""
+    headers = list(dict.fromkeys(key for record in records for key in record))
+    return ExportSheet(
+        title,
+        headers,
+        lambda: ([record.get(header, '') for header in headers] for record in records),
+        lambda: len(records),
+    )
+
+
+# ==================== Writers ====================
+
+class _Echo:
+    """كائن شبيه بالملف يعيد ما يُكتب فيه، ليولّد csv.writer السطور واحداً واحداً"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(sheet: ExportSheet) -> Iterator[bytes]:
+    writer = csv.writer(_Echo())
+    # BOM ليتعرف Excel على الترميز العربي
+    yield ('﻿' + writer.writerow(sheet.headers)).encode('utf-8')
+    for row in sheet.rows():
+        yield writer.writerow(row).encode('utf-8')
+
+
+def iter_ndjson(sheet: ExportSheet) -> Iterator[bytes]:
+    for row in sheet.rows():
+        line = json.dumps(dict(zip(sheet.headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False)
+        yield (line + '\n').encode('utf-8')
+
+
+def write_xlsx(sheet: ExportSheet, fileobj) -> int:
+    """مصنف للكتابة فقط: الصفوف تُكتب تباعاً إلى ملف مؤقت لدى openpyxl لا في الذاكرة"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet.title)
+    worksheet.append(list(sheet.headers))
+    rows = 0
+    for row in sheet.rows():
+        worksheet.append(list(row))
+        rows += 1
+    workbook.save(fileobj)
+    return rows
+
+
+def write_export(sheet: ExportSheet, export_format: str, fileobj) -> int:
+    """كتابة الورقة إلى ملف بالصيغة المطلوبة. يعيد عدد الصفوف"""
+    if export_format == 'xlsx':
+        return write_xlsx(sheet, fileobj)
+    rows = -1 if export_format == 'csv' else 0  # سطر العناوين في CSV
+    for chunk in (iter_csv(sheet) if export_format == 'csv' else iter_ndjson(sheet)):
+        fileobj.write(chunk)
+        rows += 1
+    return rows
+
+
+def export_response(sheet: ExportSheet, export_format: str, filename: str):
+    """استجابة تصدير متدفقة (CSV/NDJSON) أو ملف Excel مؤقت يُرسل بالقطع"""
+    if export_format == 'xlsx':
+        output = tempfile.TemporaryFile()
+        write_xlsx(sheet, output)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=filename, content_type=CONTENT_TYPES['xlsx'])
+
+    stream = iter_csv(sheet) if export_format == 'csv' else iter_ndjson(sheet)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def should_run_in_background(sheet: ExportSheet) -> bool:
+    return sheet.count() > getattr(settings, 'EXPORT_BACKGROUND_THRESHOLD', 20000)
+
+
+# ==================== Background jobs ====================
+
+class ExportJobRunner:
+    """ينفذ عمليات ExportJob بالترتيب"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def run_in_web(self) -> bool:
+        return getattr(settings, 'EXPORT_RUN_IN_WEB', False)
+
+    def enqueue(self, job_id: int):
+        """عملية جديدة (PENDING)؛ يأخذها العامل، أو خيط الويب مع EXPORT_RUN_IN_WEB"""
+        if self.run_in_web:
+            transaction.on_commit(lambda: self.submit(job_id))
+
+    def submit(self, job_id: int):
+        self._ensure_started()
+        self._queue.put(job_id)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='export-jobs', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self.run(job_id)
+            except Exception as e:
+                logger.exception(f"Export job {job_id} crashed: {e}")
+            finally:
+                connections.close_all()
+
+    # ==================== Worker ====================
+
+    def request_stop(self, *args):
+        """إيقاف آمن بعد العملية الجارية (يصلح كمعالج إشارة)"""
+        self._stop.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def reclaim_stale(self) -> int:
+        """إعادة العمليات التي توقف منفذها (لم تكتمل خلال STALE_AFTER من بدئها) إلى الانتظار"""
+        from .models import ExportJob
+
+        cutoff = timezone.now() - ExportJob.STALE_AFTER
+        reclaimed = 0
+        stale = ExportJob.objects.filter(
+            status=ExportJob.Status.PROCESSING, started_at__lt=cutoff
+        ).values_list('pk', 'started_at')
+        for pk, started_at in stale:
+            # مشروط بوقت البدء نفسه: المنفذ القديم إن عاد لا يكتب نتيجته (finish)
+            reclaimed += ExportJob.objects.filter(
+                pk=pk, status=ExportJob.Status.PROCESSING, started_at=started_at
+            ).update(status=ExportJob.Status.PENDING)
+        if reclaimed:
+            logger.warning(f"Reclaimed {reclaimed} stale export jobs")
+        return reclaimed
+
+    def run_pending(self, max_jobs: Optional[int] = None) -> int:
+        """تنفيذ العمليات المعلقة بالترتيب حتى تنفد أو يُطلب الإيقاف. يعيد عدد المنفذة"""
+        from .models import ExportJob
+
+        self.reclaim_stale()
+        done = 0
+        while not self.stopping and (max_jobs is None or done < max_jobs):
+            job_id = ExportJob.objects.filter(
+                status=ExportJob.Status.PENDING
+            ).order_by('created_at', 'pk').values_list('pk', flat=True).first()
+            if job_id is None:
+                break
+            if self.run(job_id) is not None:
+                done += 1
+        return done
+
+    def work(self, poll_interval: float = 5.0, once: bool = False) -> int:
+        """حلقة العامل المستقل حتى طلب الإيقاف"""
+        total = 0
+        while not self.stopping:
+            try:
+                total += self.run_pending()
+            except Exception as e:
+                logger.exception(f"Export worker iteration failed: {e}")
+            finally:
+                close_old_connections()
+            if once:
+                break
+            self._stop.wait(poll_interval)
+        return total
+
+    # ==================== Jobs ====================
+
+    def run(self, job_id: int) -> Optional[bool]:
+        """تنفيذ عملية واحدة. None إذا أخذتها عملية أخرى"""
+        from accounts.utils import create_notification
+        from .models import ExportJob
+
+        claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.Status.PENDING).update(
+            status=ExportJob.Status.PROCESSING, started_at=timezone.now()
+        )
+        if not claimed:
+            return None
+        job = ExportJob.objects.get(pk=job_id)
+
+        try:
+            sheet = report_sheet(job.report_type, job.start_date, job.end_date)
+            with tempfile.TemporaryFile() as output:
+                job.row_count = write_export(sheet, job.export_format, output)
+                output.seek(0)
+                job.file.save(f"{job.pk}_{job.filename}", File(output), save=False)
+        except Exception as e:
+            logger.exception(f"Export job {job_id} failed: {e}")
+            self.finish(job, ExportJob.Status.FAILED, error_message=str(e))
+            return False
+
+        if not self.finish(job, ExportJob.Status.COMPLETED, file=job.file.name, row_count=job.row_count):
+            logger.warning(f"Export job {job_id} was reclaimed elsewhere; discarding this run")
+            job.file.delete(save=False)
+            return None
+        create_notification(
+            job.created_by_id,
+            'system',
+            'التصدير جاهز',
+            f'تم تصدير {job.row_count} صف. الملف جاهز للتحميل.',
+            link=reverse('dashboard:export_download', args=[job.pk]),
+        )
+        return True
+
+    def finish(self, job, status: str, **fields) -> bool:
+        """إنهاء العملية إن بقيت لهذا المنفذ (لم يُعد أخذها بعد توقفه)"""
+        from .models import ExportJob
+
+        return bool(ExportJob.objects.filter(
+            pk=job.pk, status=ExportJob.Status.PROCESSING, started_at=job.started_at
+        ).update(status=status, completed_at=timezone.now(), **fields))
+
+
+export_runner = ExportJobRunner()
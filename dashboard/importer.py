@@ -0,0 +1,671 @@
+"""
+محرك استيراد الحسابات من Excel - Vectorized bulk account import
+
+الورقة تُنظّف وتُتحقق منها بعمليات pandas على الأعمدة كاملة (لا iterrows)،
+والمستخدمون الموجودون (أسماء المستخدمين والبريد) يُجلبون باستعلام واحد إلى
+مجموعات في الذاكرة. الحسابات وملفاتها وتسجيلات الحلقات تُنشأ بـ bulk_create على
+دفعات؛ الدفعة التي تفشل تُعاد صفاً صفاً لنسب الخطأ إلى صفه.
+
+process() تعالج جزءاً من الورقة وتراكم النتائج. ImportJobRunner يشغّل الاستيراد
+على أجزاء، ويحفظ بعد كل جزء (في نفس معاملة بياناته) عدد الصفوف المعالجة والعدادات
+على ExcelImportJob؛ فالإلغاء والاستئناف يبدآن من آخر نقطة حفظ.
+
+العمليات ينفذها العامل المستقل (python manage.py run_import_worker)، لا عامل الويب
+الذي قد يُعاد تشغيله في منتصفها: العامل يأخذ العمليات المعلقة بالترتيب، ويعيد أخذ
+العمليات المتوقفة (بلا نقطة حفظ منذ STALE_AFTER) تلقائياً. مع IMPORT_RUN_IN_WEB
+تُنفذ في خيط خلفي داخل عملية الويب (للتطوير).
+"""
+import logging
+import queue
+import random
+import string
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# أسماء العشرة المبشرين بالجنة + 20 صحابي إضافي للحلقات
+SAHABA_NAMES = [
+    # العشرة المبشرون بالجنة
+    ('أبو بكر الصديق', 'male'),
+    ('عمر بن الخطاب', 'male'),
+    ('عثمان بن عفان', 'male'),
+    ('علي بن أبي طالب', 'male'),
+    ('طلحة بن عبيد الله', 'male'),
+    ('الزبير بن العوام', 'male'),
+    ('عبد الرحمن بن عوف', 'male'),
+    ('سعد بن أبي وقاص', 'male'),
+    ('سعيد بن زيد', 'male'),
+    ('أبو عبيدة بن الجراح', 'male'),
+    # 20 صحابي إضافي
+    ('خالد بن الوليد', 'male'),
+    ('عمار بن ياسر', 'male'),
+    ('بلال بن رباح', 'male'),
+    ('سلمان الفارسي', 'male'),
+    ('البراء بن مالك', 'male'),
+    ('عبد الله بن مسعود', 'male'),
+    ('أبو هريرة', 'male'),
+    ('عبد الله بن عباس', 'male'),
+    ('جابر بن عبد الله', 'male'),
+    ('أنس بن مالك', 'male'),
+    ('عبد الله بن الزبير', 'male'),
+    ('القعقاع بن عمرو', 'male'),
+    ('زيد بن ثابت', 'male'),
+    ('أبو سعيد الخدري', 'male'),
+    ('عبد الله بن عمر', 'male'),
+    ('مصعب بن عمير', 'male'),
+    ('حذيفة بن اليمان', 'male'),
+    ('المقداد بن عمرو', 'male'),
+    ('عمرو بن العاص', 'male'),
+    ('أبو أيوب الأنصاري', 'male'),
+]
+
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+SPECIALIZATIONS = ('hifz', 'tajweed', 'qiraat', 'ijazah')
+TEXT_COLUMNS = ('name', 'email', 'phone', 'specialization')
+
+
+class ImportAborted(Exception):
+    """خطأ يوقف الاستيراد كله (أعمدة مفقودة، لا مشايخ للتوزيع...)"""
+
+
+class ImportSuperseded(Exception):
+    """عملية أخرى استأنفت نفس المهمة؛ يُتراجع عن الجزء الحالي ويتوقف هذا المنفذ"""
+
+
+def read_sheet(path):
+    """قراءة الورقة مع إبقاء الأعمدة النصية نصاً (أرقام الجوال لا تصبح أعداداً عشرية)"""
+    import pandas as pd
+    return pd.read_excel(path, dtype={column: str for column in TEXT_COLUMNS})
+
+
+def generate_password():
+    """توليد كلمة مرور عشوائية"""
+    # كلمة مرور من 10 أحرف تتضمن أرقام وحروف
+    chars = string.ascii_letters + string.digits
+    return ''.join(random.choice(chars) for _ in range(10))
+
+
+class AccountImporter(ABC):
+    """الأساس المشترك لاستيراد الطلاب والمشايخ"""
+    
+    user_type = None
+    CHUNK_SIZE = 500
+    MAX_ERRORS = 50
+    
+    def __init__(self, job, created_by):
+        self.job = job
+        self.created_by = created_by
+        # الاستئناف يكمل عدادات آخر نقطة حفظ
+        self.success_count = job.success_count
+        self.failed = job.failed_count
+        self.skipped = job.skipped_count
+        self.errors: List[dict] = [error for error in job.errors_log if isinstance(error, dict)]
+        self.created_users: List[dict] = list(job.created_users)
+        self.created_halaqat: List[dict] = list(job.created_halaqat)
+        self._ready = False
+    
+    # ==================== State ====================
+    
+    def setup(self):
+        """استعلام واحد لكل أسماء المستخدمين والبريد الموجودة"""
+        self.by_username: Dict[str, int] = {}
+        self.by_email: Dict[str, int] = {}
+        self.seen_emails: Set[str] = set()
+        rows = User.objects.values_list('pk', 'username', 'email').iterator(chunk_size=5000)
+        for pk, username, email in rows:
+            self.by_username[username] = pk
+            if email:
+                self.by_email.setdefault(email.lower(), pk)
+        self._ready = True
+    
+    def process(self, df):
+        """معالجة جزء من الورقة (أو كلها) ومراكمة النتائج"""
+        if not self._ready:
+            self.setup()
+        frame = self.prepare(df)
+        for start in range(0, len(frame), self.CHUNK_SIZE):
+            self.import_rows(frame.iloc[start:start + self.CHUNK_SIZE])
+    
+    def skip_rows(self, df):
+        """عند الاستئناف: تسجيل بريد الصفوف المعالجة سابقاً لاكتشاف التكرار بعدها"""
+        if len(df):
+            frame = self.normalize(df)
+            self.seen_emails.update(frame.loc[(frame['name'] != '') & (frame['email'] != ''), 'email'])
+    
+    def save_checkpoint(self, processed_rows: int):
+        """حفظ التقدم على المهمة؛ يُستدعى داخل معاملة الجزء"""
+        from .models import ExcelImportJob
+        
+        fields = {
+            'processed_rows': processed_rows,
+            'success_count': self.success_count,
+            'failed_count': self.failed,
+            'skipped_count': self.skipped,
+            'errors_log': self.errors,
+            'created_users': self.created_users,
+            'created_halaqat': self.created_halaqat,
+            'checkpoint_at': timezone.now(),
+        }
+        # تحديث مشروط بآخر نقطة حفظ: إذا استأنفت عملية أخرى المهمة يفشل ويُتراجع عن الجزء
+        updated = ExcelImportJob.objects.filter(
+            pk=self.job.pk, status=ExcelImportJob.Status.PROCESSING, checkpoint_at=self.job.checkpoint_at
+        ).update(**fields)
+        if not updated:
+            raise ImportSuperseded(self.job.pk)
+        for field, value in fields.items():
+            setattr(self.job, field, value)
+    
+    def add_error(self, row: int, name: str, error: str):
+        self.failed += 1
+        # أول 50 خطأ فقط
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append({'row': row, 'name': name or 'Unknown', 'error': error})
+    
+    # ==================== Validation ====================
+    
+    @staticmethod
+    def text(frame, column):
+        import pandas as pd
+        if column not in frame:
+            return pd.Series('', index=frame.index, dtype=object)
+        series = frame[column]
+        return series.where(series.notna(), '').astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+    
+    def normalize(self, df):
+        """تنظيف الأعمدة دفعة واحدة (بدون تحقق)"""
+        import pandas as pd
+        
+        df = df.rename(columns=lambda column: str(column).strip().lower())
+        missing_columns = [col for col in ('name', 'email') if col not in df.columns]
+        if missing_columns:
+            raise ImportAborted(_('الأعمدة المفقودة: {}').format(', '.join(missing_columns)))
+        
+        frame = pd.DataFrame({
+            # رقم الصف في Excel (صف العناوين هو الأول)
+            'row': df.index + 2,
+            'name': self.text(df, 'name'),
+            'email': self.text(df, 'email').str.lower(),
+            'phone': self.text(df, 'phone'),
+        }, index=df.index)
+        names = frame['name'].str.split(' ', n=1, expand=True).reindex(columns=[0, 1]).fillna('')
+        frame['first_name'] = names[0]
+        frame['last_name'] = names[1]
+        self.prepare_extra(df, frame)
+        return frame
+    
+    def prepare(self, df):
+        """تنظيف الأعمدة والتحقق منها دفعة واحدة؛ يعيد الصفوف الصالحة فقط"""
+        import pandas as pd
+        
+        frame = self.normalize(df)
+        empty = (frame['name'] == '') | (frame['email'] == '')
+        duplicate = ~empty & (frame['email'].duplicated() | frame['email'].isin(self.seen_emails))
+        self.skipped += int(empty.sum() + duplicate.sum())
+        frame = frame[~empty & ~duplicate]
+        self.seen_emails.update(frame['email'])
+        
+        checks = (
+            (~frame['email'].str.match(EMAIL_PATTERN), _('بريد إلكتروني غير صالح')),
+            (frame['email'].str.len() > 254, _('البريد الإلكتروني أطول من 254 حرفاً')),
+            (frame['phone'].str.len() > 20, _('رقم الجوال أطول من 20 حرفاً')),
+            ((frame['first_name'].str.len() > 150) | (frame['last_name'].str.len() > 150), _('الاسم طويل جداً')),
+        )
+        invalid = pd.Series(False, index=frame.index)
+        for mask, message in checks:
+            mask = mask & ~invalid
+            for row, name in frame.loc[mask, ['row', 'name']].itertuples(index=False):
+                self.add_error(int(row), name, message)
+            invalid |= mask
+        return frame[~invalid]
+    
+    def prepare_extra(self, df, frame):
+        """أعمدة إضافية خاصة بنوع الاستيراد"""
+    
+    # ==================== Accounts ====================
+    
+    def generate_username(self, first_name, last_name):
+        """توليد اسم مستخدم فريد (مقابل الأسماء المحمّلة مسبقاً)"""
+        base = f"{first_name.lower()}{last_name.lower()}".replace(' ', '')[:15]
+        username = base
+        counter = 1
+        while username in self.by_username:
+            username = f"{base}{counter}"
+            counter += 1
+        return username
+    
+    def hash_passwords(self, passwords: List[str]) -> List[str]:
+        from accounts.provisioning import hash_passwords
+        return hash_passwords(passwords)
+    
+    @abstractmethod
+    def profile_model(self):
+        """نموذج الملف الشخصي لنوع الحساب"""
+    
+    @abstractmethod
+    def build_profile(self, user, row):
+        """ملف الحساب الجديد (غير محفوظ) من صفه"""
+    
+    def create_accounts(self, rows) -> Dict[int, 'User']:
+        """
+        إنشاء حسابات الصفوف بـ bulk_create. يعيد {فهرس الصف: المستخدم}
+        
+        bulk_create لا يرسل إشارات post_save، فتُحدّث الإحصائيات والتجميعات هنا.
+        """
+        from .rollups import daily_rollups
+        from .stats import dashboard_stats
+        
+        accounts = []
+        for row in rows.itertuples():
+            username = self.generate_username(row.first_name, row.last_name)
+            # حجز الاسم قبل الإنشاء حتى لا يتكرر داخل الدفعة
+            self.by_username[username] = None
+            accounts.append((row, username, generate_password()))
+        hashes = self.hash_passwords([account[2] for account in accounts])
+        
+        users = [
+            User(
+                username=username,
+                email=row.email,
+                password=password_hash,
+                first_name=row.first_name,
+                last_name=row.last_name,
+                phone=row.phone,
+                user_type=self.user_type,
+            )
+            for (row, username, password), password_hash in zip(accounts, hashes)
+        ]
+        
+        created = {}
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                self.profile_model().objects.bulk_create([
+                    self.build_profile(user, account[0]) for user, account in zip(users, accounts)
+                ])
+            created = {account[0].Index: user for user, account in zip(users, accounts)}
+        except Exception:
+            # إعادة الدفعة صفاً صفاً لنسب الخطأ إلى صفه
+            for user, (row, username, password) in zip(users, accounts):
+                user.pk = None
+                try:
+                    with transaction.atomic():
+                        User.objects.bulk_create([user])
+                        self.profile_model().objects.bulk_create([self.build_profile(user, row)])
+                except Exception as e:
+                    self.add_error(int(row.row), row.name, str(e))
+                    continue
+                created[row.Index] = user
+        
+        for user, (row, username, password) in zip(users, accounts):
+            if row.Index not in created:
+                continue
+            self.by_username[username] = user.pk
+            self.by_email.setdefault(row.email, user.pk)
+            self.created_users.append({
+                'id': user.pk,
+                'name': row.name,
+                'username': username,
+                'password': password,
+                'email': row.email,
+            })
+        
+        if created:
+            ids = [user.pk for user in created.values()]
+            daily_rollups.record(daily_rollups.collect(users=User.objects.filter(pk__in=ids)))
+            dashboard_stats.invalidate()
+        return created
+    
+    @abstractmethod
+    def import_rows(self, rows):
+        """استيراد دفعة صفوف صالحة ومراكمة عداداتها"""
+
+
+class StudentImporter(AccountImporter):
+    """استيراد الطلاب مع التوزيع التلقائي على الحلقات"""
+    
+    user_type = 'student'
+    
+    def profile_model(self):
+        from accounts.models import StudentProfile
+        return StudentProfile
+    
+    def build_profile(self, user, row):
+        from accounts.models import StudentProfile
+        return StudentProfile(user=user)
+    
+    def setup(self):
+        super().setup()
+        self.halaqat = []
+        # كل طالب ناجح أخذ دوره في التوزيع؛ الاستئناف يكمل من بعده
+        self.distributed = self.success_count
+        if self.job.auto_distribute:
+            self.halaqat = self.distribution_halaqat(self.job.distribution_count)
+            self.created_halaqat = [{'id': h.id, 'name': h.name} for h in self.halaqat]
+    
+    def distribution_halaqat(self, count):
+        """حلقات التوزيع بأسماء الصحابة (الموجودة تُستخدم كما هي)"""
+        from halaqat.models import Halaqa
+        
+        # الحصول على المشايخ النشطين
+        sheikhs = list(User.objects.filter(user_type='sheikh', is_active=True))
+        if not sheikhs:
+            raise ImportAborted(_('لا يوجد مشايخ نشطون للتوزيع'))
+        
+        # التأكد من عدم تجاوز عدد الحلقات المتاح
+        names = [f"حلقة {sahaba_name}" for sahaba_name, gender in SAHABA_NAMES[:count]]
+        existing = {}
+        for halaqa in Halaqa.objects.filter(name__in=names).order_by('pk'):
+            existing.setdefault(halaqa.name, halaqa)
+        
+        halaqat = []
+        for i, halaqa_name in enumerate(names):
+            halaqa = existing.get(halaqa_name)
+            if halaqa is None:
+                sahaba_name = SAHABA_NAMES[i][0]
+                halaqa = Halaqa.objects.create(
+                    name=halaqa_name,
+                    sheikh=sheikhs[i % len(sheikhs)],
+                    max_students=10,
+                    description=f"حلقة تسمية باسم الصحابي الجليل {sahaba_name} - من العشرة المبشرين بالجنة أو من الصحابة المبجلون"
+                )
+            halaqat.append(halaqa)
+        return halaqat
+    
+    def import_rows(self, rows):
+        import pandas as pd
+        # المستخدم الموجود يُطابق بالبريد أو باسم المستخدم
+        existing = rows['email'].map(self.by_email).fillna(rows['email'].map(self.by_username))
+        new_rows = rows[existing.isna()]
+        if not self.job.create_accounts:
+            self.skipped += len(new_rows)
+            new_rows = new_rows.iloc[:0]
+        
+        created = self.create_accounts(new_rows) if len(new_rows) else {}
+        students = []
+        for row in rows.itertuples():
+            user_id = existing[row.Index]
+            if row.Index in created:
+                user_id = created[row.Index].pk
+            elif pd.isna(user_id):
+                # صف جديد لم يُنشأ (متخطى أو فاشل)
+                continue
+            students.append((int(user_id), row))
+        
+        self.success_count += len(students)
+        if self.halaqat and students:
+            self.enroll(students)
+    
+    def enroll(self, students):
+        """توزيع دوري على الحلقات بـ bulk_create، مع إشعار شيخ كل حلقة"""
+        from accounts.utils import notify_new_halaqa_enrollment
+        from halaqat.models import HalaqaEnrollment
+        from .user_activity import user_activity
+        
+        enrolled = set(HalaqaEnrollment.objects.filter(
+            student_id__in=[user_id for user_id, row in students], halaqa__in=self.halaqat
+        ).values_list('student_id', 'halaqa_id'))
+        
+        enrollments = []
+        for user_id, row in students:
+            halaqa = self.halaqat[self.distributed % len(self.halaqat)]
+            self.distributed += 1
+            if (user_id, halaqa.pk) in enrolled:
+                continue
+            enrolled.add((user_id, halaqa.pk))
+            student = User(pk=user_id, first_name=row.first_name, last_name=row.last_name)
+            enrollments.append(HalaqaEnrollment(student=student, halaqa=halaqa, status='active'))
+        
+        try:
+            with transaction.atomic():
+                HalaqaEnrollment.objects.bulk_create(enrollments, batch_size=self.CHUNK_SIZE)
+        except IntegrityError:
+            # تسجيل متزامن لنفس الزوج بعد القراءة: يُدرج ما لم يُسجل بعد فقط، ليقتصر
+            # العد والإشعار على ما أُدرج فعلاً
+            taken = set(HalaqaEnrollment.objects.filter(
+                student_id__in=[enrollment.student_id for enrollment in enrollments], halaqa__in=self.halaqat
+            ).values_list('student_id', 'halaqa_id'))
+            enrollments = [
+                enrollment for enrollment in enrollments
+                if (enrollment.student_id, enrollment.halaqa_id) not in taken
+            ]
+            HalaqaEnrollment.objects.bulk_create(enrollments, batch_size=self.CHUNK_SIZE)
+        # bulk_create لا يرسل post_save الذي يُشعر الشيخ ويحدّث عدادات النشاط
+        user_activity.record({enrollment.student_id: Counter(halaqat_count=1) for enrollment in enrollments})
+        for enrollment in enrollments:
+            notify_new_halaqa_enrollment(enrollment)
+
+
+class SheikhImporter(AccountImporter):
+    """استيراد المشايخ"""
+    
+    user_type = 'sheikh'
+    
+    def profile_model(self):
+        from accounts.models import SheikhProfile
+        return SheikhProfile
+    
+    def prepare_extra(self, df, frame):
+        import pandas as pd
+        specialization = self.text(df, 'specialization').str.lower()
+        frame['specialization'] = specialization.where(specialization.isin(SPECIALIZATIONS), 'hifz')
+        experience = df['experience'] if 'experience' in df else pd.Series(0, index=df.index)
+        frame['experience'] = pd.to_numeric(experience, errors='coerce').fillna(0).clip(lower=0).astype(int)
+    
+    def build_profile(self, user, row):
+        from accounts.models import SheikhProfile
+        return SheikhProfile(
+            user=user,
+            specialization=row.specialization,
+            years_of_experience=row.experience
+        )
+    
+    def import_rows(self, rows):
+        # البريد المسجل مسبقاً يُتخطى
+        new_rows = rows[~rows['email'].isin(self.by_email)]
+        self.skipped += len(rows) - len(new_rows)
+        if not self.job.create_accounts:
+            self.skipped += len(new_rows)
+            return
+        if len(new_rows):
+            self.success_count += len(self.create_accounts(new_rows))
+
+
+IMPORTERS = {
+    'students': StudentImporter,
+    'sheikhs': SheikhImporter,
+}
+
+
+class ImportJobRunner:
+    """ينفذ عمليات ExcelImportJob بالترتيب، على أجزاء مع نقاط حفظ"""
+    
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+    
+    @property
+    def chunk_rows(self) -> int:
+        return getattr(settings, 'IMPORT_CHECKPOINT_ROWS', 500)
+    
+    @property
+    def run_in_web(self) -> bool:
+        return getattr(settings, 'IMPORT_RUN_IN_WEB', False)
+    
+    def enqueue(self, job_id: int):
+        """عملية جديدة أو مستأنفة (حالتها PENDING)؛ يأخذها العامل، أو خيط الويب مع IMPORT_RUN_IN_WEB"""
+        if self.run_in_web:
+            transaction.on_commit(lambda: self.submit(job_id))
+    
+    def submit(self, job_id: int):
+        self._ensure_started()
+        self._queue.put(job_id)
+    
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='import-jobs', daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self.run(job_id)
+            except Exception as e:
+                logger.exception(f"Import job {job_id} crashed: {e}")
+            finally:
+                connections.close_all()
+    
+    # ==================== Worker ====================
+    
+    def request_stop(self, *args):
+        """إيقاف آمن: العملية الجارية تعود معلقة عند حد الجزء التالي (يصلح كمعالج إشارة)"""
+        self._stop.set()
+    
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+    
+    def reclaim_stale(self) -> int:
+        """إعادة العمليات المتوقفة (انتهى منفذها دون نقطة حفظ) إلى الانتظار"""
+        from .models import ExcelImportJob
+        
+        cutoff = timezone.now() - ExcelImportJob.STALE_AFTER
+        reclaimed = 0
+        stale = ExcelImportJob.objects.filter(
+            status=ExcelImportJob.Status.PROCESSING, checkpoint_at__lt=cutoff
+        ).values_list('pk', 'checkpoint_at')
+        for pk, checkpoint_at in stale:
+            # مشروط بنقطة الحفظ نفسها: المنفذ القديم إن عاد يفشل حفظه التالي (ImportSuperseded)
+            reclaimed += ExcelImportJob.objects.filter(
+                pk=pk, status=ExcelImportJob.Status.PROCESSING, checkpoint_at=checkpoint_at
+            ).update(status=ExcelImportJob.Status.PENDING, cancel_requested=False)
+        if reclaimed:
+            logger.warning(f"Reclaimed {reclaimed} stale import jobs")
+        return reclaimed
+    
+    def run_pending(self, max_jobs: Optional[int] = None) -> int:
+        """تنفيذ العمليات المعلقة بالترتيب حتى تنفد أو يُطلب الإيقاف. يعيد عدد المنفذة"""
+        from .models import ExcelImportJob
+        
+        self.reclaim_stale()
+        done = 0
+        while not self.stopping and (max_jobs is None or done < max_jobs):
+            job_id = ExcelImportJob.objects.filter(
+                status=ExcelImportJob.Status.PENDING
+            ).order_by('created_at', 'pk').values_list('pk', flat=True).first()
+            if job_id is None:
+                break
+            if self.run(job_id) is not None:
+                done += 1
+        return done
+    
+    def work(self, poll_interval: float = 5.0, once: bool = False) -> int:
+        """حلقة العامل المستقل حتى طلب الإيقاف"""
+        total = 0
+        while not self.stopping:
+            try:
+                total += self.run_pending()
+            except Exception as e:
+                logger.exception(f"Import worker iteration failed: {e}")
+            finally:
+                close_old_connections()
+            if once:
+                break
+            self._stop.wait(poll_interval)
+        return total
+    
+    def release(self, job):
+        """إعادة العملية الجارية إلى الانتظار (عند إيقاف العامل)؛ تُستأنف من آخر نقطة حفظ"""
+        from .models import ExcelImportJob
+        
+        ExcelImportJob.objects.filter(
+            pk=job.pk, status=ExcelImportJob.Status.PROCESSING, checkpoint_at=job.checkpoint_at
+        ).update(status=ExcelImportJob.Status.PENDING)
+    
+    def run(self, job_id: int) -> Optional[str]:
+        """تنفيذ (أو استئناف) عملية واحدة. يعيد الحالة النهائية، أو None إذا أخذتها عملية أخرى"""
+        from .models import ExcelImportJob
+        
+        Status = ExcelImportJob.Status
+        now = timezone.now()
+        claimed = ExcelImportJob.objects.filter(pk=job_id, status=Status.PENDING).update(
+            status=Status.PROCESSING, checkpoint_at=now
+        )
+        if not claimed:
+            return None
+        job = ExcelImportJob.objects.get(pk=job_id)
+        if job.started_at is None:
+            job.started_at = now
+            ExcelImportJob.objects.filter(pk=job_id).update(started_at=now)
+        
+        try:
+            importer_class = IMPORTERS.get(job.import_type)
+            if importer_class is None:
+                raise ImportAborted(_('نوع استيراد غير معروف'))
+            df = read_sheet(job.file_path.path)
+            if job.total_rows != len(df):
+                job.total_rows = len(df)
+                ExcelImportJob.objects.filter(pk=job_id).update(total_rows=job.total_rows)
+            
+            importer = importer_class(job, job.created_by)
+            importer.setup()
+            importer.skip_rows(df.iloc[:job.processed_rows])
+            
+            for offset in range(job.processed_rows, len(df), self.chunk_rows):
+                if ExcelImportJob.objects.filter(pk=job_id, cancel_requested=True).exists():
+                    return self.finish(job, Status.CANCELLED)
+                if self.stopping:
+                    self.release(job)
+                    return None
+                chunk = df.iloc[offset:offset + self.chunk_rows]
+                with transaction.atomic():
+                    importer.process(chunk)
+                    importer.save_checkpoint(offset + len(chunk))
+        except ImportSuperseded:
+            logger.warning(f"Import job {job_id} was resumed elsewhere; stopping this run")
+            return None
+        except Exception as e:
+            if not isinstance(e, ImportAborted):
+                logger.exception(f"Import job {job_id} failed at row {job.processed_rows}: {e}")
+            return self.finish(job, Status.FAILED, error=str(e))
+        
+        return self.finish(job, Status.PARTIAL if job.failed_count else Status.COMPLETED)
+    
+    def finish(self, job, status: str, error: str = '') -> str:
+        from accounts.utils import create_notification
+        from .models import ExcelImportJob
+        
+        ExcelImportJob.objects.filter(pk=job.pk, status=ExcelImportJob.Status.PROCESSING).update(
+            status=status,
+            error_message=error,
+            cancel_requested=False,
+            completed_at=timezone.now(),
+        )
+        if status in (ExcelImportJob.Status.COMPLETED, ExcelImportJob.Status.PARTIAL):
+            create_notification(
+                job.created_by_id,
+                'system',
+                'اكتمل الاستيراد',
+                f'تم استيراد {job.success_count} صف بنجاح ({job.failed_count} فشل، {job.skipped_count} تخطي).',
+                link=reverse('dashboard:import_job_detail', args=[job.pk]),
+            )
+        return status
+
+
+import_runner = ImportJobRunner()
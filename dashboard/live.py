@@ -0,0 +1,238 @@
+"""
+بث الإشعارات الحية - Server-sent events for new notifications
+
+ناشر داخل العملية (NotificationHub): كُتّاب الإشعارات (الإشارات والصندوق الصادر)
+ينشرون الإشعار بعد نجاح المعاملة، وكل اتصال SSE مفتوح له طابور asyncio خاص به.
+نقطة البث عرض غير متزامن يخدمه tartil/asgi.py، فالاتصالات الخاملة لا تحجز خيطاً
+ولا عاملاً متزامناً، بل مجرد مهمة في حلقة الأحداث.
+
+النشر داخل العملية فقط: الإشعار المكتوب في عملية أخرى (عامل آخر أو أمر إدارة)
+يصل عند إعادة الاتصال التالية (كل MAX_STREAM_SECONDS على الأكثر) عبر استعلام لحاق
+واحد بمؤشر آخر إشعار مرسل؛ النبضات لا تستعلم قاعدة البيانات، فالاتصال المفتوح لا
+يحجز خيطاً ولا اتصال قاعدة بيانات بعد بدئه.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+
+ACCOUNTS = 'accounts'
+DASHBOARD = 'dashboard'
+SOURCES = (ACCOUNTS, DASHBOARD)
+
+EVENT_FIELDS = ('id', 'notification_type', 'title', 'message', 'link')
+
+
+def _models():
+    from accounts.models import Notification as AccountNotification
+    from .models import Notification as DashboardNotification
+    return {ACCOUNTS: AccountNotification, DASHBOARD: DashboardNotification}
+
+
+def notification_event(source: str, notification) -> dict:
+    """تمثيل الإشعار كحدث قابل للتحويل إلى JSON"""
+    event = {field: getattr(notification, field) for field in EVENT_FIELDS}
+    event['source'] = source
+    return event
+
+
+class Subscription:
+    """اشتراك اتصال واحد: طابور محدود في حلقة أحداث الاتصال"""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, event: dict):
+        # المستهلك البطيء يفقد أقدم حدث، ويعوضه استعلام اللحاق
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    def deliver(self, event: dict):
+        """آمنة للاستدعاء من أي خيط"""
+        self.loop.call_soon_threadsafe(self._put, event)
+
+
+class NotificationHub:
+    """ناشر/مشترك داخل العملية مفهرس بالمستخدم"""
+
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, events: Iterable[Tuple[int, dict]]):
+        """نشر (معرف المستخدم، الحدث). بلا مشتركين لا يكلف سوى بحث في قاموس"""
+        if not self._subscribers:
+            return
+        for user_id, event in events:
+            with self._lock:
+                subscribers = list(self._subscribers.get(user_id, ()))
+            for subscription in subscribers:
+                try:
+                    subscription.deliver(event)
+                except RuntimeError:
+                    # حلقة الاتصال أُغلقت
+                    self.unsubscribe(subscription)
+
+    def publish_on_commit(self, events: Iterable[Tuple[int, dict]]):
+        """النشر بعد نجاح المعاملة الحالية (أو فوراً خارج المعاملات)"""
+        if self._subscribers:
+            events = list(events)
+            transaction.on_commit(lambda: self.publish(events))
+
+
+hub = NotificationHub()
+
+
+# ==================== SSE endpoint ====================
+
+class StreamCursor:
+    """آخر معرف مرسل لكل مصدر، ويُرسل كمعرف الحدث ليستأنف منه المتصفح (Last-Event-ID)"""
+
+    def __init__(self, last_ids: Dict[str, int]):
+        self.last_ids = last_ids
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Optional['StreamCursor']:
+        try:
+            ids = [int(part) for part in (value or '').split('-')]
+        except ValueError:
+            return None
+        if len(ids) != len(SOURCES):
+            return None
+        return cls(dict(zip(SOURCES, ids)))
+
+    @classmethod
+    def latest(cls, user_id: int) -> 'StreamCursor':
+        last_ids = {}
+        for source, model in _models().items():
+            last_ids[source] = (
+                model.objects.filter(user_id=user_id).order_by('-pk').values_list('pk', flat=True).first() or 0
+            )
+        return cls(last_ids)
+
+    def __str__(self):
+        return '-'.join(str(self.last_ids[source]) for source in SOURCES)
+
+    def advance(self, event: dict) -> bool:
+        """False إذا سبق إرسال الحدث"""
+        event_id = event.get('id')
+        if event_id is None:
+            return True
+        if event_id <= self.last_ids[event['source']]:
+            return False
+        self.last_ids[event['source']] = event_id
+        return True
+
+    def missed_events(self, user_id: int, limit: int):
+        """الإشعارات الأحدث من المؤشر (من عمليات أخرى أو أثناء إعادة الاتصال)"""
+        events = []
+        for source, model in _models().items():
+            rows = (
+                model.objects.filter(user_id=user_id, pk__gt=self.last_ids[source])
+                .order_by('pk')
+                .values(*EVENT_FIELDS)[:limit]
+            )
+            events.extend(dict(row, source=source) for row in rows)
+        return events
+
+
+class NotificationStream:
+    """توليد تدفق text/event-stream لاتصال واحد"""
+
+    HEARTBEAT_SECONDS = 20
+    # مدة الاتصال القصوى؛ المتصفح يعيد الاتصال تلقائياً ويستأنف من Last-Event-ID،
+    # واللحاق عند إعادة الاتصال يجلب ما كُتب في العمليات الأخرى
+    MAX_STREAM_SECONDS = 120
+    RETRY_MILLISECONDS = 3000
+    CATCH_UP_LIMIT = 50
+
+    def __init__(self, user_id: int, cursor: StreamCursor):
+        self.user_id = user_id
+        self.cursor = cursor
+
+    def format_event(self, event: dict) -> str:
+        data = json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False)
+        return f"id: {self.cursor}\nevent: notification\ndata: {data}\n\n"
+
+    async def catch_up(self):
+        events = await sync_to_async(self.cursor.missed_events)(self.user_id, self.CATCH_UP_LIMIT)
+        return [self.format_event(event) for event in events if self.cursor.advance(event)]
+
+    async def __aiter__(self):
+        subscription = hub.subscribe(self.user_id)
+        try:
+            yield f"retry: {self.RETRY_MILLISECONDS}\n\n"
+            # الاشتراك قبل اللحاق حتى لا يضيع إشعار بينهما
+            for chunk in await self.catch_up():
+                yield chunk
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.MAX_STREAM_SECONDS
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=min(self.HEARTBEAT_SECONDS, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                if self.cursor.advance(event):
+                    yield self.format_event(event)
+        finally:
+            hub.unsubscribe(subscription)
+
+
+async def notification_stream(request):
+    """نقطة SSE للإشعارات الجديدة للمستخدم الحالي"""
+    # مزخرفات require_http_methods متزامنة في Django 4.2 فلا تصلح للعرض غير المتزامن
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    user = await sync_to_async(get_user)(request)
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        # تحت WSGI يحجز كل اتصال عاملاً كاملاً؛ 204 توقف إعادة اتصال EventSource
+        return HttpResponse(status=204)
+
+    cursor = StreamCursor.parse(request.headers.get('Last-Event-ID'))
+    if cursor is None:
+        cursor = await sync_to_async(StreamCursor.latest)(user.pk)
+
+    response = StreamingHttpResponse(
+        NotificationStream(user.pk, cursor),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # تعطيل تخزين nginx المؤقت للتدفق
+    return response
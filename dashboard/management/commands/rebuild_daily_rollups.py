@@ -0,0 +1,60 @@
+"""
+أمر إدارة: إعادة بناء التجميعات اليومية من السجلات الخام
+Management Command: Backfill / rebuild daily rollup tables
+
+Usage:
+    python manage.py rebuild_daily_rollups                # كل التاريخ
+    python manage.py rebuild_daily_rollups --days 30
+    python manage.py rebuild_daily_rollups --start 2024-01-01 --end 2024-12-31
+"""
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard.rollups import daily_rollups
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء جداول التجميع اليومية (DailyStats و DailyHalaqaStats) من السجلات الخام'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='إعادة بناء آخر هذا العدد من الأيام فقط'
+        )
+        parser.add_argument(
+            '--start',
+            help='تاريخ البداية YYYY-MM-DD (افتراضي: أقدم سجل)'
+        )
+        parser.add_argument(
+            '--end',
+            help='تاريخ النهاية YYYY-MM-DD (افتراضي: اليوم)'
+        )
+    
+    def parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'تاريخ غير صالح: {value}')
+    
+    def handle(self, *args, **options):
+        end = self.parse_date(options['end']) if options['end'] else timezone.localdate()
+        if options['start']:
+            start = self.parse_date(options['start'])
+        elif options['days']:
+            start = end - timedelta(days=options['days'] - 1)
+        else:
+            start = daily_rollups.earliest_date()
+            if start is None:
+                self.stdout.write(self.style.NOTICE('لا توجد سجلات لبنائها'))
+                return
+        if start > end:
+            raise CommandError('تاريخ البداية بعد تاريخ النهاية')
+        
+        written = daily_rollups.rebuild(start, end)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'تم بناء {written} صف تجميع للفترة {start} - {end}')
+        )
@@ -0,0 +1,31 @@
+"""
+أمر إدارة: إعادة حساب عدادات نشاط المستخدمين من السجلات الخام
+Management Command: Rebuild denormalized per-user activity counters
+
+Usage:
+    python manage.py rebuild_user_activity             # كل المستخدمين
+    python manage.py rebuild_user_activity --user 12 --user 15
+"""
+from django.core.management.base import BaseCommand
+
+from dashboard.user_activity import user_activity
+
+
+class Command(BaseCommand):
+    help = 'إعادة حساب جدول UserActivity (الحلقات، الحضور، التسميعات) من السجلات الخام'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='معرف مستخدم (يمكن تكراره)؛ افتراضياً كل المستخدمين'
+        )
+    
+    def handle(self, *args, **options):
+        written = user_activity.rebuild(options['users'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'تم تحديث عدادات {written} مستخدم')
+        )
@@ -0,0 +1,39 @@
+"""
+أمر إدارة: تشغيل عامل تصدير التقارير المستقل
+Management Command: Run the report export worker
+
+Usage:
+    python manage.py run_export_worker
+    python manage.py run_export_worker --poll-interval 2
+    python manage.py run_export_worker --once
+"""
+import signal
+from django.core.management.base import BaseCommand
+from dashboard.exports import export_runner
+
+
+class Command(BaseCommand):
+    help = 'تشغيل عامل مستقل لعمليات تصدير التقارير الكبيرة (يأخذ العمليات المعلقة والمتوقفة تلقائياً)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='مدة الانتظار بالثواني عند عدم وجود عمليات معلقة (افتراضي: 5)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='تنفيذ العمليات المعلقة ثم الخروج (مناسب لـ cron)'
+        )
+    
+    def handle(self, *args, **options):
+        signal.signal(signal.SIGTERM, export_runner.request_stop)
+        signal.signal(signal.SIGINT, export_runner.request_stop)
+        
+        self.stdout.write(self.style.NOTICE('بدء عامل التصدير'))
+        
+        done = export_runner.work(poll_interval=options['poll_interval'], once=options['once'])
+        
+        self.stdout.write(self.style.SUCCESS(f'تم إيقاف عامل التصدير | عمليات منفذة: {done}'))
@@ -0,0 +1,39 @@
+"""
+أمر إدارة: تشغيل عامل استيراد Excel المستقل
+Management Command: Run the Excel import worker
+
+Usage:
+    python manage.py run_import_worker
+    python manage.py run_import_worker --poll-interval 2
+    python manage.py run_import_worker --once
+"""
+import signal
+from django.core.management.base import BaseCommand
+from dashboard.importer import import_runner
+
+
+class Command(BaseCommand):
+    help = 'تشغيل عامل مستقل لعمليات استيراد Excel (يأخذ العمليات المعلقة والمتوقفة تلقائياً)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='مدة الانتظار بالثواني عند عدم وجود عمليات معلقة (افتراضي: 5)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='تنفيذ العمليات المعلقة ثم الخروج (مناسب لـ cron)'
+        )
+    
+    def handle(self, *args, **options):
+        signal.signal(signal.SIGTERM, import_runner.request_stop)
+        signal.signal(signal.SIGINT, import_runner.request_stop)
+        
+        self.stdout.write(self.style.NOTICE('بدء عامل الاستيراد'))
+        
+        done = import_runner.work(poll_interval=options['poll_interval'], once=options['once'])
+        
+        self.stdout.write(self.style.SUCCESS(f'تم إيقاف عامل الاستيراد | عمليات منفذة: {done}'))
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+BATCH_SIZE = 1000
+
+
+def _m2m_pairs(Message, field_name):
+    """أزواج (رسالة، مستخدم) من جدول M2M التلقائي"""
+    field = Message._meta.get_field(field_name)
+    through = field.remote_field.through
+    return through, field.m2m_column_name(), field.m2m_reverse_name()
+
+
+def copy_to_statuses(apps, schema_editor):
+    """نقل recipients و read_by إلى صفوف MessageStatus"""
+    Message = apps.get_model('dashboard', 'Message')
+    MessageStatus = apps.get_model('dashboard', 'MessageStatus')
+    now = timezone.now()
+
+    # المقروءة أولاً، ثم بقية المستلمين (ignore_conflicts يحفظ حالة القراءة)
+    for field_name, read_at in (('read_by', now), ('recipients', None)):
+        through, message_column, user_column = _m2m_pairs(Message, field_name)
+        pairs = through.objects.order_by('pk').values_list(message_column, user_column)
+        batch = []
+        for message_id, user_id in pairs.iterator(chunk_size=BATCH_SIZE):
+            batch.append(MessageStatus(message_id=message_id, user_id=user_id, read_at=read_at))
+            if len(batch) >= BATCH_SIZE:
+                MessageStatus.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        MessageStatus.objects.bulk_create(batch, ignore_conflicts=True)
+
+    MessageStatus.objects.filter(message__is_archived=True).update(is_archived=True)
+
+
+def copy_from_statuses(apps, schema_editor):
+    Message = apps.get_model('dashboard', 'Message')
+    MessageStatus = apps.get_model('dashboard', 'MessageStatus')
+
+    for field_name, statuses in (
+        ('recipients', MessageStatus.objects.all()),
+        ('read_by', MessageStatus.objects.filter(read_at__isnull=False)),
+    ):
+        through, message_column, user_column = _m2m_pairs(Message, field_name)
+        batch = []
+        for message_id, user_id in statuses.order_by('pk').values_list('message_id', 'user_id').iterator():
+            batch.append(through(**{message_column: message_id, user_column: user_id}))
+            if len(batch) >= BATCH_SIZE:
+                through.objects.bulk_create(batch)
+                batch = []
+        through.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0002_notification_message_excelimportjob_alert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ القراءة')),
+                ('is_archived', models.BooleanField(default=False, verbose_name='مؤرشفة')),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statuses', to='dashboard.message', verbose_name='الرسالة')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_statuses', to=settings.AUTH_USER_MODEL, verbose_name='المستلم')),
+            ],
+            options={
+                'verbose_name': 'حالة رسالة',
+                'verbose_name_plural': 'حالات الرسائل',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='messagestatus',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['user', 'message'], name='message_status_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='messagestatus',
+            index=models.Index(condition=models.Q(('is_archived', False), ('read_at__isnull', True)), fields=['user', 'message'], name='message_status_unread_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='messagestatus',
+            constraint=models.UniqueConstraint(fields=('message', 'user'), name='unique_message_status'),
+        ),
+        migrations.RunPython(copy_to_statuses, copy_from_statuses),
+        # لا يمكن إضافة through لحقل M2M موجود، فيُحذف الحقل ويُعاد بجدول الوسيط
+        migrations.RemoveField(
+            model_name='message',
+            name='read_by',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='recipients',
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='recipients',
+            field=models.ManyToManyField(blank=True, related_name='received_messages', through='dashboard.MessageStatus', to=settings.AUTH_USER_MODEL, verbose_name='المستلمون'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('halaqat', '0001_initial'),
+        ('dashboard', '0003_message_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHalaqaStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='اليوم')),
+                ('sessions_count', models.IntegerField(default=0, verbose_name='الجلسات')),
+                ('recitations_new', models.IntegerField(default=0, verbose_name='تسميع حفظ جديد')),
+                ('recitations_review', models.IntegerField(default=0, verbose_name='تسميع مراجعة')),
+                ('recitations_tilawa', models.IntegerField(default=0, verbose_name='تسميع تلاوة')),
+                ('grade_sum', models.DecimalField(decimal_places=1, default=0, max_digits=14, verbose_name='مجموع الدرجات')),
+                ('attendance_present', models.IntegerField(default=0, verbose_name='حضور')),
+                ('attendance_absent', models.IntegerField(default=0, verbose_name='غياب')),
+                ('attendance_excused', models.IntegerField(default=0, verbose_name='غياب بعذر')),
+                ('attendance_late', models.IntegerField(default=0, verbose_name='تأخر')),
+            ],
+            options={
+                'verbose_name': 'إحصائية يومية لحلقة',
+                'verbose_name_plural': 'الإحصائيات اليومية للحلقات',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='اليوم')),
+                ('sessions_count', models.IntegerField(default=0, verbose_name='الجلسات')),
+                ('recitations_new', models.IntegerField(default=0, verbose_name='تسميع حفظ جديد')),
+                ('recitations_review', models.IntegerField(default=0, verbose_name='تسميع مراجعة')),
+                ('recitations_tilawa', models.IntegerField(default=0, verbose_name='تسميع تلاوة')),
+                ('grade_sum', models.DecimalField(decimal_places=1, default=0, max_digits=14, verbose_name='مجموع الدرجات')),
+                ('attendance_present', models.IntegerField(default=0, verbose_name='حضور')),
+                ('attendance_absent', models.IntegerField(default=0, verbose_name='غياب')),
+                ('attendance_excused', models.IntegerField(default=0, verbose_name='غياب بعذر')),
+                ('attendance_late', models.IntegerField(default=0, verbose_name='تأخر')),
+                ('new_users', models.IntegerField(default=0, verbose_name='مستخدمون جدد')),
+                ('new_students', models.IntegerField(default=0, verbose_name='طلاب جدد')),
+                ('new_sheikhs', models.IntegerField(default=0, verbose_name='مشايخ جدد')),
+            ],
+            options={
+                'verbose_name': 'إحصائية يومية',
+                'verbose_name_plural': 'الإحصائيات اليومية',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailystats',
+            constraint=models.UniqueConstraint(fields=('date',), name='unique_daily_stats_date'),
+        ),
+        migrations.AddField(
+            model_name='dailyhalaqastats',
+            name='halaqa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='halaqat.halaqa', verbose_name='الحلقة'),
+        ),
+        migrations.AddField(
+            model_name='dailyhalaqastats',
+            name='sheikh',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_halaqa_stats', to=settings.AUTH_USER_MODEL, verbose_name='الشيخ'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyhalaqastats',
+            index=models.Index(fields=['sheikh', 'date'], name='daily_halaqa_stats_sheikh_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyhalaqastats',
+            index=models.Index(fields=['date'], name='daily_halaqa_stats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyhalaqastats',
+            constraint=models.UniqueConstraint(fields=('halaqa', 'date'), name='unique_daily_halaqa_stats'),
+        ),
+    ]
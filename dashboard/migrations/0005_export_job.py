@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0004_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(max_length=20, verbose_name='نوع التقرير')),
+                ('export_format', models.CharField(choices=[('xlsx', 'Excel'), ('csv', 'CSV'), ('ndjson', 'NDJSON')], default='xlsx', max_length=10, verbose_name='الصيغة')),
+                ('start_date', models.DateField(verbose_name='من تاريخ')),
+                ('end_date', models.DateField(verbose_name='إلى تاريخ')),
+                ('status', models.CharField(choices=[('pending', 'قيد الانتظار'), ('processing', 'جاري المعالجة'), ('completed', 'مكتمل'), ('failed', 'فشل')], default='pending', max_length=20, verbose_name='الحالة')),
+                ('file', models.FileField(blank=True, upload_to='exports/', verbose_name='الملف')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='عدد الصفوف')),
+                ('error_message', models.TextField(blank=True, verbose_name='رسالة الخطأ')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ البدء')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الإكمال')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='تم الإنشاء بواسطة')),
+            ],
+            options={
+                'verbose_name': 'عملية تصدير',
+                'verbose_name_plural': 'عمليات التصدير',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_export_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='excelimportjob',
+            name='cancel_requested',
+            field=models.BooleanField(default=False, verbose_name='طلب الإلغاء'),
+        ),
+        migrations.AddField(
+            model_name='excelimportjob',
+            name='checkpoint_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='آخر نقطة حفظ'),
+        ),
+        migrations.AddField(
+            model_name='excelimportjob',
+            name='error_message',
+            field=models.TextField(blank=True, verbose_name='رسالة الخطأ'),
+        ),
+        migrations.AddField(
+            model_name='excelimportjob',
+            name='processed_rows',
+            field=models.PositiveIntegerField(default=0, verbose_name='الصفوف المعالجة'),
+        ),
+        migrations.AlterField(
+            model_name='excelimportjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'قيد الانتظار'), ('processing', 'جاري المعالجة'), ('completed', 'مكتمل'), ('partial', 'مكتمل جزئياً'), ('failed', 'فشل'), ('cancelled', 'ملغاة')], default='pending', max_length=20, verbose_name='الحالة'),
+        ),
+    ]
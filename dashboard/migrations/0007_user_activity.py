@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_user_activity(apps, schema_editor):
+    """حساب العدادات الأولية من الجداول الخام (استعلام تجميع واحد لكل نموذج)"""
+    from collections import Counter, defaultdict
+    from django.db.models import Count
+
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserActivity = apps.get_model('dashboard', 'UserActivity')
+    counts = defaultdict(Counter)
+    for app_label, model_name, field in (
+        ('halaqat', 'HalaqaEnrollment', 'halaqat_count'),
+        ('halaqat', 'Attendance', 'sessions_count'),
+        ('recitation', 'RecitationRecord', 'recitations_count'),
+    ):
+        queryset = apps.get_model(app_label, model_name).objects.order_by().values('student_id')
+        for row in queryset.annotate(total=Count('id')):
+            counts[row['student_id']][field] = row['total']
+    UserActivity.objects.bulk_create([
+        UserActivity(user_id=user_id, **counts[user_id])
+        for user_id in User.objects.values_list('pk', flat=True).iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_activity_log_event_time'),
+        ('dashboard', '0006_import_job_checkpoint'),
+        ('halaqat', '0001_initial'),
+        ('recitation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserActivity',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity_counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='المستخدم')),
+                ('halaqat_count', models.IntegerField(default=0, verbose_name='تسجيلات الحلقات')),
+                ('sessions_count', models.IntegerField(default=0, verbose_name='سجلات الحضور')),
+                ('recitations_count', models.IntegerField(default=0, verbose_name='التسميعات')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'عدادات نشاط مستخدم',
+                'verbose_name_plural': 'عدادات نشاط المستخدمين',
+                'indexes': [models.Index(fields=['halaqat_count'], name='user_activity_halaqat_idx'), models.Index(fields=['sessions_count'], name='user_activity_sessions_idx'), models.Index(fields=['recitations_count'], name='user_activity_recit_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_user_activity, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,7 @@ from django.db import models
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
+from datetime import timedelta
 import json
 
 
@@ -305,6 +306,7 @@ class Message(models.Model):
     )
     recipients = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
+        through='MessageStatus',
         related_name='received_messages',
         verbose_name=_('المستلمون'),
         blank=True
@@ -326,14 +328,6 @@ class Message(models.Model):
     subject = models.CharField(_('الموضوع'), max_length=200)
     content = models.TextField(_('المحتوى'))
     
-    # حالة القراءة
-    read_by = models.ManyToManyField(
-        settings.AUTH_USER_MODEL,
-        related_name='read_messages',
-        verbose_name=_('تم القراءة بواسطة'),
-        blank=True
-    )
-    
     # مرفقات
     attachments = models.JSONField(_('المرفقات'), default=list, blank=True)
     
@@ -355,21 +349,92 @@ class Message(models.Model):
     
     def is_read_by(self, user):
         """هل قرأها المستخدم؟"""
-        return self.read_by.filter(id=user.id).exists()
+        return self.statuses.filter(user=user, read_at__isnull=False).exists()
     
     def mark_as_read(self, user):
-        """تحديد كمقروءة"""
-        if not self.is_read_by(user):
-            self.read_by.add(user)
+        """تحديد كمقروءة (تحديث واحد لصف حالة المستخدم)"""
+        from .counters import UserCounters
+        if self.statuses.filter(user=user, read_at__isnull=True).update(read_at=timezone.now()):
+            UserCounters.invalidate([user.pk], UserCounters.MESSAGES)
+    
+    def deliver(self, user_ids, batch_size=500):
+        """
+        إضافة مستلمين بإدراج صفوف الحالة على دفعات (للرسائل الجماعية)
+        
+        المستلم الموجود مسبقاً يُتجاهل. يعيد عدد المستلمين المرسل إليهم.
+        """
+        from .counters import UserCounters
+        user_ids = list(dict.fromkeys(user_ids))
+        for start in range(0, len(user_ids), batch_size):
+            chunk = user_ids[start:start + batch_size]
+            MessageStatus.objects.bulk_create(
+                [MessageStatus(message=self, user_id=user_id, is_archived=self.is_archived) for user_id in chunk],
+                ignore_conflicts=True,
+            )
+            # bulk_create لا يرسل إشارات
+            UserCounters.invalidate(chunk, UserCounters.MESSAGES)
+        return len(user_ids)
     
     @property
     def unread_count(self):
         """عدد غير المقروءة"""
         if self.message_type == self.MessageType.BROADCAST:
-            return self.recipients.count() - self.read_by.count()
+            return self.statuses.filter(read_at__isnull=True).count()
         return 0
 
 
+class MessageStatus(models.Model):
+    """
+    حالة الرسالة لكل مستلم (جدول الوسيط لـ Message.recipients)
+    
+    صف واحد لكل (رسالة، مستلم) يحمل القراءة والأرشفة، فعدد غير المقروء
+    وقائمة الوارد مسح نطاق في فهرس المستخدم بدل ربط جدولي M2M.
+    """
+    
+    message = models.ForeignKey(
+        Message,
+        on_delete=models.CASCADE,
+        related_name='statuses',
+        verbose_name=_('الرسالة')
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='message_statuses',
+        verbose_name=_('المستلم')
+    )
+    read_at = models.DateTimeField(_('تاريخ القراءة'), null=True, blank=True)
+    is_archived = models.BooleanField(_('مؤرشفة'), default=False)
+    
+    class Meta:
+        verbose_name = _('حالة رسالة')
+        verbose_name_plural = _('حالات الرسائل')
+        constraints = [
+            models.UniqueConstraint(fields=['message', 'user'], name='unique_message_status'),
+        ]
+        indexes = [
+            # قائمة الوارد (غير المؤرشف) مرتبة بالرسالة الأحدث
+            models.Index(
+                fields=['user', 'message'],
+                condition=models.Q(is_archived=False),
+                name='message_status_inbox_idx',
+            ),
+            # فهرس جزئي لغير المقروء فقط
+            models.Index(
+                fields=['user', 'message'],
+                condition=models.Q(read_at__isnull=True, is_archived=False),
+                name='message_status_unread_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.message_id} → {self.user_id}"
+    
+    @property
+    def is_read(self):
+        return self.read_at is not None
+
+
 class Notification(models.Model):
     """نموذج الإشعارات"""
     
@@ -423,6 +488,10 @@ class Notification(models.Model):
         verbose_name = _('إشعار')
         verbose_name_plural = _('الإشعارات')
         ordering = ['-created_at']
+        indexes = [
+            # قائمة إشعارات المستخدم بالمؤشر (dashboard.pagination)
+            models.Index(fields=['user', 'created_at', 'id'], name='notification_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
@@ -539,6 +608,7 @@ class ExcelImportJob(models.Model):
         COMPLETED = 'completed', _('مكتمل')
         PARTIAL = 'partial', _('مكتمل جزئياً')
         FAILED = 'failed', _('فشل')
+        CANCELLED = 'cancelled', _('ملغاة')
     
     import_type = models.CharField(
         _('نوع الاستيراد'),
@@ -571,6 +641,12 @@ class ExcelImportJob(models.Model):
     failed_count = models.PositiveIntegerField(_('الفشل'), default=0)
     skipped_count = models.PositiveIntegerField(_('التخطي'), default=0)
     
+    # نقطة الاستئناف: عدد صفوف الورقة المعالجة (تُحفظ مع بيانات كل جزء في نفس المعاملة)
+    processed_rows = models.PositiveIntegerField(_('الصفوف المعالجة'), default=0)
+    checkpoint_at = models.DateTimeField(_('آخر نقطة حفظ'), null=True, blank=True)
+    cancel_requested = models.BooleanField(_('طلب الإلغاء'), default=False)
+    error_message = models.TextField(_('رسالة الخطأ'), blank=True)
+    
     errors_log = models.JSONField(_('سجل الأخطاء'), default=list, blank=True)
     created_users = models.JSONField(_('المستخدمون المنشأون'), default=list, blank=True)
     created_halaqat = models.JSONField(_('الحلقات المنشأة'), default=list, blank=True)
@@ -595,6 +671,31 @@ class ExcelImportJob(models.Model):
     def __str__(self):
         return f"{self.get_import_type_display()} - {self.file_name}"
     
+    # عملية قيد المعالجة بلا نقطة حفظ منذ هذه المدة تُعد متوقفة (انتهى العامل)
+    STALE_AFTER = timedelta(minutes=10)
+    
+    @property
+    def progress(self):
+        """نسبة التقدم"""
+        if not self.total_rows:
+            return 100 if self.status in (self.Status.COMPLETED, self.Status.PARTIAL) else 0
+        return min(100, round(self.processed_rows * 100 / self.total_rows))
+    
+    @property
+    def is_active(self):
+        return self.status in (self.Status.PENDING, self.Status.PROCESSING)
+    
+    @property
+    def is_stale(self):
+        """عملية لم يتقدم منفذها (أو فُقدت من الطابور بإعادة تشغيل الخادم)"""
+        last_seen = self.checkpoint_at or self.started_at or self.created_at
+        return self.is_active and last_seen is not None and timezone.now() - last_seen > self.STALE_AFTER
+    
+    @property
+    def can_resume(self):
+        """الاستئناف من آخر نقطة حفظ بعد الإلغاء أو الفشل أو توقف العامل"""
+        return self.status in (self.Status.FAILED, self.Status.CANCELLED) or self.is_stale
+    
     @property
     def duration(self):
         """مدة المعالجة"""
@@ -602,3 +703,188 @@ class ExcelImportJob(models.Model):
             delta = self.completed_at - self.started_at
             return delta.total_seconds()
         return None
+
+
+class ExportJob(models.Model):
+    """تصدير تقرير كبير في الخلفية إلى ملف قابل للتحميل (dashboard.exports)"""
+    
+    class Format(models.TextChoices):
+        XLSX = 'xlsx', _('Excel')
+        CSV = 'csv', _('CSV')
+        NDJSON = 'ndjson', _('NDJSON')
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('قيد الانتظار')
+        PROCESSING = 'processing', _('جاري المعالجة')
+        COMPLETED = 'completed', _('مكتمل')
+        FAILED = 'failed', _('فشل')
+    
+    report_type = models.CharField(_('نوع التقرير'), max_length=20)
+    export_format = models.CharField(
+        _('الصيغة'),
+        max_length=10,
+        choices=Format.choices,
+        default=Format.XLSX
+    )
+    start_date = models.DateField(_('من تاريخ'))
+    end_date = models.DateField(_('إلى تاريخ'))
+    
+    status = models.CharField(
+        _('الحالة'),
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    file = models.FileField(_('الملف'), upload_to='exports/', blank=True)
+    row_count = models.PositiveIntegerField(_('عدد الصفوف'), default=0)
+    error_message = models.TextField(_('رسالة الخطأ'), blank=True)
+    
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+        verbose_name=_('تم الإنشاء بواسطة')
+    )
+    
+    started_at = models.DateTimeField(_('تاريخ البدء'), null=True, blank=True)
+    completed_at = models.DateTimeField(_('تاريخ الإكمال'), null=True, blank=True)
+    created_at = models.DateTimeField(_('تاريخ الإنشاء'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('عملية تصدير')
+        verbose_name_plural = _('عمليات التصدير')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.report_type} ({self.export_format}) - {self.created_at:%Y-%m-%d}"
+    
+    # عملية قيد المعالجة لم تكتمل خلال هذه المدة من بدئها تُعد متوقفة (انتهى العامل)
+    STALE_AFTER = timedelta(minutes=30)
+    
+    @property
+    def filename(self):
+        return f"report_{self.report_type}_{self.start_date}.{self.export_format}"
+    
+    @property
+    def duration(self):
+        """مدة المعالجة"""
+        if self.started_at and self.completed_at:
+            return (self.completed_at - self.started_at).total_seconds()
+        return None
+
+class DailyCounts(models.Model):
+    """
+    عدادات النشاط اليومي المشتركة بين جداول التجميع
+    
+    تُحدّث تزايدياً من إشارات السجلات الخام (dashboard.rollups) وتُعاد
+    بناؤها بالأمر rebuild_daily_rollups، فرسوم السنة تقرأ 365 صفاً على الأكثر.
+    """
+    
+    date = models.DateField(_('اليوم'))
+    sessions_count = models.IntegerField(_('الجلسات'), default=0)
+    recitations_new = models.IntegerField(_('تسميع حفظ جديد'), default=0)
+    recitations_review = models.IntegerField(_('تسميع مراجعة'), default=0)
+    recitations_tilawa = models.IntegerField(_('تسميع تلاوة'), default=0)
+    grade_sum = models.DecimalField(_('مجموع الدرجات'), max_digits=14, decimal_places=1, default=0)
+    attendance_present = models.IntegerField(_('حضور'), default=0)
+    attendance_absent = models.IntegerField(_('غياب'), default=0)
+    attendance_excused = models.IntegerField(_('غياب بعذر'), default=0)
+    attendance_late = models.IntegerField(_('تأخر'), default=0)
+    
+    class Meta:
+        abstract = True
+    
+    @property
+    def recitations_count(self):
+        return self.recitations_new + self.recitations_review + self.recitations_tilawa
+    
+    @property
+    def attendance_count(self):
+        return self.attendance_present + self.attendance_absent + self.attendance_excused + self.attendance_late
+
+
+class DailyStats(DailyCounts):
+    """تجميع يومي على مستوى المنصة"""
+    
+    new_users = models.IntegerField(_('مستخدمون جدد'), default=0)
+    new_students = models.IntegerField(_('طلاب جدد'), default=0)
+    new_sheikhs = models.IntegerField(_('مشايخ جدد'), default=0)
+    
+    class Meta:
+        verbose_name = _('إحصائية يومية')
+        verbose_name_plural = _('الإحصائيات اليومية')
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date'], name='unique_daily_stats_date'),
+        ]
+    
+    def __str__(self):
+        return str(self.date)
+
+
+class DailyHalaqaStats(DailyCounts):
+    """
+    تجميع يومي لكل حلقة، مع شيخ الحلقة وقت النشاط
+    
+    تجميع الشيخ مسح للفهرس (sheikh, date) مجمّع حسب اليوم.
+    """
+    
+    halaqa = models.ForeignKey(
+        'halaqat.Halaqa',
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name=_('الحلقة')
+    )
+    sheikh = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_halaqa_stats',
+        verbose_name=_('الشيخ')
+    )
+    
+    class Meta:
+        verbose_name = _('إحصائية يومية لحلقة')
+        verbose_name_plural = _('الإحصائيات اليومية للحلقات')
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['halaqa', 'date'], name='unique_daily_halaqa_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['sheikh', 'date'], name='daily_halaqa_stats_sheikh_idx'),
+            models.Index(fields=['date'], name='daily_halaqa_stats_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.halaqa_id} - {self.date}"
+
+
+class UserActivity(models.Model):
+    """
+    عدادات نشاط المستخدم المحسوبة مسبقاً (dashboard.user_activity)
+    
+    تُحدّث عند الكتابة، فقائمة المستخدمين تقرأ وترتب وتصفي بضم واحد.
+    """
+    
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='activity_counters',
+        verbose_name=_('المستخدم')
+    )
+    halaqat_count = models.IntegerField(_('تسجيلات الحلقات'), default=0)
+    sessions_count = models.IntegerField(_('سجلات الحضور'), default=0)
+    recitations_count = models.IntegerField(_('التسميعات'), default=0)
+    updated_at = models.DateTimeField(_('تاريخ التحديث'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('عدادات نشاط مستخدم')
+        verbose_name_plural = _('عدادات نشاط المستخدمين')
+        indexes = [
+            models.Index(fields=['halaqat_count'], name='user_activity_halaqat_idx'),
+            models.Index(fields=['sessions_count'], name='user_activity_sessions_idx'),
+            models.Index(fields=['recitations_count'], name='user_activity_recit_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}"
@@ -0,0 +1,278 @@
+"""
+ترقيم الصفحات بالمؤشر
+Keyset (cursor) pagination for dashboard list views and their JSON output
+
+ترقيم Django الافتراضي يجلب الصفحة بـ OFFSET (يمسح كل الصفوف السابقة) ويحسب
+COUNT(*) كاملاً لكل طلب. هنا تُجلب الصفحة بشرط "بعد آخر صف معروض" على حقول
+الترتيب مع المفتاح الأساسي كفاصل تعادل، فتكلفة الصفحة الألف كتكلفة الأولى:
+- المؤشر (cursor) في الرابط يحمل قيم الترتيب لحد الصفحة واتجاهها وبصمة الترتيب؛
+  المؤشر التالف أو الخاص بترتيب آخر يُعيد الصفحة الأولى
+- العدد الإجمالي يُحسب مرة لكل تصفية ويُخزن في الكاش المشترك تحت جيل إحصائيات
+  اللوحة، ويتوقف عند KEYSET_COUNT_LIMIT (يُعرض "أكثر من ...")
+- حقول الترتيب يجب ألا تكون NULL (أو تُغلف بـ Coalesce في الاستعلام)
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+from functools import reduce
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet, ImproperlyConfigured, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse, QueryDict
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(Exception):
+    """مؤشر لا يمكن فكه أو لا يطابق الترتيب الحالي"""
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder يقص الأوقات إلى أجزاء الألف؛ المؤشر يحتاج القيمة كاملة للمساواة"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _resolve(obj, path: str):
+    """قيمة حقل الترتيب من الكائن (يتبع session__date عبر select_related)"""
+    for name in path.split('__'):
+        obj = getattr(obj, name)
+    return obj
+
+
+class KeysetPage:
+    """صفحة واحدة: العناصر ومؤشرا الصفحتين المجاورتين"""
+
+    def __init__(self, object_list: list, paginator: 'KeysetPaginator',
+                 next_cursor: Optional[str], previous_cursor: Optional[str], is_first: bool = False):
+        self.object_list = object_list
+        self.is_first = is_first
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or not self.is_first
+
+    def _url(self, cursor: Optional[str]) -> str:
+        params = self.paginator.query_params.copy()
+        for key in ('cursor', 'page'):
+            params.pop(key, None)
+        if cursor:
+            params['cursor'] = cursor
+        return f'?{params.urlencode()}' if params else '?'
+
+    @property
+    def first_url(self) -> str:
+        return self._url(None)
+
+    @property
+    def next_url(self) -> Optional[str]:
+        return self._url(self.next_cursor) if self.next_cursor else None
+
+    @property
+    def previous_url(self) -> Optional[str]:
+        return self._url(self.previous_cursor) if self.previous_cursor else None
+
+
+class KeysetPaginator:
+    """ترقيم بالمؤشر على (حقول الترتيب، pk)"""
+
+    CACHE_ALIAS = 'shared'
+    COUNT_KEY = 'keyset_count:{generation}:{digest}'
+
+    def __init__(self, queryset, per_page: int, query_params=None):
+        self.per_page = per_page
+        self.query_params = query_params.copy() if query_params is not None else QueryDict(mutable=True)
+        self.ordering = self._ordering(queryset)
+        self.queryset = queryset.order_by(*self.ordering)
+        self.count_limit = getattr(settings, 'KEYSET_COUNT_LIMIT', 10000)
+        self.count_timeout = getattr(settings, 'KEYSET_COUNT_CACHE_TIMEOUT', 300)
+        self._page_count: Optional[int] = None
+
+    # ==================== Ordering ====================
+
+    @staticmethod
+    def _ordering(queryset) -> List[str]:
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not all(isinstance(field, str) for field in ordering):
+            raise ImproperlyConfigured('Keyset pagination needs field-name ordering.')
+        pk_name = queryset.model._meta.pk.name
+        if not ordering or ordering[-1].lstrip('-') not in ('pk', pk_name):
+            # فاصل التعادل يتبع اتجاه الحقل الأول
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    @cached_property
+    def signature(self) -> str:
+        return hashlib.md5('|'.join(self.ordering).encode()).hexdigest()[:8]
+
+    # ==================== Cursors ====================
+
+    def encode_cursor(self, obj, direction: str) -> str:
+        values = [_resolve(obj, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps([self.signature, direction, values], cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor: str) -> Tuple[str, list]:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            signature, direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError, binascii.Error):
+            raise InvalidCursor(cursor)
+        if signature != self.signature or direction not in (FORWARD, BACKWARD):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek(self, values: Sequence[Any], direction: str) -> Q:
+        """(a, b, pk) بعد القيم: a < x OR (a = x AND b < y) OR ... حسب اتجاه كل حقل"""
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            if direction == BACKWARD:
+                descending = not descending
+            lookup = 'lt' if descending else 'gt'
+            equal = {self.ordering[i].lstrip('-'): values[i] for i in range(index)}
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': values[index]}))
+        return reduce(lambda left, right: left | right, conditions)
+
+    # ==================== Pages ====================
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        """الصفحة بعد المؤشر (أو قبله)؛ المؤشر غير الصالح يعيد الصفحة الأولى"""
+        if cursor:
+            try:
+                return self._page(*self.decode_cursor(cursor))
+            except (InvalidCursor, ValidationError, ValueError, TypeError):
+                pass
+        return self._page(FORWARD, None)
+
+    def _page(self, direction: str, values: Optional[list]) -> KeysetPage:
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, direction))
+        if direction == BACKWARD:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == BACKWARD:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        if values is None and not has_more:
+            # الصفحة الأولى الكاملة: العدد معروف دون استعلام
+            self._page_count = len(rows)
+
+        return KeysetPage(
+            rows, self,
+            next_cursor=self.encode_cursor(rows[-1], FORWARD) if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], BACKWARD) if rows and has_previous else None,
+            is_first=values is None or (direction == BACKWARD and not has_more),
+        )
+
+    # ==================== Count ====================
+
+    def _count_key(self) -> Optional[str]:
+        from .stats import dashboard_stats
+
+        try:
+            sql = str(self.queryset.order_by().query)
+        except EmptyResultSet:
+            return None
+        digest = hashlib.md5(f'{self.queryset.model._meta.label}:{self.count_limit}:{sql}'.encode()).hexdigest()
+        return self.COUNT_KEY.format(generation=dashboard_stats.generation(), digest=digest)
+
+    @cached_property
+    def count(self) -> int:
+        """العدد حتى KEYSET_COUNT_LIMIT + 1؛ يُخزن لكل تصفية تحت جيل الإحصائيات"""
+        if self._page_count is not None:
+            return self._page_count
+        key = self._count_key()
+        if key is None:
+            return 0
+        cache = caches[self.CACHE_ALIAS]
+        count = cache.get(key)
+        if count is None:
+            queryset = self.queryset.order_by()
+            if self.count_limit:
+                queryset = queryset[:self.count_limit + 1]
+            count = queryset.count()
+            cache.set(key, count, self.count_timeout)
+        return count
+
+    @property
+    def count_is_capped(self) -> bool:
+        return bool(self.count_limit) and self.count > self.count_limit
+
+    @property
+    def display_count(self) -> int:
+        return min(self.count, self.count_limit) if self.count_limit else self.count
+
+
+class KeysetPaginationMixin:
+    """
+    بديل paginate_by في ListView: الصفحات بالمؤشر و ?format=json للواجهة البرمجية
+
+    الاستعلام يجب أن يكون مرتباً بحقول (أو يرث ترتيب Meta)؛ يُضاف pk كفاصل تعادل.
+    الحقول في api_fields تُقرأ من كل عنصر (تدعم المسارات مثل session__halaqa__name).
+    """
+
+    paginator_class = KeysetPaginator
+    api_fields: Sequence[str] = ('id',)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.paginator_class(queryset, page_size, query_params=self.request.GET)
+        page = paginator.page(self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def wants_json(self) -> bool:
+        return self.request.GET.get('format') == 'json'
+
+    def serialize_object(self, obj) -> Dict[str, Any]:
+        return {field: _resolve(obj, field) for field in self.api_fields}
+
+    def get(self, request, *args, **kwargs):
+        if not self.wants_json():
+            return super().get(request, *args, **kwargs)
+        self.object_list = self.get_queryset()
+        paginator, page, object_list, _is_paginated = self.paginate_queryset(
+            self.object_list, self.get_paginate_by(self.object_list)
+        )
+        return JsonResponse({
+            'results': [self.serialize_object(obj) for obj in object_list],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+            'count': paginator.display_count,
+            'count_is_capped': paginator.count_is_capped,
+        }, encoder=DjangoJSONEncoder, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,407 @@
+"""
+التجميعات اليومية - Daily time-series rollups
+
+جداول DailyStats (يوم) و DailyHalaqaStats (يوم، حلقة، شيخ) تحمل عدادات النشاط
+اليومي، فالرسوم والتقارير تقرأ صفاً لكل يوم بدل تجميع السجلات الخام.
+
+الصيانة تزايدية: كل حفظ أو حذف لمستخدم أو جلسة أو تسميع أو حضور يحسب مساهمة
+السجل قبل التعديل وبعده (استعلام تجميع على صف واحد) ويُسجّل الفرق. الفروق تتجمع
+لكل معاملة وتُطبق بعد نجاحها بعبارات UPDATE ... F() لكل دلو (يوم، حلقة).
+الأمر rebuild_daily_rollups يعيد بناء أي نطاق من السجلات الخام (التعبئة الأولى
+أو إصلاح الانحراف).
+
+شيخ الحلقة يُحفظ وقت النشاط: نقل الحلقة لشيخ آخر لا يغير تاريخ الشيخ السابق.
+"""
+import threading
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# (اليوم، الحلقة، الشيخ) ← فروق الحقول؛ الحلقة None للمساهمات العامة فقط (المستخدمون)
+BucketKey = Tuple[date, Optional[int], Optional[int]]
+Buckets = Dict[BucketKey, Counter]
+
+COUNT_FIELDS = (
+    'sessions_count', 'recitations_new', 'recitations_review', 'recitations_tilawa', 'grade_sum',
+    'attendance_present', 'attendance_absent', 'attendance_excused', 'attendance_late',
+)
+USER_FIELDS = ('new_users', 'new_students', 'new_sheikhs')
+
+# الحقول التي تغير مساهمة السجل؛ الحفظ بـ update_fields خارجها لا يُحسب
+TRACKED_FIELDS = {
+    settings.AUTH_USER_MODEL: {'date_joined', 'user_type'},
+    'halaqat.Session': {'date', 'halaqa', 'halaqa_id'},
+    'recitation.RecitationRecord': {'recitation_type', 'grade', 'session', 'session_id', 'created_at'},
+    'halaqat.Attendance': {'status', 'session', 'session_id'},
+}
+
+
+class _DeltasHook:
+    """فروق مرتبطة بمستوى معاملة (أو نقطة حفظ) واحد"""
+
+    def __init__(self, owner: 'TransactionDeltas', level: tuple):
+        self.owner = owner
+        self.level = level
+        self.deltas: Dict = defaultdict(Counter)
+
+    def __call__(self):
+        hooks = self.owner._hooks()
+        if hooks.get(self.level) is self:
+            del hooks[self.level]
+        self.owner.apply(self.deltas)
+
+
+class TransactionDeltas:
+    """
+    فروق {مفتاح: Counter} تُطبق بعد نجاح المعاملة الحالية (أو فوراً خارج المعاملات)
+
+    خطاف on_commit واحد لكل مستوى نقطة حفظ يجمع فروقه، فالتراجع عن نقطة الحفظ
+    يسقط الخطاف مع فروقه (نفس أسلوب accounts.outbox).
+    """
+
+    def __init__(self, apply):
+        self.apply = apply
+        self._local = threading.local()
+
+    def _hooks(self) -> Dict[tuple, _DeltasHook]:
+        if not hasattr(self._local, 'hooks'):
+            self._local.hooks = {}
+        return self._local.hooks
+
+    @staticmethod
+    def merge(target: Dict, source: Dict, sign: int = 1):
+        for key, deltas in source.items():
+            bucket = target[key]
+            for field, value in deltas.items():
+                bucket[field] += sign * value
+
+    def add(self, deltas: Dict, sign: int = 1):
+        if not connection.in_atomic_block:
+            # خطافات المعاملات المتراجع عنها لم تعد مسجلة
+            self._hooks().clear()
+            pending = defaultdict(Counter)
+            self.merge(pending, deltas, sign)
+            self.apply(pending)
+            return
+
+        level = tuple(connection.savepoint_ids)
+        hooks = self._hooks()
+        hook = hooks.get(level)
+        if hook is None or not any(func is hook for _, func, _ in connection.run_on_commit):
+            hook = hooks[level] = _DeltasHook(self, level)
+            transaction.on_commit(hook)
+        self.merge(hook.deltas, deltas, sign)
+
+
+def _models():
+    from django.contrib.auth import get_user_model
+    from halaqat.models import Attendance, Session
+    from recitation.models import RecitationRecord
+    return get_user_model(), Session, RecitationRecord, Attendance
+
+
+class DailyRollups:
+    """حساب المساهمات وتطبيقها وإعادة البناء والقراءة"""
+
+    REBUILD_CHUNK_DAYS = 90
+
+    def __init__(self):
+        self._local = threading.local()
+        self._pending = TransactionDeltas(self._apply_committed)
+
+    # ==================== Contributions ====================
+
+    def collect(self, users=None, sessions=None, recitations=None, attendance=None) -> Buckets:
+        """مساهمات مجموعات السجلات مجمّعة في دلاء (استعلام تجميع لكل مجموعة)"""
+        buckets: Buckets = defaultdict(Counter)
+
+        if users is not None:
+            rows = users.order_by().annotate(day=TruncDate('date_joined')).values('day', 'user_type').annotate(n=Count('id'))
+            for row in rows:
+                bucket = buckets[(row['day'], None, None)]
+                bucket['new_users'] += row['n']
+                if row['user_type'] in ('student', 'sheikh'):
+                    bucket[f"new_{row['user_type']}s"] += row['n']
+
+        if sessions is not None:
+            rows = sessions.order_by().values('date', 'halaqa_id', 'halaqa__sheikh_id').annotate(n=Count('id'))
+            for row in rows:
+                buckets[(row['date'], row['halaqa_id'], row['halaqa__sheikh_id'])]['sessions_count'] += row['n']
+
+        if recitations is not None:
+            rows = recitations.order_by().annotate(day=TruncDate('created_at')).values(
+                'day', 'session__halaqa_id', 'session__halaqa__sheikh_id', 'recitation_type'
+            ).annotate(n=Count('id'), grades=Sum('grade'))
+            for row in rows:
+                bucket = buckets[(row['day'], row['session__halaqa_id'], row['session__halaqa__sheikh_id'])]
+                bucket[f"recitations_{row['recitation_type']}"] += row['n']
+                bucket['grade_sum'] += row['grades'] or Decimal('0')
+
+        if attendance is not None:
+            rows = attendance.order_by().values(
+                'session__date', 'session__halaqa_id', 'session__halaqa__sheikh_id', 'status'
+            ).annotate(n=Count('id'))
+            for row in rows:
+                key = (row['session__date'], row['session__halaqa_id'], row['session__halaqa__sheikh_id'])
+                buckets[key][f"attendance_{row['status']}"] += row['n']
+
+        return buckets
+
+    def contribution(self, instance) -> Buckets:
+        """مساهمة سجل واحد كما هو في قاعدة البيانات الآن"""
+        User, Session, RecitationRecord, Attendance = _models()
+        model = type(instance)
+        queryset = model._default_manager.filter(pk=instance.pk)
+        if model is User:
+            return self.collect(users=queryset)
+        if model is Session:
+            return self.collect(sessions=queryset)
+        if model is RecitationRecord:
+            return self.collect(recitations=queryset)
+        return self.collect(attendance=queryset)
+
+    def session_children(self, session_id: int) -> Buckets:
+        """مساهمات تسميعات الجلسة وحضورها (تنتقل مع تاريخ الجلسة أو حلقتها)"""
+        User, Session, RecitationRecord, Attendance = _models()
+        return self.collect(
+            recitations=RecitationRecord.objects.filter(session_id=session_id),
+            attendance=Attendance.objects.filter(session_id=session_id),
+        )
+
+    def deleted_contribution(self, instance) -> Buckets:
+        """
+        مساهمة سجل محذوف من حقوله المحمّلة، دون استعلام لكل سجل
+
+        الحذف المتتالي (حلقة أو مستخدم) يحمّل آلاف التسميعات والحضور؛ مفتاح
+        الجلسة (اليوم، الحلقة، الشيخ) يُجلب مرة لكل جلسة ويُحفظ حتى نهاية المعاملة.
+        """
+        User, Session, RecitationRecord, Attendance = _models()
+        model = type(instance)
+        buckets: Buckets = defaultdict(Counter)
+        if model is User:
+            bucket = buckets[(timezone.localdate(instance.date_joined), None, None)]
+            bucket['new_users'] += 1
+            if instance.user_type in ('student', 'sheikh'):
+                bucket[f'new_{instance.user_type}s'] += 1
+            return buckets
+
+        session_key = self._session_key(instance.pk if model is Session else instance.session_id)
+        if session_key is None:
+            return buckets
+        session_date, halaqa_id, sheikh_id = session_key
+        if model is Session:
+            buckets[session_key]['sessions_count'] += 1
+        elif model is RecitationRecord:
+            bucket = buckets[(timezone.localdate(instance.created_at), halaqa_id, sheikh_id)]
+            bucket[f'recitations_{instance.recitation_type}'] += 1
+            bucket['grade_sum'] += Decimal(instance.grade)
+        else:
+            buckets[session_key][f'attendance_{instance.status}'] += 1
+        return buckets
+
+    def _session_key(self, session_id: int) -> Optional[BucketKey]:
+        keys = getattr(self._local, 'session_keys', None)
+        if keys is None:
+            keys = self._local.session_keys = {}
+        if session_id not in keys:
+            User, Session, RecitationRecord, Attendance = _models()
+            keys[session_id] = Session.objects.filter(pk=session_id).values_list(
+                'date', 'halaqa_id', 'halaqa__sheikh_id'
+            ).first()
+        return keys[session_id]
+
+    @staticmethod
+    def is_tracked(instance, update_fields=None) -> bool:
+        fields = TRACKED_FIELDS.get(instance._meta.label)
+        return fields is not None and (not update_fields or bool(fields & set(update_fields)))
+
+    # ==================== Signal hooks ====================
+
+    def before_save(self, instance, update_fields=None):
+        instance._rollup_before = None
+        if instance._meta.label == 'halaqat.Session':
+            self._local.session_keys = None
+        if instance._state.adding or instance.pk is None or not self.is_tracked(instance, update_fields):
+            return
+        before = self.contribution(instance)
+        if instance._meta.label == 'halaqat.Session':
+            old_keys = {key[:2] for key in before}
+            if old_keys and old_keys != {(instance.date, instance.halaqa_id)}:
+                # نقل الجلسة ينقل تسميعاتها وحضورها
+                instance._rollup_moved = True
+                self._merge(before, self.session_children(instance.pk))
+        instance._rollup_before = before
+
+    def after_save(self, instance, created: bool, update_fields=None):
+        before = getattr(instance, '_rollup_before', None)
+        if not created and before is None:
+            return
+        after = self.contribution(instance)
+        if getattr(instance, '_rollup_moved', False):
+            self._merge(after, self.session_children(instance.pk))
+            instance._rollup_moved = False
+        if before:
+            self._merge(after, before, sign=-1)
+        instance._rollup_before = None
+        self.record(after)
+
+    def before_delete(self, instance):
+        instance._rollup_before = self.deleted_contribution(instance)
+
+    def after_delete(self, instance):
+        before = getattr(instance, '_rollup_before', None)
+        if before:
+            self.record(before, sign=-1)
+
+    # ==================== Apply ====================
+
+    @staticmethod
+    def _merge(target: Buckets, source: Buckets, sign: int = 1):
+        for key, deltas in source.items():
+            bucket = target.setdefault(key, Counter())
+            for field, value in deltas.items():
+                bucket[field] += sign * value
+
+    def record(self, buckets: Buckets, sign: int = 1):
+        """تسجيل فروق تُطبق بعد نجاح المعاملة الحالية (أو فوراً خارج المعاملات)"""
+        if not any(any(deltas.values()) for deltas in buckets.values()):
+            return
+        self._pending.add(buckets, sign)
+
+    def _apply_committed(self, buckets: Buckets):
+        self._local.session_keys = None
+        self.apply(buckets)
+
+    def apply(self, buckets: Buckets):
+        """UPDATE ... F() لكل دلو، وإنشاء الصف عند غيابه"""
+        from .models import DailyHalaqaStats, DailyStats
+
+        daily: Dict[date, Counter] = defaultdict(Counter)
+        for (day, halaqa_id, sheikh_id), deltas in buckets.items():
+            deltas = {field: value for field, value in deltas.items() if value}
+            if not deltas:
+                continue
+            daily[day].update(deltas)
+            if halaqa_id is not None:
+                self._upsert(DailyHalaqaStats, {'halaqa_id': halaqa_id, 'date': day}, deltas, sheikh_id=sheikh_id)
+        for day, deltas in daily.items():
+            deltas = {field: value for field, value in deltas.items() if value}
+            if deltas:
+                self._upsert(DailyStats, {'date': day}, deltas)
+
+    @staticmethod
+    def _upsert(model, lookup: dict, deltas: dict, **defaults):
+        updates = {field: F(field) + value for field, value in deltas.items()}
+        if model.objects.filter(**lookup).update(**updates):
+            return
+        if all(value <= 0 for value in deltas.values()):
+            # لا صف لينقص منه (نطاق لم يُبن بعد، أو حلقة محذوفة)
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookup, **defaults, **deltas)
+        except IntegrityError:
+            # أنشأه طلب متزامن
+            model.objects.filter(**lookup).update(**updates)
+
+    # ==================== Rebuild ====================
+
+    def earliest_date(self) -> Optional[date]:
+        User, Session, RecitationRecord, Attendance = _models()
+        candidates = [
+            User.objects.aggregate(first=Min('date_joined'))['first'],
+            RecitationRecord.objects.aggregate(first=Min('created_at'))['first'],
+        ]
+        days = [timezone.localdate(value) for value in candidates if value]
+        first_session = Session.objects.aggregate(first=Min('date'))['first']
+        if first_session:
+            days.append(first_session)
+        return min(days) if days else None
+
+    def rebuild(self, start: date, end: date) -> int:
+        """إعادة بناء التجميعات لنطاق أيام من السجلات الخام. يعيد عدد الصفوف المكتوبة"""
+        written = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=self.REBUILD_CHUNK_DAYS - 1), end)
+            written += self._rebuild_chunk(chunk_start, chunk_end)
+            chunk_start = chunk_end + timedelta(days=1)
+        return written
+
+    def _rebuild_chunk(self, start: date, end: date) -> int:
+        from .models import DailyHalaqaStats, DailyStats
+        User, Session, RecitationRecord, Attendance = _models()
+
+        buckets = self.collect(
+            users=User.objects.filter(date_joined__date__range=(start, end)),
+            sessions=Session.objects.filter(date__range=(start, end)),
+            recitations=RecitationRecord.objects.filter(created_at__date__range=(start, end)),
+            attendance=Attendance.objects.filter(session__date__range=(start, end)),
+        )
+        daily: Dict[date, Counter] = defaultdict(Counter)
+        halaqa_rows = []
+        for (day, halaqa_id, sheikh_id), deltas in buckets.items():
+            daily[day].update(deltas)
+            if halaqa_id is not None:
+                halaqa_rows.append(DailyHalaqaStats(date=day, halaqa_id=halaqa_id, sheikh_id=sheikh_id, **deltas))
+        daily_rows = [DailyStats(date=day, **deltas) for day, deltas in daily.items()]
+
+        with transaction.atomic():
+            DailyStats.objects.filter(date__range=(start, end)).delete()
+            DailyHalaqaStats.objects.filter(date__range=(start, end)).delete()
+            DailyStats.objects.bulk_create(daily_rows, batch_size=500)
+            DailyHalaqaStats.objects.bulk_create(halaqa_rows, batch_size=500)
+        return len(daily_rows) + len(halaqa_rows)
+
+    # ==================== Read ====================
+
+    def series(self, start: date, end: date, halaqa_id: Optional[int] = None,
+               sheikh_id: Optional[int] = None) -> List[dict]:
+        """صف لكل يوم فيه نشاط، مرتب بالتاريخ (استعلام واحد على جدول التجميع)"""
+        from .models import DailyHalaqaStats, DailyStats
+
+        if halaqa_id is None and sheikh_id is None:
+            return list(
+                DailyStats.objects.filter(date__range=(start, end))
+                .order_by('date').values('date', *COUNT_FIELDS, *USER_FIELDS)
+            )
+
+        queryset = DailyHalaqaStats.objects.filter(date__range=(start, end))
+        if halaqa_id is not None:
+            queryset = queryset.filter(halaqa_id=halaqa_id)
+        if sheikh_id is not None:
+            queryset = queryset.filter(sheikh_id=sheikh_id)
+        rows = queryset.order_by('date').values('date').annotate(
+            **{f'{field}_total': Sum(field) for field in COUNT_FIELDS}
+        )
+        return [
+            {'date': row['date'], **{field: row[f'{field}_total'] for field in COUNT_FIELDS}}
+            for row in rows
+        ]
+
+    def totals(self, start: date, end: date) -> dict:
+        """مجاميع النطاق كاملاً"""
+        from .models import DailyStats
+
+        totals = DailyStats.objects.filter(date__range=(start, end)).aggregate(
+            **{field: Sum(field) for field in (*COUNT_FIELDS, *USER_FIELDS)}
+        )
+        return {field: value or 0 for field, value in totals.items()}
+
+
+def recitations_count(row: dict) -> int:
+    return row['recitations_new'] + row['recitations_review'] + row['recitations_tilawa']
+
+
+def attendance_count(row: dict) -> int:
+    return row['attendance_present'] + row['attendance_absent'] + row['attendance_excused'] + row['attendance_late']
+
+
+daily_rollups = DailyRollups()
@@ -1,16 +1,189 @@
 """
 إشارات لوحة التحكم - Dashboard Signals
 """
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.conf import settings
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
+
+from .alerts import alert_resolver
+from .counters import UserCounters
+from .live import ACCOUNTS, DASHBOARD, hub, notification_event
+from .models import Alert, Message, MessageStatus, Notification as DashboardNotification
+from .rollups import TRACKED_FIELDS, daily_rollups
+from .stats import dashboard_stats
+from .user_activity import COUNTER_FIELDS, user_activity
 
 User = get_user_model()
 
 
-@receiver(post_save, sender=User)
-def clear_user_cache(sender, instance, **kwargs):
-    """مسح الكاش عند تعديل المستخدم"""
-    cache.delete('dashboard_stats')
-    cache.delete(f'user_stats_{instance.id}')
+# ==================== إحصائيات لوحة التحكم ====================
+
+STATS_MODELS = (
+    settings.AUTH_USER_MODEL,
+    'halaqat.Halaqa',
+    'halaqat.Session',
+    'halaqat.Attendance',
+    'halaqat.HalaqaEnrollment',
+    'recitation.RecitationRecord',
+    'reports.Certificate',
+    'reports.StudentReport',
+    'gamification.PointsLog',
+)
+
+
+def invalidate_dashboard_stats(sender, instance, **kwargs):
+    """أي تعديل على النماذج المحسوبة يرفع جيل لقطة الإحصائيات"""
+    update_fields = kwargs.get('update_fields')
+    if sender is User and update_fields and set(update_fields) <= {'last_login'}:
+        # تسجيل الدخول لا يغير أي مقياس
+        return
+    dashboard_stats.invalidate()
+
+
+for _model in STATS_MODELS:
+    post_save.connect(invalidate_dashboard_stats, sender=_model, dispatch_uid=f'dashboard_stats_save_{_model}')
+    post_delete.connect(invalidate_dashboard_stats, sender=_model, dispatch_uid=f'dashboard_stats_delete_{_model}')
+
+
+# ==================== التجميعات اليومية ====================
+
+def rollup_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        daily_rollups.before_save(instance, update_fields)
+
+
+def rollup_after_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        daily_rollups.after_save(instance, created, update_fields)
+
+
+def rollup_before_delete(sender, instance, **kwargs):
+    daily_rollups.before_delete(instance)
+
+
+def rollup_after_delete(sender, instance, **kwargs):
+    daily_rollups.after_delete(instance)
+
+
+for _model in TRACKED_FIELDS:
+    pre_save.connect(rollup_before_save, sender=_model, dispatch_uid=f'daily_rollups_pre_save_{_model}')
+    post_save.connect(rollup_after_save, sender=_model, dispatch_uid=f'daily_rollups_post_save_{_model}')
+    pre_delete.connect(rollup_before_delete, sender=_model, dispatch_uid=f'daily_rollups_pre_delete_{_model}')
+    post_delete.connect(rollup_after_delete, sender=_model, dispatch_uid=f'daily_rollups_post_delete_{_model}')
+
+
+# ==================== عدادات نشاط المستخدمين ====================
+
+def user_activity_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        user_activity.before_save(instance, update_fields)
+
+
+def user_activity_after_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        user_activity.after_save(instance, created, update_fields)
+
+
+def user_activity_after_delete(sender, instance, **kwargs):
+    user_activity.after_delete(instance)
+
+
+for _model in COUNTER_FIELDS:
+    pre_save.connect(user_activity_before_save, sender=_model, dispatch_uid=f'user_activity_pre_save_{_model}')
+    post_save.connect(user_activity_after_save, sender=_model, dispatch_uid=f'user_activity_post_save_{_model}')
+    post_delete.connect(user_activity_after_delete, sender=_model, dispatch_uid=f'user_activity_post_delete_{_model}')
+
+
+# ==================== عدادات المستخدم ====================
+
+@receiver(post_save, sender='accounts.Notification')
+def update_notification_counters(sender, instance, created, **kwargs):
+    """أي إنشاء أو تعديل يلغي عدادي المستخدم ليُعاد حسابهما"""
+    UserCounters.invalidate([instance.user_id], UserCounters.NOTIFICATIONS, UserCounters.RECENT_NOTIFICATIONS)
+
+
+@receiver(post_delete, sender='accounts.Notification')
+def invalidate_notification_counters(sender, instance, **kwargs):
+    UserCounters.invalidate([instance.user_id], UserCounters.NOTIFICATIONS, UserCounters.RECENT_NOTIFICATIONS)
+
+
+@receiver(post_save, sender=DashboardNotification)
+def update_dashboard_notification_counters(sender, instance, created, **kwargs):
+    UserCounters.invalidate([instance.user_id], UserCounters.DASHBOARD_NOTIFICATIONS)
+
+
+@receiver(post_delete, sender=DashboardNotification)
+def invalidate_dashboard_notification_counters(sender, instance, **kwargs):
+    UserCounters.invalidate([instance.user_id], UserCounters.DASHBOARD_NOTIFICATIONS)
+
+
+@receiver(m2m_changed, sender=Message.recipients.through)
+def invalidate_message_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    """تغيير المستلمين عبر recipients يلغي عداد الرسائل للمستخدمين المتأثرين فقط"""
+    if action == 'pre_clear' and not reverse:
+        # بعد المسح لا تتوفر قائمة المتأثرين
+        UserCounters.invalidate(instance.statuses.values_list('user_id', flat=True), UserCounters.MESSAGES)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        user_ids = [instance.pk] if reverse else (pk_set or [])
+        UserCounters.invalidate(user_ids, UserCounters.MESSAGES)
+
+
+@receiver(post_save, sender=MessageStatus)
+def invalidate_message_status_counter(sender, instance, **kwargs):
+    UserCounters.invalidate([instance.user_id], UserCounters.MESSAGES)
+
+
+@receiver(post_save, sender=Message)
+@receiver(pre_delete, sender=Message)
+def invalidate_message_recipients_counters(sender, instance, created=False, **kwargs):
+    """أرشفة الرسالة أو حذفها تغير عدد غير المقروء لكل مستلميها"""
+    if created:
+        return
+    if kwargs.get('signal') is post_save:
+        # أرشفة الرسالة نفسها تسري على كل مستلميها
+        instance.statuses.exclude(is_archived=instance.is_archived).update(is_archived=instance.is_archived)
+    UserCounters.invalidate(instance.statuses.values_list('user_id', flat=True), UserCounters.MESSAGES)
+
+
+# ==================== البث الحي ====================
+
+@receiver(post_save, sender='accounts.Notification')
+def publish_notification(sender, instance, created, **kwargs):
+    if created:
+        hub.publish_on_commit([(instance.user_id, notification_event(ACCOUNTS, instance))])
+
+
+@receiver(post_save, sender=DashboardNotification)
+def publish_dashboard_notification(sender, instance, created, **kwargs):
+    if created:
+        hub.publish_on_commit([(instance.user_id, notification_event(DASHBOARD, instance))])
+
+
+@receiver(post_save, sender='courses.LessonReminder')
+@receiver(post_delete, sender='courses.LessonReminder')
+def invalidate_today_lessons_counter(sender, instance, **kwargs):
+    from courses.models import StudentCurriculum
+    student_ids = StudentCurriculum.objects.filter(
+        pk=instance.student_curriculum_id
+    ).values_list('student_id', flat=True)
+    UserCounters.invalidate(student_ids, UserCounters.TODAY_LESSONS, day=instance.scheduled_date)
+
+
+# ==================== التنبيهات ====================
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+@receiver(m2m_changed, sender=Alert.target_users.through)
+def bump_alerts_generation(sender, **kwargs):
+    """أي تعديل على التنبيهات أو مستهدفيها يبطل اللقطة المجمّعة"""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        alert_resolver.bump_generation()
+
+
+@receiver(m2m_changed, sender=Alert.dismissed_by.through)
+def invalidate_dismissed_alerts(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        alert_resolver.invalidate_dismissed(instance.dismissed_by.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        alert_resolver.invalidate_dismissed([instance.pk] if reverse else (pk_set or []))
@@ -0,0 +1,178 @@
+"""
+لقطة إحصائيات لوحة التحكم
+Single-pass dashboard statistics snapshot with generation-based invalidation
+
+كل مقاييس الصفحة الرئيسية تُحسب باستعلام تجميع شرطي واحد لكل جدول، وتُخزن
+اللقطة في الكاش المشترك (caches['shared']) تحت رقم جيل يرفعه أي تعديل على
+النماذج المعنية (dashboard.signals). مع DASHBOARD_STATS_BACKGROUND_REFRESH
+تُعاد اللقطة القديمة فوراً ويُعاد الحساب في خيط خلفي، فلا يدفع طلب المشرف الكلفة.
+"""
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardStats:
+    """حساب اللقطة وتخزينها وإبطالها"""
+
+    CACHE_ALIAS = 'shared'
+    GENERATION_KEY = 'dashboard_stats:generation'
+    SNAPSHOT_KEY = 'dashboard_stats:{generation}:{day}'
+    LAST_SNAPSHOT_KEY = 'dashboard_stats:last'
+    CACHE_TIMEOUT = 3600
+    # تجميع موجات التعديل المتتالية في إعادة حساب خلفية واحدة
+    REFRESH_DELAY = 2.0
+
+    def __init__(self):
+        self._refresh_lock = threading.Lock()
+        self._refresh_timer: Optional[threading.Timer] = None
+
+    @property
+    def cache(self):
+        return caches[self.CACHE_ALIAS]
+
+    @property
+    def background_refresh(self) -> bool:
+        return getattr(settings, 'DASHBOARD_STATS_BACKGROUND_REFRESH', False)
+
+    # ==================== Generation ====================
+
+    def generation(self) -> int:
+        generation = self.cache.get(self.GENERATION_KEY)
+        if generation is None:
+            self.cache.add(self.GENERATION_KEY, 1, None)
+            generation = self.cache.get(self.GENERATION_KEY, 1)
+        return generation
+
+    def invalidate(self):
+        """رفع الجيل بعد أي تعديل على البيانات المحسوبة، عند نجاح المعاملة الحالية"""
+        # الرفع قبل الالتزام يسمح لطلب آخر بحساب لقطة (أو عدد صفحات) من البيانات القديمة تحت الجيل الجديد
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        try:
+            self.cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            self.cache.add(self.GENERATION_KEY, 1, None)
+        if self.background_refresh:
+            self._schedule_refresh()
+
+    def _key(self, generation: int) -> str:
+        return self.SNAPSHOT_KEY.format(generation=generation, day=timezone.localdate().isoformat())
+
+    # ==================== Read path ====================
+
+    def get(self) -> Dict[str, Any]:
+        """اللقطة الحالية؛ تُحسب عند الحاجة أو تُعاد القديمة مع تحديث خلفي"""
+        generation = self.generation()
+        snapshot = self.cache.get(self._key(generation))
+        if snapshot is not None:
+            return snapshot
+
+        if self.background_refresh:
+            stale = self.cache.get(self.LAST_SNAPSHOT_KEY)
+            if stale is not None:
+                self._schedule_refresh(delay=0)
+                return stale
+        return self.refresh(generation)
+
+    def refresh(self, generation: Optional[int] = None) -> Dict[str, Any]:
+        generation = generation or self.generation()
+        snapshot = self.compute()
+        self.cache.set_many({
+            self._key(generation): snapshot,
+            self.LAST_SNAPSHOT_KEY: snapshot,
+        }, self.CACHE_TIMEOUT)
+        return snapshot
+
+    def _schedule_refresh(self, delay: float = None):
+        with self._refresh_lock:
+            if self._refresh_timer is not None and self._refresh_timer.is_alive():
+                return
+            self._refresh_timer = threading.Timer(
+                self.REFRESH_DELAY if delay is None else delay, self._refresh_in_thread
+            )
+            self._refresh_timer.daemon = True
+            self._refresh_timer.start()
+
+    def _refresh_in_thread(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.exception(f"Dashboard stats refresh failed: {e}")
+        finally:
+            connections.close_all()
+
+    # ==================== Computation ====================
+
+    def compute(self) -> Dict[str, Any]:
+        """استعلام تجميع شرطي واحد لكل جدول"""
+        from django.contrib.auth import get_user_model
+        from halaqat.models import Attendance, Halaqa, HalaqaEnrollment, Session
+        from recitation.models import RecitationRecord
+        from reports.models import Certificate, StudentReport
+        from gamification.models import PointsLog
+
+        User = get_user_model()
+        today = timezone.now().date()
+        week_ago = today - timedelta(days=7)
+
+        users = User.objects.aggregate(
+            total=Count('id'),
+            students=Count('id', filter=Q(user_type='student')),
+            sheikhs=Count('id', filter=Q(user_type='sheikh')),
+            new_today=Count('id', filter=Q(date_joined__date=today)),
+            new_week=Count('id', filter=Q(date_joined__date__gte=week_ago)),
+        )
+        sessions = Session.objects.aggregate(
+            total=Count('id'),
+            today=Count('id', filter=Q(date=today)),
+        )
+        recitations = RecitationRecord.objects.aggregate(
+            total=Count('id'),
+            avg_grade=Avg('grade'),
+            today=Count('id', filter=Q(created_at__date=today)),
+        )
+        attendance = Attendance.objects.aggregate(
+            total=Count('id'),
+            present=Count('id', filter=Q(status='present')),
+        )
+
+        return {
+            'main': {
+                'total_users': users['total'],
+                'total_students': users['students'],
+                'total_sheikhs': users['sheikhs'],
+                'total_halaqat': Halaqa.objects.count(),
+                'total_sessions': sessions['total'],
+                'total_recitations': recitations['total'],
+                'total_certificates': Certificate.objects.count(),
+                'total_points_distributed': PointsLog.objects.aggregate(total=Sum('points'))['total'] or 0,
+                'new_users_today': users['new_today'],
+                'new_users_week': users['new_week'],
+                'active_sessions_today': sessions['today'],
+                'avg_attendance': (
+                    round(attendance['present'] / attendance['total'] * 100, 1) if attendance['total'] else 0
+                ),
+                'avg_grade': recitations['avg_grade'] or 0,
+            },
+            'quick': {
+                'sessions_today': sessions['today'],
+                'pending_enrollments': HalaqaEnrollment.objects.filter(status='pending').count(),
+                'new_recitations': recitations['today'],
+                'pending_reports': StudentReport.objects.filter(created_at__date__gte=week_ago).count(),
+            },
+            'computed_at': timezone.now(),
+        }
+
+
+dashboard_stats = DashboardStats()
@@ -1,3 +1,192 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import date, time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from halaqat.models import Attendance, Halaqa, Session
+
+from .importer import AccountImporter, ImportJobRunner
+from .models import DailyHalaqaStats, DailyStats, ExcelImportJob
+from .pagination import KeysetPaginator
+
+User = get_user_model()
+
+
+class DailyRollupsTests(TestCase):
+    """فروق التجميعات اليومية عند الحفظ ونقل الجلسة والحذف"""
+
+    DAY = date(2024, 1, 10)
+    NEXT_DAY = date(2024, 1, 11)
+
+    def setUp(self):
+        # الفروق تُطبق عند on_commit؛ TestCase لا يثبّت معاملته فتُنفذ الخطافات يدوياً
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sheikh = User.objects.create(username='rollup_sheikh', user_type='sheikh')
+            self.student = User.objects.create(username='rollup_student', user_type='student')
+            self.halaqa = Halaqa.objects.create(name='حلقة التجميعات', sheikh=self.sheikh)
+
+    def counts(self, day):
+        daily = DailyStats.objects.filter(date=day).values('sessions_count', 'attendance_present').first()
+        halaqa = DailyHalaqaStats.objects.filter(date=day, halaqa=self.halaqa).values(
+            'sessions_count', 'attendance_present', 'sheikh_id'
+        ).first()
+        return daily, halaqa
+
+    def create_session(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            session = Session.objects.create(halaqa=self.halaqa, date=self.DAY, start_time=time(16, 0))
+            Attendance.objects.create(session=session, student=self.student, status='present')
+        return session
+
+    def test_save_records_session_and_attendance(self):
+        self.create_session()
+        daily, halaqa = self.counts(self.DAY)
+        self.assertEqual(daily, {'sessions_count': 1, 'attendance_present': 1})
+        self.assertEqual(halaqa, {'sessions_count': 1, 'attendance_present': 1, 'sheikh_id': self.sheikh.pk})
+
+    def test_moving_session_moves_its_attendance(self):
+        session = self.create_session()
+        with self.captureOnCommitCallbacks(execute=True):
+            session.date = self.NEXT_DAY
+            session.save()
+        self.assertEqual(self.counts(self.DAY)[0], {'sessions_count': 0, 'attendance_present': 0})
+        self.assertEqual(self.counts(self.NEXT_DAY)[0], {'sessions_count': 1, 'attendance_present': 1})
+
+    def test_delete_removes_contribution(self):
+        session = self.create_session()
+        with self.captureOnCommitCallbacks(execute=True):
+            session.delete()
+        daily, halaqa = self.counts(self.DAY)
+        self.assertEqual(daily, {'sessions_count': 0, 'attendance_present': 0})
+        self.assertEqual(halaqa['sessions_count'], 0)
+        self.assertEqual(halaqa['attendance_present'], 0)
+
+
+class KeysetPaginatorTests(TestCase):
+    """ترقيم الصفحات بالمؤشر: ذهاباً وإياباً مع قيم ترتيب متساوية"""
+
+    def setUp(self):
+        users = [User.objects.create(username=f'keyset{i}') for i in range(7)]
+        # تاريخ انضمام واحد للجميع: الترتيب يعتمد على فاصل التعادل pk
+        User.objects.filter(pk__in=[user.pk for user in users]).update(date_joined=users[0].date_joined)
+        self.queryset = User.objects.filter(username__startswith='keyset').order_by('-date_joined')
+        self.expected = list(self.queryset.order_by('-date_joined', '-pk').values_list('pk', flat=True))
+
+    def paginator(self):
+        return KeysetPaginator(self.queryset, per_page=3)
+
+    @staticmethod
+    def ids(page):
+        return [user.pk for user in page]
+
+    def test_cursor_round_trip(self):
+        paginator = self.paginator()
+        obj = self.queryset.get(pk=self.expected[0])
+        direction, values = paginator.decode_cursor(paginator.encode_cursor(obj, 'n'))
+        self.assertEqual(direction, 'n')
+        self.assertEqual(values[1], obj.pk)
+        # القيمة الزمنية تعود كاملة (بأجزاء الميكروثانية) لتصلح للمساواة
+        page = paginator.page(paginator.encode_cursor(obj, 'n'))
+        self.assertEqual(self.ids(page), self.expected[1:4])
+
+    def test_forward_then_backward(self):
+        paginator = self.paginator()
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(self.paginator().page(pages[-1].next_cursor))
+        self.assertEqual([self.ids(page) for page in pages], [self.expected[:3], self.expected[3:6], self.expected[6:]])
+        self.assertFalse(pages[0].has_previous())
+
+        previous = self.paginator().page(pages[-1].previous_cursor)
+        self.assertEqual(self.ids(previous), self.expected[3:6])
+        first = self.paginator().page(previous.previous_cursor)
+        self.assertEqual(self.ids(first), self.expected[:3])
+        self.assertTrue(first.is_first)
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        self.assertEqual(self.ids(self.paginator().page('not-a-cursor')), self.expected[:3])
+        other = KeysetPaginator(self.queryset.order_by('username'), per_page=3)
+        foreign = other.encode_cursor(self.queryset.get(pk=self.expected[0]), 'n')
+        self.assertEqual(self.ids(self.paginator().page(foreign)), self.expected[:3])
+
+
+@override_settings(
+    IMPORT_CHECKPOINT_ROWS=2,
+    IMPORT_RUN_IN_WEB=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class ImportCheckpointTests(TestCase):
+    """استئناف الاستيراد من آخر نقطة حفظ دون تكرار الصفوف المعالجة"""
+
+    def setUp(self):
+        import pandas as pd
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        rows = [
+            {'name': 'شيخ أول', 'email': 'first@example.com'},
+            {'name': 'شيخ ثان', 'email': 'second@example.com'},
+            {'name': 'شيخ ثالث', 'email': 'third@example.com'},
+            # مكرر لصف قبل نقطة الحفظ: يُتخطى بعد الاستئناف أيضاً
+            {'name': 'مكرر', 'email': 'first@example.com'},
+            {'name': 'شيخ خامس', 'email': 'fifth@example.com'},
+        ]
+        sheet = io.BytesIO()
+        pd.DataFrame(rows).to_excel(sheet, index=False)
+        self.admin = User.objects.create(username='import_admin', user_type='admin', is_superuser=True)
+        self.job = ExcelImportJob.objects.create(
+            import_type='sheikhs',
+            file_name='sheikhs.xlsx',
+            file_path=SimpleUploadedFile('sheikhs.xlsx', sheet.getvalue()),
+            created_by=self.admin,
+        )
+
+    def test_resume_continues_after_last_checkpoint(self):
+        runner = ImportJobRunner()
+        save_checkpoint = AccountImporter.save_checkpoint
+
+        def stop_after_first_chunk(importer, processed_rows):
+            save_checkpoint(importer, processed_rows)
+            runner.request_stop()
+
+        with mock.patch.object(AccountImporter, 'save_checkpoint', stop_after_first_chunk):
+            self.assertIsNone(runner.run(self.job.pk))
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ExcelImportJob.Status.PENDING)
+        self.assertEqual(self.job.processed_rows, 2)
+        self.assertEqual(self.job.success_count, 2)
+
+        self.assertEqual(ImportJobRunner().run(self.job.pk), ExcelImportJob.Status.COMPLETED)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.processed_rows, 5)
+        self.assertEqual(self.job.success_count, 4)
+        self.assertEqual(self.job.skipped_count, 1)
+        self.assertEqual(len(self.job.created_users), 4)
+        self.assertEqual(User.objects.filter(user_type='sheikh', email__endswith='@example.com').count(), 4)
+
+    def test_superseded_run_rolls_back_its_chunk(self):
+        runner = ImportJobRunner()
+        save_checkpoint = AccountImporter.save_checkpoint
+
+        def resumed_elsewhere(importer, processed_rows):
+            # عملية أخرى أخذت المهمة بعد آخر نقطة حفظ
+            ExcelImportJob.objects.filter(pk=importer.job.pk).update(checkpoint_at=None)
+            save_checkpoint(importer, processed_rows)
+
+        with mock.patch.object(AccountImporter, 'save_checkpoint', resumed_elsewhere):
+            self.assertIsNone(runner.run(self.job.pk))
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.processed_rows, 0)
+        self.assertFalse(User.objects.filter(email__endswith='@example.com').exists())
@@ -2,7 +2,7 @@
 URLs for Advanced Admin Dashboard
 """
 from django.urls import path
-from . import views
+from . import live, views
 
 app_name = 'dashboard'
 
@@ -25,6 +25,8 @@ urlpatterns = [
     # التقارير
     path('reports/', views.ReportsView.as_view(), name='reports'),
     path('reports/export/', views.ReportExportView.as_view(), name='reports_export'),
+    path('reports/exports/', views.ExportJobListView.as_view(), name='export_jobs'),
+    path('reports/exports/<int:pk>/download/', views.ExportJobDownloadView.as_view(), name='export_download'),
     
     # الإعدادات
     path('settings/', views.SystemSettingsView.as_view(), name='settings'),
@@ -39,6 +41,7 @@ urlpatterns = [
     path('notifications/', views.NotificationsListView.as_view(), name='notifications_list'),
     path('notifications/<int:pk>/read/', views.MarkNotificationReadView.as_view(), name='notification_mark_read'),
     path('notifications/mark-all-read/', views.MarkAllNotificationsReadView.as_view(), name='notifications_mark_all_read'),
+    path('notifications/stream/', live.notification_stream, name='notifications_stream'),
     
     # التنبيهات
     path('alerts/', views.AlertsListView.as_view(), name='alerts_list'),
@@ -50,9 +53,13 @@ urlpatterns = [
     path('import/template/<str:import_type>/', views.DownloadImportTemplateView.as_view(), name='excel_import_template'),
     path('import/job/<int:pk>/', views.ImportJobDetailView.as_view(), name='import_job_detail'),
     path('import/job/<int:job_id>/export-accounts/', views.ExportCreatedAccountsView.as_view(), name='export_created_accounts'),
+    path('import/job/<int:pk>/cancel/', views.CancelImportJobView.as_view(), name='import_job_cancel'),
+    path('import/job/<int:pk>/resume/', views.ResumeImportJobView.as_view(), name='import_job_resume'),
     
     # API Endpoints
     path('api/stats/', views.GetStatsAPIView.as_view(), name='api_stats'),
     path('api/chart-data/', views.ChartDataAPIView.as_view(), name='api_chart_data'),
+    path('api/exports/<int:pk>/', views.ExportJobStatusAPIView.as_view(), name='api_export_status'),
+    path('api/imports/<int:pk>/', views.ImportJobStatusAPIView.as_view(), name='api_import_status'),
     path('api/bulk-action/', views.BulkActionView.as_view(), name='api_bulk_action'),
 ]
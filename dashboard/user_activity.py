@@ -0,0 +1,145 @@
+"""
+عدادات نشاط المستخدمين المحسوبة مسبقاً
+Denormalized per-user activity counters (enrollments, attendance, recitations)
+
+قائمة المستخدمين كانت تعدّ تسجيلات الحلقات والحضور والتسميعات بثلاث عمليات
+Count(distinct) على ضم متشعب يكبر مع تاريخ كل طالب. هنا تُحفظ الأعداد في جدول
+UserActivity (صف لكل مستخدم) وتُحدّث عند الكتابة:
+- الإشارات تسجل فرقاً (+1 / -1) لكل مستخدم، ويُطبق بعد نجاح المعاملة
+  بعبارة UPDATE ... F() واحدة لكل مجموعة مستخدمين لهم نفس الفرق
+- المستخدم الذي لا صف له يُحسب له الصف كاملاً من الجداول الخام
+- bulk_create و update() لا ترسل إشارات؛ المستدعي يسجل الفرق بنفسه (record)
+"""
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .rollups import TransactionDeltas
+
+# النموذج -> حقل العداد (الربط دائماً عبر student)
+COUNTER_FIELDS = {
+    'halaqat.HalaqaEnrollment': 'halaqat_count',
+    'halaqat.Attendance': 'sessions_count',
+    'recitation.RecitationRecord': 'recitations_count',
+}
+
+Deltas = Dict[int, Counter]
+
+
+class UserActivityCounters:
+    """تحديث عدادات UserActivity وإعادة بنائها"""
+
+    CHUNK_SIZE = 500
+
+    def __init__(self):
+        self._pending = TransactionDeltas(self.apply)
+
+    # ==================== Signal hooks ====================
+
+    def before_save(self, instance, update_fields=None):
+        instance._activity_student_id = None
+        if instance._state.adding or instance.pk is None:
+            return
+        if update_fields is not None and not {'student', 'student_id'} & set(update_fields):
+            return
+        # نقل السجل إلى طالب آخر (نادر) يحتاج الطالب السابق
+        instance._activity_student_id = (
+            type(instance)._base_manager.filter(pk=instance.pk).values_list('student_id', flat=True).first()
+        )
+
+    def after_save(self, instance, created: bool, update_fields=None):
+        field = COUNTER_FIELDS[instance._meta.label]
+        if created:
+            self.record({instance.student_id: Counter({field: 1})})
+            return
+        previous = getattr(instance, '_activity_student_id', None)
+        instance._activity_student_id = None
+        if previous is not None and previous != instance.student_id:
+            self.record({
+                previous: Counter({field: -1}),
+                instance.student_id: Counter({field: 1}),
+            })
+
+    def after_delete(self, instance):
+        field = COUNTER_FIELDS[instance._meta.label]
+        self.record({instance.student_id: Counter({field: -1})})
+
+    # ==================== Apply ====================
+
+    def record(self, deltas: Deltas):
+        """تسجيل فروق تُطبق بعد نجاح المعاملة الحالية (أو فوراً خارج المعاملات)"""
+        deltas = {user_id: counts for user_id, counts in deltas.items() if user_id is not None}
+        if deltas:
+            self._pending.add(deltas)
+
+    def apply(self, deltas: Deltas):
+        """UPDATE واحد لكل فرق مشترك، وحساب الصفوف الناقصة من الجداول الخام"""
+        from .models import UserActivity
+
+        groups = defaultdict(list)
+        for user_id, counts in deltas.items():
+            counts = tuple(sorted((field, value) for field, value in counts.items() if value))
+            if counts:
+                groups[counts].append(user_id)
+
+        missing = set()
+        for counts, user_ids in groups.items():
+            changes = {field: F(field) + value for field, value in counts}
+            changes['updated_at'] = timezone.now()
+            for start in range(0, len(user_ids), self.CHUNK_SIZE):
+                chunk = user_ids[start:start + self.CHUNK_SIZE]
+                updated = UserActivity.objects.filter(user_id__in=chunk).update(**changes)
+                if updated < len(chunk):
+                    existing = set(UserActivity.objects.filter(user_id__in=chunk).values_list('user_id', flat=True))
+                    missing.update(set(chunk) - existing)
+        if missing:
+            self.rebuild(missing)
+
+    # ==================== Rebuild ====================
+
+    def compute(self, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Counter]:
+        """الأعداد من الجداول الخام: استعلام تجميع واحد لكل نموذج"""
+        from django.apps import apps
+
+        counts: Dict[int, Counter] = defaultdict(Counter)
+        for label, field in COUNTER_FIELDS.items():
+            queryset = apps.get_model(label).objects.order_by()
+            if user_ids is not None:
+                queryset = queryset.filter(student_id__in=user_ids)
+            for user_id, total in queryset.values('student_id').annotate(total=Count('id')).values_list('student_id', 'total'):
+                counts[user_id][field] = total
+        return counts
+
+    def rebuild(self, user_ids: Optional[Iterable[int]] = None) -> int:
+        """إعادة حساب صفوف مستخدمين محددين (أو الجميع)"""
+        from django.contrib.auth import get_user_model
+        from .models import UserActivity
+
+        User = get_user_model()
+        all_counts = None
+        if user_ids is None:
+            user_ids = list(User.objects.values_list('pk', flat=True))
+            all_counts = self.compute()
+        else:
+            # المستخدم المحذوف (حذف متتالٍ) لا يُنشأ له صف
+            user_ids = list(User.objects.filter(pk__in=list(user_ids)).values_list('pk', flat=True))
+
+        written = 0
+        for start in range(0, len(user_ids), self.CHUNK_SIZE):
+            chunk = user_ids[start:start + self.CHUNK_SIZE]
+            counts = all_counts if all_counts is not None else self.compute(chunk)
+            rows = [
+                UserActivity(user_id=user_id, **{field: counts[user_id][field] for field in COUNTER_FIELDS.values()})
+                for user_id in chunk
+            ]
+            with transaction.atomic():
+                UserActivity.objects.filter(user_id__in=chunk).delete()
+                UserActivity.objects.bulk_create(rows)
+            written += len(rows)
+        return written
+
+
+user_activity = UserActivityCounters()
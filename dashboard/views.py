@@ -2,13 +2,12 @@
 Views for Advanced Admin Dashboard
 """
 import json
-import random
-import string
+from collections import defaultdict
 from datetime import datetime, timedelta
 from decimal import Decimal
 
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
 from django.views.generic import TemplateView, ListView, DetailView, View, CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import get_user_model
@@ -17,67 +16,39 @@ from django.db.models import (
     Count, Sum, Avg, Q, F, Case, When, IntegerField, 
     Value, CharField, DateField, DateTimeField
 )
-from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
+from django.db.models.functions import Coalesce, TruncWeek, TruncMonth
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from django.core.cache import cache
-from django.urls import reverse_lazy
-from django.db import transaction
+from django.urls import reverse, reverse_lazy
 
-from accounts.models import CustomUser, StudentProfile, SheikhProfile, ActivityLog
-from halaqat.models import Halaqa, Session, Attendance, HalaqaEnrollment
+from accounts.models import CustomUser, StudentProfile, ActivityLog
+from halaqat.models import Halaqa, Session, Attendance
 from recitation.models import RecitationRecord, RecitationError, MemorizationProgress
 from courses.models import Curriculum, StudentCurriculum, ScheduledNotification
-from gamification.models import Badge, PointsLog, Streak, Achievement
-from reports.models import Certificate, StudentReport
+from gamification.models import Badge, Streak, Achievement
 from quran.models import Surah
 
 from .models import (
     DashboardSettings, DashboardWidget, AdminActionLog,
-    Message, Notification, Alert, ExcelImportJob
+    Message, MessageStatus, Notification, Alert, ExcelImportJob, ExportJob
 )
+from .alerts import alert_resolver
+from .counters import UserCounters
+from .exports import (
+    CONTENT_TYPES, REPORT_SHEETS, export_response, export_runner, records_sheet, report_sheet,
+    should_run_in_background,
+)
+from .importer import import_runner
+from .pagination import KeysetPaginationMixin
+from .rollups import attendance_count, daily_rollups, recitations_count
+from .stats import dashboard_stats
 
 User = get_user_model()
 
-# أسماء العشرة المبشرين بالجنة + 20 صحابي إضافي للحلقات
-SAHABA_NAMES = [
-    # العشرة المبشرون بالجنة
-    ('أبو بكر الصديق', 'male'),
-    ('عمر بن الخطاب', 'male'),
-    ('عثمان بن عفان', 'male'),
-    ('علي بن أبي طالب', 'male'),
-    ('طلحة بن عبيد الله', 'male'),
-    ('الزبير بن العوام', 'male'),
-    ('عبد الرحمن بن عوف', 'male'),
-    ('سعد بن أبي وقاص', 'male'),
-    ('سعيد بن زيد', 'male'),
-    ('أبو عبيدة بن الجراح', 'male'),
-    # 20 صحابي إضافي
-    ('خالد بن الوليد', 'male'),
-    ('عمار بن ياسر', 'male'),
-    ('بلال بن رباح', 'male'),
-    ('سلمان الفارسي', 'male'),
-    ('البراء بن مالك', 'male'),
-    ('عبد الله بن مسعود', 'male'),
-    ('أبو هريرة', 'male'),
-    ('عبد الله بن عباس', 'male'),
-    ('جابر بن عبد الله', 'male'),
-    ('أنس بن مالك', 'male'),
-    ('عبد الله بن الزبير', 'male'),
-    ('القعقاع بن عمرو', 'male'),
-    ('زيد بن ثابت', 'male'),
-    ('أبو سعيد الخدري', 'male'),
-    ('عبد الله بن عمر', 'male'),
-    ('مصعب بن عمير', 'male'),
-    ('حذيفة بن اليمان', 'male'),
-    ('المقداد بن عمرو', 'male'),
-    ('عمرو بن العاص', 'male'),
-    ('أبو أيوب الأنصاري', 'male'),
-]
-
 
 class AdminRequiredMixin(UserPassesTestMixin):
     """Mixin للتحقق من أن المستخدم مشرف"""
@@ -117,48 +88,7 @@ class DashboardHomeView(LoginRequiredMixin, AdminRequiredMixin, TemplateView):
     
     def get_main_stats(self):
         """الحصول على الإحصائيات الرئيسية"""
-        cache_key = 'dashboard_main_stats'
-        stats = cache.get(cache_key)
-        
-        if stats is None:
-            today = timezone.now().date()
-            week_ago = today - timedelta(days=7)
-            month_ago = today - timedelta(days=30)
-            
-            stats = {
-                'total_users': User.objects.count(),
-                'total_students': User.objects.filter(user_type='student').count(),
-                'total_sheikhs': User.objects.filter(user_type='sheikh').count(),
-                'total_halaqat': Halaqa.objects.count(),
-                'total_sessions': Session.objects.count(),
-                'total_recitations': RecitationRecord.objects.count(),
-                'total_certificates': Certificate.objects.count(),
-                'total_points_distributed': PointsLog.objects.aggregate(
-                    total=Sum('points')
-                )['total'] or 0,
-                
-                # إحصائيات جديدة
-                'new_users_today': User.objects.filter(date_joined__date=today).count(),
-                'new_users_week': User.objects.filter(date_joined__date__gte=week_ago).count(),
-                'active_sessions_today': Session.objects.filter(date=today).count(),
-                
-                # متوسطات
-                'avg_attendance': self.get_avg_attendance(),
-                'avg_grade': RecitationRecord.objects.aggregate(
-                    avg=Avg('grade')
-                )['avg'] or 0,
-            }
-            cache.set(cache_key, stats, 300)  # كاش لمدة 5 دقائق
-        
-        return stats
-    
-    def get_avg_attendance(self):
-        """حساب متوسط نسبة الحضور"""
-        total = Attendance.objects.count()
-        if total == 0:
-            return 0
-        present = Attendance.objects.filter(status='present').count()
-        return round((present / total) * 100, 1)
+        return dashboard_stats.get()['main']
     
     def get_charts_data(self):
         """بيانات الرسوم البيانية"""
@@ -219,31 +149,44 @@ class DashboardHomeView(LoginRequiredMixin, AdminRequiredMixin, TemplateView):
     
     def get_quick_stats(self):
         """إحصائيات سريعة"""
-        today = timezone.now().date()
-        
-        return {
-            'sessions_today': Session.objects.filter(date=today).count(),
-            'pending_enrollments': HalaqaEnrollment.objects.filter(status='pending').count(),
-            'new_recitations': RecitationRecord.objects.filter(created_at__date=today).count(),
-            'pending_reports': StudentReport.objects.filter(
-                created_at__date__gte=today - timedelta(days=7)
-            ).count(),
-        }
+        return dashboard_stats.get()['quick']
 
 
-class UserManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class UserManagementView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """إدارة المستخدمين"""
     template_name = 'dashboard/users/list.html'
     context_object_name = 'users'
     paginate_by = 25
+    api_fields = (
+        'id', 'username', 'first_name', 'last_name', 'email', 'user_type', 'is_active', 'date_joined',
+        'halaqat_count', 'sessions_count', 'recitations_count',
+    )
+    
+    # الترتيب المسموح (عدادات النشاط من جدول UserActivity المحسوب مسبقاً)
+    ORDERING_OPTIONS = [
+        ('-date_joined', _('الأحدث أولاً')),
+        ('date_joined', _('الأقدم أولاً')),
+        ('first_name', _('الاسم (أ-ي)')),
+        ('-first_name', _('الاسم (ي-أ)')),
+        ('-recitations_count', _('الأكثر تسميعاً')),
+        ('-sessions_count', _('الأكثر حضوراً')),
+        ('-halaqat_count', _('الأكثر حلقات')),
+    ]
+    ACTIVITY_FILTERS = {
+        'has_recitations': (_('لديه تسميع'), Q(recitations_count__gt=0)),
+        'no_recitations': (_('بدون تسميع'), Q(recitations_count=0)),
+        'no_sessions': (_('بدون حضور'), Q(sessions_count=0)),
+        'no_halaqat': (_('بدون حلقات'), Q(halaqat_count=0)),
+    }
     
     def get_queryset(self):
+        # المستخدم بلا صف عدادات لا نشاط له
         queryset = User.objects.select_related(
             'student_profile', 'sheikh_profile'
         ).annotate(
-            halaqat_count=Count('halaqa_enrollments', distinct=True),
-            sessions_count=Count('attendances', distinct=True),
-            recitations_count=Count('recitation_records', distinct=True)
+            halaqat_count=Coalesce(F('activity_counters__halaqat_count'), 0),
+            sessions_count=Coalesce(F('activity_counters__sessions_count'), 0),
+            recitations_count=Coalesce(F('activity_counters__recitations_count'), 0)
         )
         
         # التصفية حسب نوع المستخدم
@@ -258,6 +201,11 @@ class UserManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView):
         elif is_active == 'false':
             queryset = queryset.filter(is_active=False)
         
+        # التصفية حسب النشاط
+        activity = self.ACTIVITY_FILTERS.get(self.request.GET.get('activity'))
+        if activity:
+            queryset = queryset.filter(activity[1])
+        
         # البحث
         search = self.request.GET.get('search')
         if search:
@@ -271,37 +219,49 @@ class UserManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView):
         
         # الترتيب
         ordering = self.request.GET.get('ordering', '-date_joined')
-        queryset = queryset.order_by(ordering)
+        if ordering not in dict(self.ORDERING_OPTIONS):
+            ordering = '-date_joined'
+        queryset = queryset.order_by(ordering, '-pk')
         
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['user_types'] = User.UserType.choices
+        context['ordering_options'] = self.ORDERING_OPTIONS
+        context['activity_filters'] = [(key, label) for key, (label, _q) in self.ACTIVITY_FILTERS.items()]
         context['current_filters'] = {
             'type': self.request.GET.get('type', ''),
             'active': self.request.GET.get('active', ''),
+            'activity': self.request.GET.get('activity', ''),
             'search': self.request.GET.get('search', ''),
+            'ordering': self.request.GET.get('ordering', ''),
         }
         
-        # إحصائيات
+        # إحصائيات: استعلام تجميع واحد حسب النوع
+        by_type = list(User.objects.order_by().values('user_type').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True))
+        ))
+        totals = {row['user_type']: row for row in by_type}
         context['stats'] = {
-            'total': User.objects.count(),
-            'active': User.objects.filter(is_active=True).count(),
-            'students': User.objects.filter(user_type='student').count(),
-            'sheikhs': User.objects.filter(user_type='sheikh').count(),
-            'admins': User.objects.filter(user_type='admin').count(),
-            'parents': User.objects.filter(user_type='parent').count(),
+            'total': sum(row['total'] for row in by_type),
+            'active': sum(row['active'] for row in by_type),
+            'students': totals.get('student', {}).get('total', 0),
+            'sheikhs': totals.get('sheikh', {}).get('total', 0),
+            'admins': totals.get('admin', {}).get('total', 0),
+            'parents': totals.get('parent', {}).get('total', 0),
         }
         
         return context
 
 
-class HalaqatManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class HalaqatManagementView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """إدارة الحلقات"""
     template_name = 'dashboard/halaqat/list.html'
     context_object_name = 'halaqat'
     paginate_by = 25
+    api_fields = ('id', 'name', 'status', 'sheikh_id', 'course_id', 'students_count', 'sessions_count', 'created_at')
     
     def get_queryset(self):
         queryset = Halaqa.objects.select_related('sheikh', 'course').annotate(
@@ -347,11 +307,12 @@ class HalaqatManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView):
         return context
 
 
-class RecitationsManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class RecitationsManagementView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """إدارة التسميعات"""
     template_name = 'dashboard/recitations/list.html'
     context_object_name = 'recitations'
     paginate_by = 25
+    api_fields = ('id', 'student_id', 'session_id', 'recitation_type', 'grade', 'grade_level', 'created_at')
     
     def get_queryset(self):
         queryset = RecitationRecord.objects.select_related(
@@ -400,10 +361,11 @@ class RecitationsManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView
         context['current_filters'] = self.request.GET.dict()
         
         # إحصائيات
-        today = timezone.now().date()
+        # بداية اليوم المحلي كمدى على created_at ليستخدم الفهرس (بدل __date)
+        today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
         context['stats'] = {
             'total': RecitationRecord.objects.count(),
-            'today': RecitationRecord.objects.filter(created_at__date=today).count(),
+            'today': RecitationRecord.objects.filter(created_at__gte=today_start).count(),
             'new_memorization': RecitationRecord.objects.filter(recitation_type='new').count(),
             'review': RecitationRecord.objects.filter(recitation_type='review').count(),
             'avg_grade': RecitationRecord.objects.aggregate(avg=Avg('grade'))['avg'] or 0,
@@ -412,11 +374,12 @@ class RecitationsManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView
         return context
 
 
-class AttendanceManagementView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class AttendanceManagementView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """إدارة الحضور"""
     template_name = 'dashboard/attendance/list.html'
     context_object_name = 'attendances'
     paginate_by = 50
+    api_fields = ('id', 'student_id', 'session_id', 'session__date', 'session__start_time', 'status')
     
     def get_queryset(self):
         queryset = Attendance.objects.select_related(
@@ -524,44 +487,32 @@ class ReportsView(LoginRequiredMixin, AdminRequiredMixin, TemplateView):
             return today - timedelta(days=30), today
     
     def get_overview_report(self, start_date, end_date):
-        """تقرير عام"""
-        # User growth by month (last 6 months)
-        from django.db.models.functions import TruncMonth
-        user_growth = User.objects.filter(
-            date_joined__date__range=[start_date, end_date]
-        ).annotate(
-            month=TruncMonth('date_joined')
-        ).values('month').annotate(
-            count=Count('id')
-        ).order_by('month')
+        """تقرير عام (من جداول التجميع اليومية)"""
+        totals = daily_rollups.totals(start_date, end_date)
+        series = daily_rollups.series(start_date, end_date)
         
-        # Activity by day of week
-        activity_by_day = Session.objects.filter(
-            date__range=[start_date, end_date]
-        ).values('date').annotate(
-            count=Count('id')
-        ).order_by('date')[:30]
+        # نمو المستخدمين شهرياً
+        user_growth = defaultdict(int)
+        for row in series:
+            if row['new_users']:
+                user_growth[row['date'].replace(day=1)] += row['new_users']
+        
+        # الجلسات حسب اليوم
+        activity_by_day = [row for row in series if row['sessions_count']][:30]
         
+        recitations = recitations_count(totals)
         return {
-            'new_users': User.objects.filter(date_joined__date__range=[start_date, end_date]).count(),
-            'new_students': User.objects.filter(
-                user_type='student', date_joined__date__range=[start_date, end_date]
-            ).count(),
-            'sessions_count': Session.objects.filter(date__range=[start_date, end_date]).count(),
-            'recitations_count': RecitationRecord.objects.filter(
-                created_at__date__range=[start_date, end_date]
-            ).count(),
-            'avg_grade': RecitationRecord.objects.filter(
-                created_at__date__range=[start_date, end_date]
-            ).aggregate(avg=Avg('grade'))['avg'] or 0,
-            'total_attendance': Attendance.objects.filter(
-                session__date__range=[start_date, end_date]
-            ).count(),
+            'new_users': totals['new_users'],
+            'new_students': totals['new_students'],
+            'sessions_count': totals['sessions_count'],
+            'recitations_count': recitations,
+            'avg_grade': totals['grade_sum'] / recitations if recitations else 0,
+            'total_attendance': attendance_count(totals),
             # Chart data
-            'user_growth_labels': [u['month'].strftime('%Y-%m') for u in user_growth] if user_growth else [],
-            'user_growth_data': [u['count'] for u in user_growth] if user_growth else [],
-            'activity_labels': [a['date'].strftime('%m-%d') for a in activity_by_day] if activity_by_day else [],
-            'activity_data': [a['count'] for a in activity_by_day] if activity_by_day else [],
+            'user_growth_labels': [month.strftime('%Y-%m') for month in user_growth],
+            'user_growth_data': list(user_growth.values()),
+            'activity_labels': [row['date'].strftime('%m-%d') for row in activity_by_day],
+            'activity_data': [row['sessions_count'] for row in activity_by_day],
         }
     
     def get_students_report(self, start_date, end_date):
@@ -725,11 +676,14 @@ class BulkActionView(LoginRequiredMixin, AdminRequiredMixin, View):
         elif action == 'update':
             fields = params.get('fields', {})
             queryset.update(**fields)
+            # update() لا يرسل إشارات
+            dashboard_stats.invalidate()
             return {'updated': queryset.count()}
         
         elif action == 'change_status':
             new_status = params.get('status')
             queryset.update(status=new_status)
+            dashboard_stats.invalidate()
             return {'updated': queryset.count()}
         
         return {'message': 'Action completed'}
@@ -754,66 +708,56 @@ class ChartDataAPIView(LoginRequiredMixin, AdminRequiredMixin, View):
         
         return JsonResponse(data, safe=False)
     
+    def get_series(self, period):
+        """صفوف التجميع اليومية للفترة، للمنصة أو لحلقة أو لشيخ"""
+        days = {'week': 7, 'month': 30, 'year': 365}.get(period, 30)
+        today = timezone.localdate()
+        filters = {}
+        for param in ('halaqa', 'sheikh'):
+            value = self.request.GET.get(param)
+            if value and value.isdigit():
+                filters[f'{param}_id'] = int(value)
+        return daily_rollups.series(today - timedelta(days=days), today, **filters)
+    
     def get_user_growth_data(self, period):
         """بيانات نمو المستخدمين"""
-        if period == 'week':
-            days = 7
-            trunc = TruncDate
-        elif period == 'month':
-            days = 30
-            trunc = TruncDate
-        else:
-            days = 365
-            trunc = TruncMonth
-        
-        start_date = timezone.now() - timedelta(days=days)
-        
-        data = User.objects.filter(
-            date_joined__gte=start_date
-        ).annotate(
-            date=trunc('date_joined')
-        ).values('date').annotate(
-            count=Count('id')
-        ).order_by('date')
+        growth = defaultdict(int)
+        for row in self.get_series(period):
+            if row.get('new_users'):
+                # السنة مجمّعة شهرياً
+                day = row['date'].replace(day=1) if period not in ('week', 'month') else row['date']
+                growth[day] += row['new_users']
         
         return {
-            'labels': [d['date'].strftime('%Y-%m-%d') for d in data],
-            'data': [d['count'] for d in data],
+            'labels': [day.strftime('%Y-%m-%d') for day in growth],
+            'data': list(growth.values()),
         }
     
     def get_recitation_progress_data(self, period):
         """بيانات تقدم التسميع"""
-        days = {'week': 7, 'month': 30, 'year': 365}.get(period, 30)
-        start_date = timezone.now() - timedelta(days=days)
-        
-        data = RecitationRecord.objects.filter(
-            created_at__date__gte=start_date
-        ).annotate(
-            date=TruncDate('created_at')
-        ).values('date').annotate(
-            count=Count('id'),
-            avg_grade=Avg('grade')
-        ).order_by('date')
+        data = [(row, recitations_count(row)) for row in self.get_series(period)]
+        data = [(row, count) for row, count in data if count]
         
         return {
-            'labels': [d['date'].strftime('%Y-%m-%d') for d in data],
-            'count': [d['count'] for d in data],
-            'grades': [round(d['avg_grade'] or 0, 1) for d in data],
+            'labels': [row['date'].strftime('%Y-%m-%d') for row, count in data],
+            'count': [count for row, count in data],
+            'grades': [round(row['grade_sum'] / count, 1) for row, count in data],
         }
     
     def get_attendance_trend_data(self, period):
         """بيانات trend الحضور"""
-        days = {'week': 7, 'month': 30, 'year': 365}.get(period, 30)
-        start_date = timezone.now() - timedelta(days=days)
-        
-        data = Attendance.objects.filter(
-            session__date__gte=start_date
-        ).values('session__date', 'status').annotate(
-            count=Count('id')
-        ).order_by('session__date')
+        raw_data = []
+        for row in self.get_series(period):
+            for status in Attendance.AttendanceStatus.values:
+                if row[f'attendance_{status}']:
+                    raw_data.append({
+                        'session__date': row['date'],
+                        'status': status,
+                        'count': row[f'attendance_{status}'],
+                    })
         
         return {
-            'raw_data': list(data),
+            'raw_data': raw_data,
         }
     
     def get_grade_distribution_data(self):
@@ -830,42 +774,45 @@ class ChartDataAPIView(LoginRequiredMixin, AdminRequiredMixin, View):
 
 # ==================== Messages Views ====================
 
-class MessagesInboxView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class MessagesInboxView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """صندوق الوارد"""
     template_name = 'dashboard/messages/inbox.html'
-    context_object_name = 'messages'
+    context_object_name = 'statuses'
     paginate_by = 20
+    api_fields = ('message_id', 'message__subject', 'message__sender_id', 'message__created_at', 'read_at')
     
     def get_queryset(self):
-        return Message.objects.filter(
-            recipients=self.request.user,
+        # مسح نطاق في فهرس (المستخدم، الأرشفة، الرسالة) بدل ربط M2M
+        return MessageStatus.objects.filter(
+            user=self.request.user,
             is_archived=False
         ).exclude(
-            message_type=Message.MessageType.BROADCAST
-        ).select_related('sender').prefetch_related('read_by')
+            message__message_type=Message.MessageType.BROADCAST
+        ).select_related('message__sender').order_by('-message_id')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['unread_count'] = Message.objects.filter(
-            recipients=self.request.user
-        ).exclude(read_by=self.request.user).count()
+        statuses = MessageStatus.objects.filter(user=self.request.user)
+        context['unread_count'] = statuses.filter(read_at__isnull=True, is_archived=False).count()
         context['sent_count'] = Message.objects.filter(sender=self.request.user).count()
-        context['archived_count'] = Message.objects.filter(
-            recipients=self.request.user, is_archived=True
-        ).count()
+        context['archived_count'] = statuses.filter(is_archived=True).count()
         return context
 
 
-class MessagesSentView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class MessagesSentView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """الرسائل المرسلة"""
     template_name = 'dashboard/messages/sent.html'
     context_object_name = 'messages'
     paginate_by = 20
+    api_fields = ('id', 'subject', 'message_type', 'recipients_count', 'read_count', 'created_at')
     
     def get_queryset(self):
         return Message.objects.filter(
             sender=self.request.user
-        ).select_related('sender').prefetch_related('recipients', 'read_by')
+        ).select_related('sender').prefetch_related('recipients').annotate(
+            recipients_count=Count('statuses'),
+            read_count=Count('statuses', filter=Q(statuses__read_at__isnull=False)),
+        ).order_by('-created_at')
 
 
 class MessageDetailView(LoginRequiredMixin, AdminRequiredMixin, DetailView):
@@ -911,11 +858,12 @@ class MessageCreateView(LoginRequiredMixin, AdminRequiredMixin, CreateView):
 
 # ==================== Notifications Views ====================
 
-class NotificationsListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
+class NotificationsListView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """قائمة الإشعارات"""
     template_name = 'dashboard/notifications/list.html'
     context_object_name = 'notifications'
     paginate_by = 30
+    api_fields = ('id', 'notification_type', 'title', 'message', 'link', 'is_read', 'is_important', 'created_at')
     
     def get_queryset(self):
         queryset = Notification.objects.filter(user=self.request.user)
@@ -960,6 +908,7 @@ class MarkAllNotificationsReadView(LoginRequiredMixin, AdminRequiredMixin, View)
         Notification.objects.filter(user=request.user, is_read=False).update(
             is_read=True, read_at=timezone.now()
         )
+        UserCounters.invalidate([request.user.pk], UserCounters.DASHBOARD_NOTIFICATIONS)
         return JsonResponse({'success': True, 'message': _('تم تحديد جميع الإشعارات كمقروءة')})
 
 
@@ -983,10 +932,13 @@ class AlertsListView(LoginRequiredMixin, AdminRequiredMixin, ListView):
         return context
 
 
-class DismissAlertView(LoginRequiredMixin, AdminRequiredMixin, View):
-    """إغلاق تنبيه"""
+class DismissAlertView(LoginRequiredMixin, View):
+    """إغلاق تنبيه (للمشرف، أو لمن يظهر له التنبيه في الصفحات)"""
     def post(self, request, pk):
         alert = get_object_or_404(Alert, pk=pk)
+        is_admin = request.user.is_staff or request.user.is_superuser or request.user.user_type == 'admin'
+        if not is_admin and not alert_resolver.is_visible(alert.pk, request.user):
+            return JsonResponse({'success': False}, status=404)
         alert.dismiss(request.user)
         return JsonResponse({'success': True})
 
@@ -1015,7 +967,6 @@ class ProcessExcelImportView(LoginRequiredMixin, AdminRequiredMixin, View):
     
     def post(self, request):
         try:
-            import pandas as pd
             import openpyxl
         except ImportError:
             return JsonResponse({
@@ -1035,7 +986,7 @@ class ProcessExcelImportView(LoginRequiredMixin, AdminRequiredMixin, View):
         auto_distribute = request.POST.get('auto_distribute') == 'on'
         distribution_count = int(request.POST.get('distribution_count', 10))
         
-        # إنشاء مهمة الاستيراد
+        # إنشاء مهمة الاستيراد؛ القراءة والمعالجة في عامل الاستيراد (dashboard.importer)
         job = ExcelImportJob.objects.create(
             import_type=import_type,
             file_name=excel_file.name,
@@ -1044,329 +995,89 @@ class ProcessExcelImportView(LoginRequiredMixin, AdminRequiredMixin, View):
             auto_distribute=auto_distribute,
             distribution_count=distribution_count,
             created_by=request.user,
-            status=ExcelImportJob.Status.PROCESSING,
-            started_at=timezone.now()
+            status=ExcelImportJob.Status.PENDING
         )
+        import_runner.enqueue(job.pk)
         
-        try:
-            # قراءة ملف Excel
-            df = pd.read_excel(job.file_path.path)
-            job.total_rows = len(df)
-            job.save()
-            
-            # معالجة حسب النوع
-            if import_type == 'students':
-                result = self.process_students_import(job, df, request)
-            elif import_type == 'sheikhs':
-                result = self.process_sheikhs_import(job, df, request)
-            else:
-                result = {'success': False, 'error': _('نوع استيراد غير معروف')}
-            
-            # تحديث حالة المهمة
-            if result['success']:
-                job.status = ExcelImportJob.Status.COMPLETED if result['failed'] == 0 else ExcelImportJob.Status.PARTIAL
-                job.success_count = result['success_count']
-                job.failed_count = result['failed']
-                job.skipped_count = result['skipped']
-                job.errors_log = result.get('errors', [])
-                job.created_users = result.get('created_users', [])
-                job.created_halaqat = result.get('created_halaqat', [])
-            else:
-                job.status = ExcelImportJob.Status.FAILED
-                job.errors_log = [result['error']]
-            
-            job.completed_at = timezone.now()
-            job.save()
-            
-            return JsonResponse({
-                'success': True,
-                'job_id': job.id,
-                'message': _('تم الاستيراد بنجاح'),
-                'result': {
-                    'total': job.total_rows,
-                    'success': job.success_count,
-                    'failed': job.failed_count,
-                    'skipped': job.skipped_count
-                }
-            })
-            
-        except Exception as e:
-            job.status = ExcelImportJob.Status.FAILED
-            job.errors_log = [str(e)]
-            job.completed_at = timezone.now()
-            job.save()
-            
-            return JsonResponse({
-                'success': False,
-                'error': str(e)
-            })
-    
-    def process_students_import(self, job, df, request):
-        """معالجة استيراد الطلاب"""
-        errors = []
-        created_users = []
-        created_halaqat = []
-        success_count = 0
-        failed = 0
-        skipped = 0
-        
-        # التحقق من الأعمدة المطلوبة
-        required_columns = ['name', 'email']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            return {
-                'success': False,
-                'error': _('الأعمدة المفقودة: {}').format(', '.join(missing_columns))
-            }
-        
-        # إنشاء الحلقات والمشايخ إذا كان التوزيع التلقائي مفعّل
-        halaqat = []
-        sheikhs = []
-        
-        if job.auto_distribute:
-            halaqat = self.create_halaqat_for_distribution(job.distribution_count, request.user)
-            created_halaqat = [{'id': h.id, 'name': h.name} for h in halaqat]
-            sheikhs = list(User.objects.filter(user_type='sheikh', is_active=True))
-            
-            if len(sheikhs) == 0:
-                return {
-                    'success': False,
-                    'error': _('لا يوجد مشايخ نشطون للتوزيع')
-                }
-        
-        # معالجة كل صف
-        for index, row in df.iterrows():
-            try:
-                with transaction.atomic():
-                    name = str(row.get('name', '')).strip()
-                    email = str(row.get('email', '')).strip().lower()
-                    phone = str(row.get('phone', '')).strip()
-                    
-                    if not name or not email:
-                        skipped += 1
-                        continue
-                    
-                    # تقسيم الاسم
-                    name_parts = name.split(' ', 1)
-                    first_name = name_parts[0]
-                    last_name = name_parts[1] if len(name_parts) > 1 else ''
-                    
-                    # التحقق من وجود المستخدم
-                    if User.objects.filter(email=email).exists():
-                        user = User.objects.get(email=email)
-                        created = False
-                    elif User.objects.filter(username=email).exists():
-                        user = User.objects.get(username=email)
-                        created = False
-                    else:
-                        if not job.create_accounts:
-                            skipped += 1
-                            continue
-                        
-                        # إنشاء مستخدم جديد
-                        username = self.generate_username(first_name, last_name)
-                        password = self.generate_password()
-                        
-                        user = User.objects.create_user(
-                            username=username,
-                            email=email,
-                            password=password,
-                            first_name=first_name,
-                            last_name=last_name,
-                            phone=phone,
-                            user_type='student'
-                        )
-                        
-                        # إنشاء ملف الطالب
-                        StudentProfile.objects.create(user=user)
-                        
-                        created = True
-                        created_users.append({
-                            'id': user.id,
-                            'name': name,
-                            'username': username,
-                            'password': password,
-                            'email': email
-                        })
-                    
-                    # التوزيع التلقائي على الحلقات
-                    if job.auto_distribute and halaqat:
-                        halaqa_index = (success_count + failed) % len(halaqat)
-                        halaqa = halaqat[halaqa_index]
-                        
-                        # التحقق من عدم وجود تسجيل سابق
-                        if not HalaqaEnrollment.objects.filter(student=user, halaqa=halaqa).exists():
-                            HalaqaEnrollment.objects.create(
-                                student=user,
-                                halaqa=halaqa,
-                                status='active'
-                            )
-                    
-                    success_count += 1
-                    
-            except Exception as e:
-                failed += 1
-                errors.append({
-                    'row': index + 2,
-                    'name': name if 'name' in locals() else 'Unknown',
-                    'error': str(e)
-                })
-        
-        return {
+        return JsonResponse({
             'success': True,
-            'success_count': success_count,
-            'failed': failed,
-            'skipped': skipped,
-            'errors': errors[:50],  # أول 50 خطأ فقط
-            'created_users': created_users,
-            'created_halaqat': created_halaqat
-        }
+            'job_id': job.id,
+            'message': _('بدأ الاستيراد في الخلفية'),
+            'status_url': reverse('dashboard:api_import_status', args=[job.pk]),
+        })
+
+
+class ImportJobStatusAPIView(LoginRequiredMixin, AdminRequiredMixin, View):
+    """تقدم عملية استيراد (للمتابعة من الصفحة، دون تحميل سجلات الحسابات)"""
     
-    def process_sheikhs_import(self, job, df, request):
-        """معالجة استيراد المشايخ"""
-        errors = []
-        created_users = []
-        success_count = 0
-        failed = 0
-        skipped = 0
-        
-        # التحقق من الأعمدة المطلوبة
-        required_columns = ['name', 'email']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            return {
-                'success': False,
-                'error': _('الأعمدة المفقودة: {}').format(', '.join(missing_columns))
-            }
-        
-        # معالجة كل صف
-        for index, row in df.iterrows():
-            try:
-                with transaction.atomic():
-                    name = str(row.get('name', '')).strip()
-                    email = str(row.get('email', '')).strip().lower()
-                    phone = str(row.get('phone', '')).strip()
-                    specialization = str(row.get('specialization', 'hifz')).strip()
-                    experience = int(row.get('experience', 0)) if pd.notna(row.get('experience')) else 0
-                    
-                    if not name or not email:
-                        skipped += 1
-                        continue
-                    
-                    # تقسيم الاسم
-                    name_parts = name.split(' ', 1)
-                    first_name = name_parts[0]
-                    last_name = name_parts[1] if len(name_parts) > 1 else ''
-                    
-                    # التحقق من وجود المستخدم
-                    if User.objects.filter(email=email).exists():
-                        skipped += 1
-                        continue
-                    
-                    if not job.create_accounts:
-                        skipped += 1
-                        continue
-                    
-                    # إنشاء مستخدم جديد
-                    username = self.generate_username(first_name, last_name)
-                    password = self.generate_password()
-                    
-                    user = User.objects.create_user(
-                        username=username,
-                        email=email,
-                        password=password,
-                        first_name=first_name,
-                        last_name=last_name,
-                        phone=phone,
-                        user_type='sheikh'
-                    )
-                    
-                    # إنشاء ملف الشيخ
-                    SheikhProfile.objects.create(
-                        user=user,
-                        specialization=specialization if specialization in ['hifz', 'tajweed', 'qiraat', 'ijazah'] else 'hifz',
-                        years_of_experience=experience
-                    )
-                    
-                    created_users.append({
-                        'id': user.id,
-                        'name': name,
-                        'username': username,
-                        'password': password,
-                        'email': email
-                    })
-                    
-                    success_count += 1
-                    
-            except Exception as e:
-                failed += 1
-                errors.append({
-                    'row': index + 2,
-                    'name': name if 'name' in locals() else 'Unknown',
-                    'error': str(e)
-                })
-        
-        return {
-            'success': True,
-            'success_count': success_count,
-            'failed': failed,
-            'skipped': skipped,
-            'errors': errors[:50],
-            'created_users': created_users
-        }
+    def get(self, request, pk):
+        job = get_object_or_404(
+            ExcelImportJob.objects.only(
+                'status', 'total_rows', 'processed_rows', 'success_count', 'failed_count',
+                'skipped_count', 'error_message', 'started_at', 'checkpoint_at', 'created_at',
+                'completed_at', 'created_by_id',
+            ),
+            pk=pk
+        )
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'total': job.total_rows,
+            'processed': job.processed_rows,
+            'progress': job.progress,
+            'success': job.success_count,
+            'failed': job.failed_count,
+            'skipped': job.skipped_count,
+            'error': job.error_message,
+            'is_active': job.is_active,
+            'can_resume': job.can_resume,
+        })
+
+
+class CancelImportJobView(LoginRequiredMixin, AdminRequiredMixin, View):
+    """إلغاء عملية استيراد؛ ما حُفظ من أجزاء يبقى ويمكن الاستئناف منه"""
     
-    def create_halaqat_for_distribution(self, count, created_by):
-        """إنشاء حلقات للتوزيع"""
-        halaqat = []
-        
-        # الحصول على المشايخ النشطين
-        sheikhs = list(User.objects.filter(user_type='sheikh', is_active=True))
-        
-        if not sheikhs:
-            raise ValueError(_('لا يوجد مشايخ نشطون'))
-        
-        # التأكد من عدم تجاوز عدد الحلقات المتاح
-        count = min(count, len(SAHABA_NAMES))
-        
-        for i in range(count):
-            sahaba_name, gender = SAHABA_NAMES[i]
-            sheikh = sheikhs[i % len(sheikhs)]
-            
-            # إنشاء اسم الحلقة
-            halaqa_name = f"حلقة {sahaba_name}"
-            
-            # التحقق من عدم وجود حلقة بنفس الاسم
-            if Halaqa.objects.filter(name=halaqa_name).exists():
-                halaqa = Halaqa.objects.get(name=halaqa_name)
-            else:
-                halaqa = Halaqa.objects.create(
-                    name=halaqa_name,
-                    sheikh=sheikh,
-                    max_students=10,
-                    description=f"حلقة تسمية باسم الصحابي الجليل {sahaba_name} - من العشرة المبشرين بالجنة أو من الصحابة المبجلون"
-                )
-            
-            halaqat.append(halaqa)
-        
-        return halaqat
+    @method_decorator(require_POST)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
     
-    def generate_username(self, first_name, last_name):
-        """توليد اسم مستخدم فريد"""
-        base = f"{first_name.lower()}{last_name.lower()}".replace(' ', '')[:15]
-        username = base
-        counter = 1
-        
-        while User.objects.filter(username=username).exists():
-            username = f"{base}{counter}"
-            counter += 1
-        
-        return username
+    def post(self, request, pk):
+        get_object_or_404(ExcelImportJob, pk=pk)
+        Status = ExcelImportJob.Status
+        # لم تبدأ بعد: تُلغى مباشرة، وإلا يتوقف المنفذ قبل الجزء التالي
+        cancelled = ExcelImportJob.objects.filter(pk=pk, status=Status.PENDING).update(
+            status=Status.CANCELLED, completed_at=timezone.now()
+        ) or ExcelImportJob.objects.filter(pk=pk, status=Status.PROCESSING).update(cancel_requested=True)
+        if not cancelled:
+            return JsonResponse({'success': False, 'error': _('العملية ليست قيد التنفيذ')}, status=400)
+        return JsonResponse({'success': True, 'message': _('جاري إلغاء الاستيراد')})
+
+
+class ResumeImportJobView(LoginRequiredMixin, AdminRequiredMixin, View):
+    """استئناف عملية استيراد من آخر نقطة حفظ"""
+    
+    @method_decorator(require_POST)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
     
-    def generate_password(self):
-        """توليد كلمة مرور عشوائية"""
-        # كلمة مرور من 8 أحرف تتضمن أرقام وحروف
-        chars = string.ascii_letters + string.digits
-        return ''.join(random.choice(chars) for _ in range(10))
+    def post(self, request, pk):
+        job = get_object_or_404(ExcelImportJob, pk=pk)
+        if not job.can_resume:
+            return JsonResponse({'success': False, 'error': _('لا يمكن استئناف هذه العملية')}, status=400)
+        
+        ExcelImportJob.objects.filter(pk=pk, status=job.status).update(
+            status=ExcelImportJob.Status.PENDING,
+            cancel_requested=False,
+            error_message='',
+            completed_at=None,
+        )
+        import_runner.enqueue(job.pk)
+        return JsonResponse({
+            'success': True,
+            'message': _('تم استئناف الاستيراد من الصف {}').format(job.processed_rows + 1),
+            'status_url': reverse('dashboard:api_import_status', args=[job.pk]),
+        })
 
 
 class DownloadImportTemplateView(LoginRequiredMixin, AdminRequiredMixin, View):
@@ -1446,45 +1157,36 @@ class ExportCreatedAccountsView(LoginRequiredMixin, AdminRequiredMixin, View):
     """تصدير الحسابات المنشأة"""
     
     def get(self, request, job_id):
-        try:
-            import pandas as pd
-            from io import BytesIO
-        except ImportError:
-            return HttpResponse(_('مكتبة pandas غير مثبتة'), status=500)
-        
         job = get_object_or_404(ExcelImportJob, id=job_id, created_by=request.user)
         
         if not job.created_users:
             return HttpResponse(_('لا توجد حسابات منشأة'), status=404)
         
-        df = pd.DataFrame(job.created_users)
-        
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Accounts')
-        
-        output.seek(0)
+        export_format = request.GET.get('format', 'xlsx')
+        if export_format not in ExportJob.Format.values:
+            export_format = 'xlsx'
         
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="created_accounts_{job_id}.xlsx"'
-        return response
+        try:
+            return export_response(
+                records_sheet('Accounts', job.created_users),
+                export_format,
+                f'created_accounts_{job_id}.{export_format}'
+            )
+        except ImportError:
+            return HttpResponse(_('مكتبة openpyxl غير مثبتة'), status=500)
 
 
 
 class ReportExportView(LoginRequiredMixin, AdminRequiredMixin, View):
-    """تصدير التقارير بصيغة Excel"""
+    """تصدير التقارير (Excel أو CSV أو NDJSON)، والكبيرة منها في الخلفية"""
     
     def get(self, request):
-        try:
-            import pandas as pd
-            from io import BytesIO
-        except ImportError:
-            return HttpResponse(_('مكتبة pandas غير مثبتة'), status=500)
-        
         report_type = request.GET.get('type', 'overview')
+        if report_type not in REPORT_SHEETS:
+            report_type = 'overview'
+        export_format = request.GET.get('format', 'xlsx')
+        if export_format not in ExportJob.Format.values:
+            export_format = 'xlsx'
         date_range = request.GET.get('range', 'month')
         
         # حساب نطاق التاريخ
@@ -1508,121 +1210,66 @@ class ReportExportView(LoginRequiredMixin, AdminRequiredMixin, View):
             else:
                 start_date, end_date = today - timedelta(days=30), today
         
-        # إنشاء ملف Excel
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            
-            if report_type == 'overview':
-                self._export_overview(writer, start_date, end_date)
-            elif report_type == 'students':
-                self._export_students(writer, start_date, end_date)
-            elif report_type == 'halaqat':
-                self._export_halaqat(writer, start_date, end_date)
-            elif report_type == 'recitations':
-                self._export_recitations(writer, start_date, end_date)
-            else:
-                self._export_overview(writer, start_date, end_date)
+        sheet = report_sheet(report_type, start_date, end_date)
         
-        output.seek(0)
-        
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename="report_{report_type}_{start_date}.xlsx"'
-        return response
-    
-    def _export_overview(self, writer, start_date, end_date):
-        """تصدير نظرة عامة"""
-        import pandas as pd
-        
-        data = {
-            'المعيار': [
-                'مستخدمين جدد',
-                'طلاب جدد',
-                'جلسات منعقدة',
-                'تسميعات',
-                'متوسط الدرجات',
-                'سجلات حضور'
-            ],
-            'القيمة': [
-                User.objects.filter(date_joined__date__range=[start_date, end_date]).count(),
-                User.objects.filter(user_type='student', date_joined__date__range=[start_date, end_date]).count(),
-                Session.objects.filter(date__range=[start_date, end_date]).count(),
-                RecitationRecord.objects.filter(created_at__date__range=[start_date, end_date]).count(),
-                round(RecitationRecord.objects.filter(created_at__date__range=[start_date, end_date]).aggregate(avg=Avg('grade'))['avg'] or 0, 2),
-                Attendance.objects.filter(session__date__range=[start_date, end_date]).count()
-            ]
-        }
+        if request.GET.get('background') or should_run_in_background(sheet):
+            job = ExportJob.objects.create(
+                report_type=report_type,
+                export_format=export_format,
+                start_date=start_date,
+                end_date=end_date,
+                created_by=request.user
+            )
+            export_runner.enqueue(job.pk)
+            messages.info(request, _('التقرير كبير، يجري تصديره في الخلفية وستصلك رسالة عند اكتماله'))
+            return redirect('dashboard:export_jobs')
         
-        df = pd.DataFrame(data)
-        df.to_excel(writer, index=False, sheet_name='Overview')
+        try:
+            return export_response(sheet, export_format, f'report_{report_type}_{start_date}.{export_format}')
+        except ImportError:
+            return HttpResponse(_('مكتبة openpyxl غير مثبتة'), status=500)
+
+
+class ExportJobListView(LoginRequiredMixin, AdminRequiredMixin, KeysetPaginationMixin, ListView):
+    """عمليات التصدير في الخلفية"""
+    template_name = 'dashboard/reports/exports.html'
+    context_object_name = 'jobs'
+    paginate_by = 20
+    api_fields = ('id', 'report_type', 'export_format', 'status', 'row_count', 'created_at', 'completed_at')
     
-    def _export_students(self, writer, start_date, end_date):
-        """تصدير بيانات الطلاب"""
-        import pandas as pd
-        
-        students = User.objects.filter(user_type='student').annotate(
-            sessions_count=Count('attendances', filter=Q(attendances__session__date__range=[start_date, end_date])),
-            recitations_count=Count('recitation_records', filter=Q(recitation_records__created_at__date__range=[start_date, end_date])),
-            avg_grade=Avg('recitation_records__grade', filter=Q(recitation_records__created_at__date__range=[start_date, end_date])),
-            total_pages=Sum('recitation_records__pages_count', filter=Q(recitation_records__created_at__date__range=[start_date, end_date]))
-        ).order_by('-recitations_count')
-        
-        data = []
-        for student in students:
-            data.append({
-                'الاسم': student.get_full_name() or student.username,
-                'اسم المستخدم': student.username,
-                'البريد': student.email,
-                'الجلسات': student.sessions_count,
-                'التسميعات': student.recitations_count,
-                'متوسط الدرجة': round(student.avg_grade or 0, 2),
-                'الصفحات': student.total_pages or 0
-            })
-        
-        df = pd.DataFrame(data)
-        df.to_excel(writer, index=False, sheet_name='Students')
+    def get_queryset(self):
+        return ExportJob.objects.filter(created_by=self.request.user)
+
+
+class ExportJobDownloadView(LoginRequiredMixin, AdminRequiredMixin, View):
+    """تحميل ملف عملية تصدير مكتملة"""
     
-    def _export_halaqat(self, writer, start_date, end_date):
-        """تصدير بيانات الحلقات"""
-        import pandas as pd
-        
-        halaqat = Halaqa.objects.annotate(
-            sessions_count=Count('sessions', filter=Q(sessions__date__range=[start_date, end_date])),
-            students_count=Count('enrollments', filter=Q(enrollments__status='active'))
-        ).order_by('-sessions_count')
-        
-        data = []
-        for halaqa in halaqat:
-            data.append({
-                'اسم الحلقة': halaqa.name,
-                'الشيخ': halaqa.sheikh.get_full_name() if halaqa.sheikh else '-',
-                'عدد الطلاب': halaqa.students_count,
-                'الجلسات': halaqa.sessions_count,
-                'الحالة': halaqa.get_status_display()
-            })
-        
-        df = pd.DataFrame(data)
-        df.to_excel(writer, index=False, sheet_name='Halaqat')
+    def get(self, request, pk):
+        job = get_object_or_404(
+            ExportJob, pk=pk, created_by=request.user, status=ExportJob.Status.COMPLETED
+        )
+        if not job.file:
+            raise Http404
+        return FileResponse(
+            job.file.open('rb'),
+            as_attachment=True,
+            filename=job.filename,
+            content_type=CONTENT_TYPES[job.export_format]
+        )
+
+
+class ExportJobStatusAPIView(LoginRequiredMixin, AdminRequiredMixin, View):
+    """حالة عملية تصدير (للمتابعة من الصفحة)"""
     
-    def _export_recitations(self, writer, start_date, end_date):
-        """تصدير بيانات التسميعات"""
-        import pandas as pd
-        
-        recitations = RecitationRecord.objects.filter(
-            created_at__date__range=[start_date, end_date]
-        ).select_related('student', 'surah_start')
-        
-        data = []
-        for rec in recitations:
-            data.append({
-                'الطالب': rec.student.get_full_name() if rec.student else '-',
-                'السورة': rec.surah_start.name_arabic if rec.surah_start else '-',
-                'النوع': rec.get_recitation_type_display(),
-                'الدرجة': rec.grade,
-                'التاريخ': rec.created_at.strftime('%Y-%m-%d')
-            })
-        
-        df = pd.DataFrame(data)
-        df.to_excel(writer, index=False, sheet_name='Recitations')
+    def get(self, request, pk):
+        job = get_object_or_404(ExportJob, pk=pk, created_by=request.user)
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'row_count': job.row_count,
+            'error': job.error_message,
+            'download_url': reverse('dashboard:export_download', args=[job.pk])
+            if job.status == ExportJob.Status.COMPLETED else None,
+        })
+
@@ -6,8 +6,10 @@ bind = "127.0.0.1:8005"
 backlog = 2048
 
 # Worker processes
+# ASGI workers (tartil.asgi:application): the notification stream (SSE) is an
+# async view and answers 204 under sync WSGI workers
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -9,6 +9,8 @@ from .models import (
     NotificationDispatchLog,
     NotificationAuditLog,
     WebhookEndpoint,
+    DeliverySummary,
+    DeliveryReceipt,
 )
 
 
@@ -23,9 +25,9 @@ class NotificationTemplateAdmin(admin.ModelAdmin):
 class ScheduledNotificationAdmin(admin.ModelAdmin):
     list_display = [
         'title', 'content_type', 'target_type', 'scheduled_datetime',
-        'status', 'is_enabled', 'total_recipients', 'created_by'
+        'status', 'priority', 'is_enabled', 'total_recipients', 'created_by'
     ]
-    list_filter = ['status', 'content_type', 'target_type', 'is_enabled']
+    list_filter = ['status', 'priority', 'content_type', 'target_type', 'is_enabled']
     search_fields = ['title', 'message']
     date_hierarchy = 'scheduled_datetime'
     readonly_fields = [
@@ -50,5 +52,21 @@ class NotificationAuditLogAdmin(admin.ModelAdmin):
 
 @admin.register(WebhookEndpoint)
 class WebhookEndpointAdmin(admin.ModelAdmin):
-    list_display = ['name', 'url', 'endpoint_type', 'is_active', 'success_count', 'failure_count']
+    list_display = [
+        'name', 'url', 'endpoint_type', 'is_active', 'weight', 'rate_limit_per_second',
+        'success_count', 'failure_count', 'avg_latency_ms', 'circuit_open_until'
+    ]
     list_filter = ['endpoint_type', 'is_active']
+
+
+@admin.register(DeliverySummary)
+class DeliverySummaryAdmin(admin.ModelAdmin):
+    list_display = ['month', 'notification', 'webhook_url', 'status', 'count', 'total_attempts']
+    list_filter = ['status', 'month']
+    search_fields = ['notification__title']
+
+
+@admin.register(DeliveryReceipt)
+class DeliveryReceiptAdmin(admin.ModelAdmin):
+    list_display = ['key', 'delivered_at']
+    date_hierarchy = 'delivered_at'
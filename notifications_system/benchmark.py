@@ -0,0 +1,305 @@
+"""
+قياس أداء موزع الإشعارات مقابل خادم Webhook محلي
+Dispatcher load benchmark against a local stand-in webhook server
+
+يشغّل خادم HTTP محلياً بزمن استجابة ونسبة أخطاء ومهلات قابلة للضبط، وينشئ
+مستلمين تجريبيين، ثم يشغّل NotificationDispatchService من البداية للنهاية
+ويقيس الإنتاجية وزمن الاستجابة وعدد عمليات الكتابة وسلوك إعادة المحاولة.
+
+القياس يجري افتراضياً على قاعدة بيانات مؤقتة (throwaway_database) تُنشأ بالترحيلات
+وتُحذف بعده؛ وعند تشغيله على القاعدة الفعلية يُحذف فقط ما أنشأه هو.
+"""
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from django.db import connection, connections
+from django.utils import timezone
+
+from .models import DeliveryReceipt, ScheduledNotification, NotificationDispatchLog, WebhookEndpoint
+from .services import NotificationDispatchService
+
+
+@contextmanager
+def throwaway_database():
+    """
+    قاعدة بيانات مؤقتة للقياس بدلاً من القاعدة الفعلية (django.test.utils)
+    
+    في SQLite تكون ملفاً مؤقتاً لا ذاكرة، فخيوط الشرائح تفتح اتصالاتها بها كما في الإنتاج.
+    """
+    from django.test.utils import setup_databases, teardown_databases
+
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    original_name = test_settings.get('NAME')
+    path = None
+    if connection.vendor == 'sqlite':
+        handle, path = tempfile.mkstemp(prefix='tartil-benchmark-', suffix='.sqlite3')
+        os.close(handle)
+        test_settings['NAME'] = path
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={connection.alias})
+    try:
+        yield
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        test_settings['NAME'] = original_name
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+class StandInWebhookServer:
+    """خادم Webhook محلي يحاكي مزود الإرسال الحقيقي"""
+
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 10,
+                 error_rate: float = 0.0, timeout_rate: float = 0.0, hang_seconds: float = 2.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/webhook"
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.requests[outcome] += 1
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                roll = random.random()
+                if roll < stand_in.timeout_rate:
+                    stand_in._count('timeout')
+                    time.sleep(stand_in.hang_seconds)
+                    status, body = 504, b'{"error": "timeout"}'
+                elif roll < stand_in.timeout_rate + stand_in.error_rate:
+                    stand_in._count('error')
+                    status, body = 500, b'{"error": "stand-in failure"}'
+                else:
+                    stand_in._count('ok')
+                    delay = max(stand_in.latency_ms + random.uniform(-1, 1) * stand_in.jitter_ms, 0)
+                    time.sleep(delay / 1000)
+                    status, body = 200, b'{"ok": true}'
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class InstrumentedDispatchService(NotificationDispatchService):
+    """خدمة الإرسال مع تسجيل زمن كل طلب HTTP وعبارات قاعدة البيانات في خيوط الشرائح"""
+
+    def __init__(self, *args, recipient_ids: List[int] = None, retry_delay_scale: float = 1.0,
+                 write_counter: 'WriteCounter' = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recipient_ids = recipient_ids
+        self.write_counter = write_counter
+        self.RETRY_DELAYS = [delay * retry_delay_scale for delay in self.RETRY_DELAYS]
+        self.request_latencies_ms: List[float] = []
+        self.request_outcomes = Counter()
+
+    def _get_recipients(self, notification):
+        # المستلمون التجريبيون غير نشطين حتى لا تصلهم إشعارات حقيقية
+        from accounts.models import CustomUser
+        if self.recipient_ids is None:
+            return super()._get_recipients(notification)
+        return self._stream_recipients(CustomUser.objects.filter(pk__in=self.recipient_ids))
+
+    def _dispatch_shard(self, *args, **kwargs):
+        # كل خيط شريحة يفتح اتصاله الخاص؛ يُركّب العدّاد عليه داخل الخيط نفسه
+        if self.write_counter is None:
+            return super()._dispatch_shard(*args, **kwargs)
+        with connection.execute_wrapper(self.write_counter):
+            return super()._dispatch_shard(*args, **kwargs)
+
+    def _make_http_request(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = super()._make_http_request(*args, **kwargs)
+            self.request_outcomes[response.status_code] += 1
+            return response
+        except Exception as e:
+            self.request_outcomes[type(e).__name__] += 1
+            raise
+        finally:
+            self.request_latencies_ms.append((time.perf_counter() - started) * 1000)
+
+
+class WriteCounter:
+    """عدّاد عبارات الكتابة في قاعدة البيانات (execute_wrapper) - مشترك بين خيوط الشرائح"""
+
+    WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        verb = sql.lstrip().split(' ', 1)[0].upper()
+        with self._lock:
+            self.counts[verb if verb in self.WRITE_PREFIXES else 'SELECT'] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def writes(self) -> int:
+        return sum(self.counts[verb] for verb in self.WRITE_PREFIXES)
+
+
+class DispatchBenchmark:
+    """تجهيز البيانات، تشغيل الإرسال، وحساب المقاييس"""
+
+    USERNAME_PREFIX = 'bench_recipient_'
+
+    def __init__(self, recipients: int = 500, timeout_seconds: int = 1,
+                 retry_delay_scale: float = 0.01, server: StandInWebhookServer = None):
+        self.recipients = recipients
+        self.timeout_seconds = timeout_seconds
+        self.retry_delay_scale = retry_delay_scale
+        self.server = server or StandInWebhookServer()
+        self.recipient_ids: List[int] = []
+
+    def run(self, keep_data: bool = False) -> Dict[str, Any]:
+        self.server.start()
+        try:
+            endpoint, notification = self._seed()
+            try:
+                return self._measure(endpoint, notification)
+            finally:
+                if not keep_data:
+                    self._cleanup(endpoint, notification)
+        finally:
+            self.server.stop()
+
+    def _seed(self):
+        from accounts.models import CustomUser
+
+        # بادئة خاصة بهذا التشغيل: المستلمون هم ما أنشأه فقط، ولا تُمس حسابات أخرى
+        prefix = f"{self.USERNAME_PREFIX}{uuid.uuid4().hex[:8]}_"
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f"{prefix}{i}",
+                first_name='Bench',
+                last_name=str(i),
+                email=f"{prefix}{i}@example.com",
+                user_type=CustomUser.UserType.STUDENT,
+                is_active=False,  # غير نشطين حتى لا يظهروا في الإرسال الحقيقي
+            )
+            for i in range(self.recipients)
+        ], batch_size=500)
+        self.recipient_ids = list(CustomUser.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+
+        endpoint = WebhookEndpoint.objects.create(
+            name='Benchmark stand-in',
+            url=self.server.url,
+            endpoint_type=WebhookEndpoint.EndpointType.TEST,
+            is_active=False,
+            timeout_seconds=self.timeout_seconds,
+        )
+        notification = ScheduledNotification.objects.create(
+            title='Benchmark',
+            content_type=ScheduledNotification._meta.get_field('content_type').choices[0][0],
+            message='مرحباً {student_name}، هذا اختبار أداء ({username})',
+            scheduled_datetime=timezone.now(),
+            target_type=ScheduledNotification.TargetType.SPECIFIC_USERS,
+            status=ScheduledNotification.Status.DRAFT,
+            is_enabled=True,
+        )
+        return endpoint, notification
+
+    def _measure(self, endpoint, notification) -> Dict[str, Any]:
+        counter = WriteCounter()
+        service = InstrumentedDispatchService(
+            endpoints=[endpoint],
+            recipient_ids=self.recipient_ids,
+            retry_delay_scale=self.retry_delay_scale,
+            write_counter=counter,
+        )
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            results = service.dispatch_notification(notification, immediate=True)
+        elapsed = time.perf_counter() - started
+
+        attempts = Counter(
+            NotificationDispatchLog.objects.filter(notification=notification)
+            .values_list('attempt_count', flat=True)
+        )
+        latencies = sorted(service.request_latencies_ms)
+        total_requests = len(latencies)
+        return {
+            'recipients': results['total'],
+            'success': results['success'],
+            'failed': results['failed'],
+            'elapsed_seconds': round(elapsed, 3),
+            'deliveries_per_second': round(results['total'] / elapsed, 2) if elapsed else 0,
+            'http_requests': total_requests,
+            'retries': sum((count - 1) * logs for count, logs in attempts.items() if count > 1),
+            'failed_fast': attempts.get(0, 0),
+            'attempts_histogram': dict(sorted(attempts.items())),
+            'request_outcomes': {str(k): v for k, v in service.request_outcomes.items()},
+            'server_outcomes': dict(self.server.requests),
+            'latency_ms': {
+                'p50': self._percentile(latencies, 50),
+                'p95': self._percentile(latencies, 95),
+                'p99': self._percentile(latencies, 99),
+                'mean': round(statistics.fmean(latencies), 2) if latencies else 0,
+            },
+            'db_writes': counter.writes,
+            'db_statements': dict(counter.counts),
+        }
+
+    @staticmethod
+    def _percentile(values: List[float], percent: float) -> float:
+        if not values:
+            return 0
+        index = min(int(round(percent / 100 * (len(values) - 1))), len(values) - 1)
+        return round(values[index], 2)
+
+    def _cleanup(self, endpoint, notification):
+        """حذف ما أنشأه القياس فقط: الإشعار وسجلاته، نقطة النهاية، المستلمون وإيصالاتهم"""
+        from accounts.models import CustomUser
+
+        DeliveryReceipt.objects.filter(key__in=[
+            DeliveryReceipt.key_for(notification.pk, recipient_id) for recipient_id in self.recipient_ids
+        ]).delete()
+        notification.delete()
+        endpoint.delete()
+        CustomUser.objects.filter(pk__in=self.recipient_ids).delete()
@@ -52,6 +52,7 @@ class ScheduledNotificationForm(forms.ModelForm):
             'target_course',
             'target_users',
             'is_enabled',
+            'priority',
         ]
         widgets = {
             'title': forms.TextInput(attrs={
@@ -100,6 +101,9 @@ class ScheduledNotificationForm(forms.ModelForm):
             'is_enabled': forms.CheckboxInput(attrs={
                 'class': 'form-check-input',
             }),
+            'priority': forms.Select(attrs={
+                'class': 'form-select form-control-dashboard',
+            }),
         }
     
     def __init__(self, *args, **kwargs):
@@ -0,0 +1,83 @@
+"""
+أمر إدارة: قياس أداء موزع الإشعارات مقابل خادم Webhook محلي
+Management Command: Benchmark the notification dispatcher
+
+Usage:
+    python manage.py benchmark_dispatcher --recipients 1000
+    python manage.py benchmark_dispatcher --latency-ms 120 --error-rate 0.05 --timeout-rate 0.01
+    python manage.py benchmark_dispatcher --json > bench.json
+    python manage.py benchmark_dispatcher --in-place --keep-data
+
+القياس يجري على قاعدة بيانات مؤقتة تُحذف بعده، إلا مع --in-place.
+"""
+import json
+from django.core.management.base import BaseCommand
+from notifications_system.benchmark import DispatchBenchmark, StandInWebhookServer, throwaway_database
+
+
+class Command(BaseCommand):
+    help = 'قياس أداء إرسال الإشعارات من البداية للنهاية مقابل خادم Webhook محلي'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=500, help='عدد المستلمين التجريبيين (افتراضي: 500)')
+        parser.add_argument('--latency-ms', type=float, default=50, help='زمن استجابة الخادم بالميلي ثانية (افتراضي: 50)')
+        parser.add_argument('--jitter-ms', type=float, default=10, help='التذبذب في زمن الاستجابة (افتراضي: 10)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='نسبة استجابات 500 بين 0 و 1 (افتراضي: 0)')
+        parser.add_argument('--timeout-rate', type=float, default=0.0, help='نسبة الطلبات التي تتجاوز المهلة (افتراضي: 0)')
+        parser.add_argument('--timeout-seconds', type=int, default=1, help='مهلة نقطة النهاية بالثواني (افتراضي: 1)')
+        parser.add_argument(
+            '--retry-delay-scale',
+            type=float,
+            default=0.01,
+            help='معامل تصغير تأخير إعادة المحاولة (1 = التأخير الحقيقي، افتراضي: 0.01)'
+        )
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='القياس على قاعدة البيانات الفعلية بدلاً من قاعدة مؤقتة (يُحذف ما أنشأه فقط)'
+        )
+        parser.add_argument('--keep-data', action='store_true', help='عدم حذف البيانات التجريبية بعد القياس (مع --in-place)')
+        parser.add_argument('--json', action='store_true', help='طباعة النتائج بصيغة JSON للمقارنة بين التشغيلات')
+    
+    def handle(self, *args, **options):
+        server = StandInWebhookServer(
+            latency_ms=options['latency_ms'],
+            jitter_ms=options['jitter_ms'],
+            error_rate=options['error_rate'],
+            timeout_rate=options['timeout_rate'],
+            hang_seconds=options['timeout_seconds'] + 0.5,
+        )
+        benchmark = DispatchBenchmark(
+            recipients=options['recipients'],
+            timeout_seconds=options['timeout_seconds'],
+            retry_delay_scale=options['retry_delay_scale'],
+            server=server,
+        )
+        
+        if not options['json']:
+            self.stdout.write(self.style.NOTICE(f'جاري القياس على {options["recipients"]} مستلم...'))
+        
+        if options['in_place']:
+            report = benchmark.run(keep_data=options['keep_data'])
+        else:
+            with throwaway_database():
+                report = benchmark.run()
+        
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        
+        latency = report['latency_ms']
+        self.stdout.write(self.style.SUCCESS(
+            f'المستلمون: {report["recipients"]} | نجح: {report["success"]} | فشل: {report["failed"]}'
+        ))
+        self.stdout.write(f'المدة: {report["elapsed_seconds"]}s | الإنتاجية: {report["deliveries_per_second"]} إرسال/ثانية')
+        self.stdout.write(
+            f'زمن الطلب (ms): p50={latency["p50"]} p95={latency["p95"]} p99={latency["p99"]} mean={latency["mean"]}'
+        )
+        self.stdout.write(
+            f'طلبات HTTP: {report["http_requests"]} | إعادات المحاولة: {report["retries"]} | '
+            f'فشل سريع (دائرة مفتوحة): {report["failed_fast"]} | '
+            f'توزيع المحاولات: {report["attempts_histogram"]}'
+        )
+        self.stdout.write(f'عمليات الكتابة في قاعدة البيانات: {report["db_writes"]} | {report["db_statements"]}')
@@ -0,0 +1,80 @@
+"""
+أمر إدارة: حذف سجلات الإرسال القديمة على دفعات مع الأرشفة
+Management Command: Purge old dispatch logs in bounded chunks
+
+Usage:
+    python manage.py purge_dispatch_logs --days 90
+    python manage.py purge_dispatch_logs --days 30 --include-failed --no-archive
+"""
+from django.core.management.base import BaseCommand
+from notifications_system.models import NotificationDispatchLog
+from notifications_system.retention import DispatchLogRetention
+
+
+class Command(BaseCommand):
+    help = 'حذف سجلات الإرسال القديمة على دفعات محدودة مع أرشفتها وتجميع إحصائياتها'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help='حذف السجلات الأقدم من هذا العدد من الأيام (افتراضي: 90)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='عدد السجلات في كل دفعة حذف (افتراضي: 1000)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.2,
+            help='مدة التوقف بالثواني بين الدفعات (افتراضي: 0.2)'
+        )
+        parser.add_argument(
+            '--include-failed',
+            action='store_true',
+            help='حذف السجلات الفاشلة أيضاً (افتراضياً: الناجحة فقط)'
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='الحذف دون أرشفة السجلات'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='عرض عدد السجلات المستهدفة دون حذف'
+        )
+    
+    def handle(self, *args, **options):
+        statuses = [NotificationDispatchLog.Status.SUCCESS]
+        if options['include_failed']:
+            statuses.append(NotificationDispatchLog.Status.FAILED)
+        
+        retention = DispatchLogRetention(
+            older_than_days=options['days'],
+            statuses=statuses,
+            chunk_size=options['chunk_size'],
+            pause_seconds=options['pause'],
+            archive=not options['no_archive'],
+        )
+        
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.NOTICE(f'سيتم حذف {retention.get_queryset().count()} سجل')
+            )
+            return
+        
+        results = retention.run()
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'تم حذف {results["deleted"]} سجل في {results["chunks"]} دفعة | '
+                f'مؤرشف: {results["archived"]}'
+            )
+        )
+        if retention.archive:
+            self.stdout.write(f'مجلد الأرشيف: {retention.archive_dir}')
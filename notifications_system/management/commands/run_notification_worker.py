@@ -0,0 +1,67 @@
+"""
+أمر إدارة: تشغيل عامل الإشعارات المستقل
+Management Command: Run the lease-based notification worker
+
+Usage:
+    python manage.py run_notification_worker
+    python manage.py run_notification_worker --batch-size 20 --poll-interval 2
+    python manage.py run_notification_worker --once
+"""
+import signal
+from django.core.management.base import BaseCommand
+from notifications_system.worker import NotificationWorker
+
+
+class Command(BaseCommand):
+    help = 'تشغيل عامل مستقل لإرسال الإشعارات المجدولة (يمكن تشغيل أكثر من عامل بأمان)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-id',
+            type=str,
+            help='معرف العامل (افتراضي: worker:المضيف:رقم العملية)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='عدد الإشعارات التي يحجزها العامل في كل دورة (افتراضي: 10)'
+        )
+        parser.add_argument(
+            '--lease-seconds',
+            type=int,
+            default=300,
+            help='مدة حجز الإشعار بالثواني، تُمدد تلقائياً أثناء الإرسال (افتراضي: 300)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='مدة الانتظار بالثواني عند عدم وجود إشعارات مستحقة (افتراضي: 5)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='تنفيذ دورة واحدة ثم الخروج (مناسب لـ cron)'
+        )
+    
+    def handle(self, *args, **options):
+        worker = NotificationWorker(
+            worker_id=options.get('worker_id'),
+            batch_size=options['batch_size'],
+            lease_seconds=options['lease_seconds'],
+            poll_interval=options['poll_interval'],
+        )
+        
+        signal.signal(signal.SIGTERM, worker.request_stop)
+        signal.signal(signal.SIGINT, worker.request_stop)
+        
+        self.stdout.write(
+            self.style.NOTICE(f'بدء عامل الإشعارات: {worker.worker_id}')
+        )
+        
+        worker.run(max_iterations=1 if options['once'] else None)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'تم إيقاف العامل | {worker.format_stats()}')
+        )
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='avg_latency_ms',
+            field=models.FloatField(default=0, verbose_name='متوسط زمن الاستجابة (ms)'),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='circuit_open_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='الدائرة مفتوحة حتى'),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='weight',
+            field=models.PositiveIntegerField(default=1, help_text='وزن توزيع الحمل بين نقاط النهاية من نفس النوع', verbose_name='الوزن'),
+        ),
+    ]
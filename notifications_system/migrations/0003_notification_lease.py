@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0002_webhook_endpoint_health'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulednotification',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=100, verbose_name='محجوز بواسطة'),
+        ),
+        migrations.AddField(
+            model_name='schedulednotification',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='الحجز حتى'),
+        ),
+        migrations.AddIndex(
+            model_name='schedulednotification',
+            index=models.Index(fields=['status', 'lease_until'], name='notificatio_status_0c29d8_idx'),
+        ),
+    ]
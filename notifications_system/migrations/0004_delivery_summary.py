@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0003_notification_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliverySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='الشهر')),
+                ('webhook_url', models.URLField(verbose_name='رابط Webhook')),
+                ('status', models.CharField(choices=[('pending', 'معلق'), ('success', 'نجاح'), ('failed', 'فشل'), ('retrying', 'إعادة محاولة')], max_length=20, verbose_name='الحالة')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='العدد')),
+                ('total_attempts', models.PositiveIntegerField(default=0, verbose_name='إجمالي المحاولات')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+                ('notification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='delivery_summaries', to='notifications_system.schedulednotification', verbose_name='الإشعار')),
+            ],
+            options={
+                'verbose_name': 'ملخص إرسال',
+                'verbose_name_plural': 'ملخصات الإرسال',
+                'ordering': ['-month'],
+                'unique_together': {('month', 'notification', 'webhook_url', 'status')},
+            },
+        ),
+    ]
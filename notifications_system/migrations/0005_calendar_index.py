@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0004_delivery_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='schedulednotification',
+            index=models.Index(fields=['scheduled_datetime', 'status'], name='notificatio_schedul_4e8de4_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0005_calendar_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='rate_limit_burst',
+            field=models.PositiveIntegerField(default=10, help_text='عدد الطلبات المسموح بإرسالها دفعة واحدة قبل تطبيق المعدل', verbose_name='حجم الدفعة المسموح بها'),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='rate_limit_per_second',
+            field=models.FloatField(default=0, help_text='0 = بدون حد', verbose_name='الحد الأقصى للطلبات في الثانية'),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='rate_limit_tat',
+            field=models.FloatField(default=0, editable=False, verbose_name='وقت الوصول النظري (داخلي)'),
+        ),
+    ]
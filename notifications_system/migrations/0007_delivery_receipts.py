@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:54
+
+import hashlib
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def backfill_receipts(apps, schema_editor):
+    """إنشاء إيصالات للتسليمات الناجحة السابقة (نفس بصمة DeliveryReceipt.key_for)"""
+    NotificationDispatchLog = apps.get_model('notifications_system', 'NotificationDispatchLog')
+    DeliveryReceipt = apps.get_model('notifications_system', 'DeliveryReceipt')
+
+    rows = NotificationDispatchLog.objects.filter(status='success').values_list(
+        'notification_id', 'recipient_id', 'completed_at', 'created_at'
+    ).iterator(chunk_size=2000)
+    batch = []
+    for notification_id, recipient_id, completed_at, created_at in rows:
+        digest = hashlib.blake2b(f"{notification_id}:{recipient_id}".encode(), digest_size=8).digest()
+        batch.append(DeliveryReceipt(
+            key=int.from_bytes(digest, 'big', signed=True),
+            delivered_at=completed_at or created_at,
+        ))
+        if len(batch) >= 2000:
+            DeliveryReceipt.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    DeliveryReceipt.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0006_endpoint_rate_limit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryReceipt',
+            fields=[
+                ('key', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='البصمة')),
+                ('delivered_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='تاريخ التسليم')),
+            ],
+            options={
+                'verbose_name': 'إيصال تسليم',
+                'verbose_name_plural': 'إيصالات التسليم',
+            },
+        ),
+        migrations.RunPython(backfill_receipts, migrations.RunPython.noop),
+    ]
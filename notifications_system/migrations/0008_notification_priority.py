@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0007_delivery_receipts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulednotification',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'عاجل'), (1, 'عادي'), (2, 'جماعي')], default=1, help_text='العاجل يُرسل أولاً ولا ينتظر خلف الإشعارات الجماعية الكبيرة', verbose_name='الأولوية'),
+        ),
+        migrations.AddIndex(
+            model_name='schedulednotification',
+            index=models.Index(fields=['status', 'priority', 'scheduled_datetime'], name='notificatio_status_c06fdf_idx'),
+        ),
+    ]
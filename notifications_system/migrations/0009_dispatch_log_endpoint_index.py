@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0008_notification_priority'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificationdispatchlog',
+            index=models.Index(fields=['webhook_url', 'created_at'], name='notificatio_webhook_348006_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0009_dispatch_log_endpoint_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificationdispatchlog',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='notificatio_status_231497_idx'),
+        ),
+    ]
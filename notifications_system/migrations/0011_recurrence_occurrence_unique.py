@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:17
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_occurrences(apps, schema_editor):
+    """حذف النسخ المكررة لنفس موعد التكرار قبل إضافة القيد (يُبقى ما بدأ إرساله، ثم الأقدم)"""
+    ScheduledNotification = apps.get_model('notifications_system', 'ScheduledNotification')
+
+    duplicates = (
+        ScheduledNotification.objects.filter(parent_notification__isnull=False)
+        .values('parent_notification_id', 'scheduled_datetime')
+        .annotate(copies=Count('id'))
+        .filter(copies__gt=1)
+    )
+    for group in duplicates.iterator():
+        copies = sorted(
+            ScheduledNotification.objects.filter(
+                parent_notification_id=group['parent_notification_id'],
+                scheduled_datetime=group['scheduled_datetime'],
+            ).values_list('id', 'status', 'created_at'),
+            key=lambda row: (row[1] in ('draft', 'scheduled'), row[2]),
+        )
+        ScheduledNotification.objects.filter(id__in=[row[0] for row in copies[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications_system', '0010_dispatch_log_retention_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_occurrences, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='schedulednotification',
+            constraint=models.UniqueConstraint(fields=('parent_notification', 'scheduled_datetime'), name='unique_recurrence_occurrence'),
+        ),
+    ]
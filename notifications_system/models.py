@@ -2,6 +2,7 @@
 نماذج نظام النشر والتنبيهات المجدول
 Models for Smart Notification & Publishing System
 """
+import hashlib
 import uuid
 from django.db import models
 from django.conf import settings
@@ -80,6 +81,11 @@ class ScheduledNotification(models.Model):
         COURSE = 'course', _('مقرر محدد')
         SPECIFIC_USERS = 'specific_users', _('مستخدمين محددين')
     
+    class Priority(models.IntegerChoices):
+        URGENT = 0, _('عاجل')
+        NORMAL = 1, _('عادي')
+        BULK = 2, _('جماعي')
+    
     # المعلومات الأساسية
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(_('العنوان'), max_length=200)
@@ -176,6 +182,16 @@ class ScheduledNotification(models.Model):
         default=Status.DRAFT
     )
     is_enabled = models.BooleanField(_('مفعّل'), default=True)
+    priority = models.PositiveSmallIntegerField(
+        _('الأولوية'),
+        choices=Priority.choices,
+        default=Priority.NORMAL,
+        help_text=_('العاجل يُرسل أولاً ولا ينتظر خلف الإشعارات الجماعية الكبيرة')
+    )
+    
+    # حجز العامل (Lease) - يمنع إرسال نفس الإشعار من أكثر من عامل
+    claimed_by = models.CharField(_('محجوز بواسطة'), max_length=100, blank=True)
+    lease_until = models.DateTimeField(_('الحجز حتى'), null=True, blank=True)
     
     # معلومات الأب
     parent_notification = models.ForeignKey(
@@ -220,6 +236,16 @@ class ScheduledNotification(models.Model):
             models.Index(fields=['status', 'scheduled_datetime']),
             models.Index(fields=['content_type', 'status']),
             models.Index(fields=['is_enabled', 'status']),
+            models.Index(fields=['status', 'lease_until']),
+            models.Index(fields=['scheduled_datetime', 'status']),
+            models.Index(fields=['status', 'priority', 'scheduled_datetime']),
+        ]
+        constraints = [
+            # نسخة واحدة لكل موعد تكرار، مهما تزامن إكمال الأفق
+            models.UniqueConstraint(
+                fields=['parent_notification', 'scheduled_datetime'],
+                name='unique_recurrence_occurrence',
+            ),
         ]
     
     def __str__(self):
@@ -301,6 +327,8 @@ class NotificationDispatchLog(models.Model):
         indexes = [
             models.Index(fields=['status', 'attempt_count']),
             models.Index(fields=['notification', 'status']),
+            models.Index(fields=['webhook_url', 'created_at']),
+            models.Index(fields=['status', 'created_at', 'id']),
         ]
     
     def __str__(self):
@@ -317,6 +345,62 @@ class NotificationDispatchLog(models.Model):
         return self.status == self.Status.SUCCESS
 
 
+class DeliverySummary(models.Model):
+    """ملخص شهري لسجلات الإرسال - يحفظ الإحصائيات بعد حذف السجلات القديمة"""
+    
+    month = models.DateField(_('الشهر'))
+    notification = models.ForeignKey(
+        ScheduledNotification,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='delivery_summaries',
+        verbose_name=_('الإشعار')
+    )
+    webhook_url = models.URLField(_('رابط Webhook'))
+    status = models.CharField(
+        _('الحالة'),
+        max_length=20,
+        choices=NotificationDispatchLog.Status.choices
+    )
+    count = models.PositiveIntegerField(_('العدد'), default=0)
+    total_attempts = models.PositiveIntegerField(_('إجمالي المحاولات'), default=0)
+    updated_at = models.DateTimeField(_('تاريخ التحديث'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('ملخص إرسال')
+        verbose_name_plural = _('ملخصات الإرسال')
+        ordering = ['-month']
+        unique_together = ['month', 'notification', 'webhook_url', 'status']
+    
+    def __str__(self):
+        return f"{self.month:%Y-%m} - {self.get_status_display()}: {self.count}"
+
+
+class DeliveryReceipt(models.Model):
+    """
+    فهرس مضغوط للتسليمات الناجحة - يمنع إعادة إرسال نفس الإشعار لنفس المستلم
+    
+    المفتاح بصمة 64 بت لـ (الإشعار، المستلم) كمفتاح أساسي، فالتحقق بحث في الفهرس
+    دون تحميل سجلات الإرسال، ويبقى صالحاً بعد حذف السجلات القديمة.
+    """
+    
+    key = models.BigIntegerField(_('البصمة'), primary_key=True)
+    delivered_at = models.DateTimeField(_('تاريخ التسليم'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('إيصال تسليم')
+        verbose_name_plural = _('إيصالات التسليم')
+    
+    def __str__(self):
+        return f"{self.key:x}"
+    
+    @staticmethod
+    def key_for(notification_id, recipient_id) -> int:
+        digest = hashlib.blake2b(f"{notification_id}:{recipient_id}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big', signed=True)
+
+
 class WebhookEndpoint(models.Model):
     """نقاط النهاية للWebhook"""
     
@@ -336,12 +420,34 @@ class WebhookEndpoint(models.Model):
     is_active = models.BooleanField(_('نشط'), default=True)
     timeout_seconds = models.PositiveIntegerField(_('مهلة الانتظار (ثانية)'), default=30)
     headers = models.JSONField(_('الهيدرز المخصصة'), default=dict, blank=True)
+    weight = models.PositiveIntegerField(
+        _('الوزن'),
+        default=1,
+        help_text=_('وزن توزيع الحمل بين نقاط النهاية من نفس النوع')
+    )
     
     # التتبع
     last_used_at = models.DateTimeField(_('آخر استخدام'), null=True, blank=True)
     success_count = models.PositiveIntegerField(_('عدد النجاحات'), default=0)
     failure_count = models.PositiveIntegerField(_('عدد الفشل'), default=0)
     
+    # تحديد معدل الإرسال (مشترك بين كل العمليات)
+    rate_limit_per_second = models.FloatField(
+        _('الحد الأقصى للطلبات في الثانية'),
+        default=0,
+        help_text=_('0 = بدون حد')
+    )
+    rate_limit_burst = models.PositiveIntegerField(
+        _('حجم الدفعة المسموح بها'),
+        default=10,
+        help_text=_('عدد الطلبات المسموح بإرسالها دفعة واحدة قبل تطبيق المعدل')
+    )
+    rate_limit_tat = models.FloatField(_('وقت الوصول النظري (داخلي)'), default=0, editable=False)
+    
+    # صحة نقطة النهاية (قاطع الدائرة)
+    avg_latency_ms = models.FloatField(_('متوسط زمن الاستجابة (ms)'), default=0)
+    circuit_open_until = models.DateTimeField(_('الدائرة مفتوحة حتى'), null=True, blank=True)
+    
     created_at = models.DateTimeField(_('تاريخ الإنشاء'), auto_now_add=True)
     
     class Meta:
@@ -351,6 +457,11 @@ class WebhookEndpoint(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.get_endpoint_type_display()})"
+    
+    @property
+    def is_circuit_open(self):
+        """هل الدائرة مفتوحة (النقطة معزولة مؤقتاً)؟"""
+        return bool(self.circuit_open_until and self.circuit_open_until > timezone.now())
 
 
 class NotificationAuditLog(models.Model):
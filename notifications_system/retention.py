@@ -0,0 +1,161 @@
+"""
+الاحتفاظ بسجلات الإرسال وأرشفتها
+Chunked, archiving retention for NotificationDispatchLog
+
+الحذف يتم على دفعات محدودة مرتبة بـ (created_at, pk) مع توقف قصير بين الدفعات،
+حتى لا يُقفل SQLite لفترة طويلة ولا يتضخم ملف WAL. كل دفعة تبدأ بعد آخر صف في
+سابقتها على الفهرس نفسه فلا تعيد مسح ما سبقها. مع الأرشفة تُكتب كل دفعة أولاً إلى
+ملف NDJSON مضغوط خاص بها (مجلد لكل شهر، والاسم من أول وآخر (created_at, pk) فيها)،
+ولا تُحذف إلا بعد اكتمال الملف على القرص؛ إعادة الدفعة بعد فشل الحذف تستبدل الملف
+نفسه ولا تضيف نسخة ثانية. وتُجمع الإحصائيات في DeliverySummary.
+"""
+import gzip
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import NotificationDispatchLog, DeliverySummary
+from .services import get_notification_setting
+
+logger = logging.getLogger(__name__)
+
+
+class DispatchLogRetention:
+    """حذف سجلات الإرسال القديمة على دفعات مع أرشفة وتجميع اختياريين"""
+
+    ARCHIVE_FIELDS = [
+        'id', 'notification_id', 'recipient_id', 'webhook_url', 'payload', 'status',
+        'attempt_count', 'max_attempts', 'response_status_code', 'response_body',
+        'error_message', 'first_attempt_at', 'last_attempt_at', 'completed_at', 'created_at',
+    ]
+
+    def __init__(self, older_than_days: int = 90, statuses: Optional[List[str]] = None,
+                 chunk_size: int = 1000, pause_seconds: float = 0.2,
+                 archive: bool = True, archive_dir: Optional[Path] = None):
+        self.cutoff = timezone.now() - timedelta(days=older_than_days)
+        self.statuses = statuses or [NotificationDispatchLog.Status.SUCCESS]
+        self.chunk_size = chunk_size
+        self.pause_seconds = pause_seconds
+        self.archive = archive
+        self.archive_dir = Path(archive_dir or get_notification_setting(
+            'ARCHIVE_DIR', settings.BASE_DIR / 'archives' / 'dispatch_logs'
+        ))
+
+    def get_queryset(self):
+        return NotificationDispatchLog.objects.filter(
+            status__in=self.statuses,
+            created_at__lt=self.cutoff,
+        )
+
+    def run(self, max_chunks: Optional[int] = None) -> Dict[str, int]:
+        """تنفيذ الحذف. يعيد عدد السجلات المحذوفة والمؤرشفة والدفعات"""
+        results = {'deleted': 0, 'archived': 0, 'chunks': 0}
+        # حالة واحدة في كل مرور: الفهرس (status, created_at, id) يعطي الترتيب دون فرز
+        for status in self.statuses:
+            if not self._run_status(status, results, max_chunks):
+                break
+
+        logger.info(
+            f"Dispatch log retention: deleted {results['deleted']} rows "
+            f"in {results['chunks']} chunks (archived {results['archived']})"
+        )
+        return results
+
+    def _run_status(self, status: str, results: Dict[str, int], max_chunks: Optional[int]) -> bool:
+        """حذف سجلات حالة واحدة. يعيد False عند بلوغ حد الدفعات"""
+        last = None
+        while True:
+            if max_chunks is not None and results['chunks'] >= max_chunks:
+                return False
+            queryset = self.get_queryset().filter(status=status).order_by('created_at', 'pk')
+            if last is not None:
+                queryset = queryset.filter(
+                    Q(created_at__gt=last['created_at'])
+                    | Q(created_at=last['created_at'], pk__gt=last['id'])
+                )
+            rows = list(queryset.values(*self.ARCHIVE_FIELDS)[:self.chunk_size])
+            if not rows:
+                return True
+            last = rows[-1]
+
+            if self.archive:
+                # الأرشيف قبل الحذف: خطأ في الكتابة يوقف التشغيل والسجلات باقية
+                results['archived'] += self._archive(rows)
+
+            with transaction.atomic():
+                self._roll_up(rows)
+                deleted, _ = NotificationDispatchLog.objects.filter(
+                    pk__in=[row['id'] for row in rows]
+                ).delete()
+            results['deleted'] += deleted
+            results['chunks'] += 1
+
+            if len(rows) < self.chunk_size:
+                return True
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+
+    def archive_path(self, rows: List[dict]) -> Path:
+        """ملف الدفعة: نفس الصفوف تعطي نفس الاسم"""
+        first, last = rows[0], rows[-1]
+        month = timezone.localtime(first['created_at']).strftime('%Y-%m')
+        bounds = '-'.join(
+            f"{row['created_at']:%Y%m%dT%H%M%S%f}_{row['id'].hex[:12]}" for row in (first, last)
+        )
+        return self.archive_dir / month / f"dispatch_logs-{first['status']}-{bounds}.ndjson.gz"
+
+    def _archive(self, rows: List[dict]) -> int:
+        """كتابة الدفعة إلى ملفها كاملاً (ملف مؤقت ثم إعادة تسمية) قبل حذفها"""
+        path = self.archive_path(rows)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = path.with_name(f"{path.name}.partial")
+        with open(partial_path, 'wb') as raw_file:
+            with gzip.open(raw_file, 'wt', encoding='utf-8') as archive_file:
+                for row in rows:
+                    archive_file.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+                    archive_file.write('\n')
+            raw_file.flush()
+            os.fsync(raw_file.fileno())
+        os.replace(partial_path, path)
+        return len(rows)
+
+    def _roll_up(self, rows: List[dict]):
+        """تجميع الدفعة في DeliverySummary حسب (الشهر، الإشعار، الرابط، الحالة)"""
+        totals = defaultdict(lambda: [0, 0])
+        for row in rows:
+            key = (
+                timezone.localdate(row['created_at']).replace(day=1),
+                row['notification_id'],
+                row['webhook_url'],
+                row['status'],
+            )
+            totals[key][0] += 1
+            totals[key][1] += row['attempt_count']
+
+        for (month, notification_id, webhook_url, status), (count, attempts) in totals.items():
+            updated = DeliverySummary.objects.filter(
+                month=month,
+                notification_id=notification_id,
+                webhook_url=webhook_url,
+                status=status,
+            ).update(count=F('count') + count, total_attempts=F('total_attempts') + attempts)
+            if not updated:
+                DeliverySummary.objects.create(
+                    month=month,
+                    notification_id=notification_id,
+                    webhook_url=webhook_url,
+                    status=status,
+                    count=count,
+                    total_attempts=attempts,
+                )
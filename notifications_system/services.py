@@ -2,63 +2,174 @@
 طبقة الخدمات لنظام النشر والتنبيهات
 Service Layer for Notification System
 """
+import itertools
+import json
 import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
 import requests
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Callable, Iterator, NamedTuple, Optional
 from dateutil import rrule
+from django.conf import settings
+from django.core.cache import caches
+from django.urls import reverse
 from django.utils import timezone
-from django.db import transaction
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.db.models.functions import TruncMinute
 
 from .models import (
     ScheduledNotification,
     NotificationDispatchLog,
     WebhookEndpoint,
+    DeliveryReceipt,
 )
 
 logger = logging.getLogger(__name__)
 
 
-class PayloadBuilder:
-    """يبني حمولة JSON للإرسال إلى Webhook"""
+def get_notification_setting(key: str, default=None):
+    """قراءة إعداد من NOTIFICATIONS_SETTINGS"""
+    return getattr(settings, 'NOTIFICATIONS_SETTINGS', {}).get(key, default)
+
+
+def idempotency_key(notification_id, recipient_id, endpoint_id) -> str:
+    """مفتاح ثابت لكل (إشعار، مستلم، نقطة نهاية) يُرسل في ترويسة Idempotency-Key"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"notification:{notification_id}:{recipient_id}:{endpoint_id}"))
+
+
+class Recipient(NamedTuple):
+    """بيانات المستلم الخفيفة - بديل عن كائن المستخدم الكامل أثناء الإرسال"""
+    id: int
+    name: str
+    email: str
+    user_type: str
+    first_name: str = ''
+    username: str = ''
+    
+    def get_full_name(self) -> str:
+        return self.name
+
+
+class CompiledPayload:
+    """
+    حمولة مُجمّعة مسبقاً لإشعار واحد
+    
+    كل ما لا يعتمد على المستلم (الدرس، الوسائط، البيانات الوصفية، بيانات المستهدفين)
+    يُحسب مرة واحدة، ويُقسّم نص الرسالة إلى أجزاء ثابتة ومتغيرات. لكل مستلم يتم
+    فقط ملء المتغيرات، ويمكن الحصول على JSON جاهز بدمج أجزاء مُسلسلة مسبقاً.
+    """
+    
+    VARIABLES = {
+        'student_name': lambda recipient: recipient.get_full_name() or '',
+        'first_name': lambda recipient: recipient.first_name or '',
+        'username': lambda recipient: recipient.username or '',
+    }
+    VARIABLE_PATTERN = re.compile(r'\{(%s)\}' % '|'.join(VARIABLES))
+    
+    def __init__(self, notification, lesson=None, tafseer=None):
+        self.type = notification.content_type
+        self.title = notification.title
+        self.segments = self._parse_message(notification.message)
+        self.lesson = PayloadBuilder._build_lesson_data(lesson, tafseer)
+        self.target = PayloadBuilder._build_target_data(notification)
+        self.media = PayloadBuilder._build_media_data(notification)
+        self.metadata = {
+            "notification_id": str(notification.id),
+            "scheduled_at": notification.scheduled_datetime.isoformat() if notification.scheduled_datetime else None,
+            "sent_at": timezone.now().isoformat(),
+            "timezone": notification.timezone,
+        }
+        
+        # أجزاء JSON مُسلسلة مسبقاً بنفس ترتيب المفاتيح في render()
+        self._json_head = '{"type": %s, "title": %s, "message": ' % (self._dumps(self.type), self._dumps(self.title))
+        self._json_middle = ', "lesson": %s, "target": {"role": ' % self._dumps(self.lesson)
+        target_rest = self._dumps(self.target)[1:]
+        self._json_after_role = (', ' + target_rest) if target_rest != '}' else '}'
+        self._json_tail = ', "media": %s, "metadata": %s, "recipient": ' % (
+            self._dumps(self.media), self._dumps(self.metadata)
+        )
+    
+    @staticmethod
+    def _dumps(value) -> str:
+        return json.dumps(value, ensure_ascii=False)
     
     @classmethod
-    def build_payload(cls, notification, recipient, lesson=None, tafseer=None) -> Dict[str, Any]:
-        """بناء حمولة البيانات الكاملة"""
+    def _parse_message(cls, message: str) -> List[tuple]:
+        """تقسيم الرسالة إلى أجزاء: (False, نص ثابت) أو (True, اسم المتغير)"""
+        segments = []
+        position = 0
+        for match in cls.VARIABLE_PATTERN.finditer(message or ''):
+            if match.start() > position:
+                segments.append((False, message[position:match.start()]))
+            segments.append((True, match.group(1)))
+            position = match.end()
+        if message and position < len(message):
+            segments.append((False, message[position:]))
+        return segments
+    
+    def format_message(self, recipient) -> str:
+        """ملء متغيرات الرسالة للمستلم"""
+        return ''.join(
+            self.VARIABLES[value](recipient) if is_variable else value
+            for is_variable, value in self.segments
+        )
+    
+    def _recipient_data(self, recipient) -> Dict[str, Any]:
         return {
-            "type": notification.content_type,
-            "title": notification.title,
-            "message": cls._format_message(notification.message, recipient),
-            "lesson": cls._build_lesson_data(lesson, tafseer),
-            "target": cls._build_target_data(notification, recipient),
-            "media": cls._build_media_data(notification),
-            "metadata": {
-                "notification_id": str(notification.id),
-                "scheduled_at": notification.scheduled_datetime.isoformat() if notification.scheduled_datetime else None,
-                "sent_at": timezone.now().isoformat(),
-                "timezone": notification.timezone,
-            },
-            "recipient": {
-                "id": recipient.id,
-                "name": recipient.get_full_name(),
-                "email": recipient.email,
-                "role": recipient.user_type,
-            }
+            "id": recipient.id,
+            "name": recipient.get_full_name(),
+            "email": recipient.email,
+            "role": recipient.user_type,
         }
     
-    @classmethod
-    def _format_message(cls, message: str, recipient) -> str:
-        """تنسيق الرسالة باستبدال المتغيرات"""
-        if not message:
-            return ""
-        replacements = {
-            '{student_name}': recipient.get_full_name() or '',
-            '{first_name}': recipient.first_name or '',
-            '{username}': recipient.username or '',
+    def render(self, recipient) -> Dict[str, Any]:
+        """الحمولة الكاملة كقاموس (الأجزاء المشتركة غير منسوخة - لا تعدّلها)"""
+        return {
+            "type": self.type,
+            "title": self.title,
+            "message": self.format_message(recipient),
+            "lesson": self.lesson,
+            "target": {"role": recipient.user_type, **self.target},
+            "media": self.media,
+            "metadata": self.metadata,
+            "recipient": self._recipient_data(recipient),
         }
-        for key, value in replacements.items():
-            message = message.replace(key, value)
-        return message
+    
+    def render_json(self, recipient) -> str:
+        """الحمولة كنص JSON بدمج الأجزاء المُسلسلة مسبقاً دون إعادة تسلسل الجزء المشترك"""
+        return ''.join((
+            self._json_head,
+            self._dumps(self.format_message(recipient)),
+            self._json_middle,
+            self._dumps(recipient.user_type),
+            self._json_after_role,
+            self._json_tail,
+            self._dumps(self._recipient_data(recipient)),
+            '}',
+        ))
+
+
+class PayloadBuilder:
+    """يبني حمولة JSON للإرسال إلى Webhook"""
+    
+    @classmethod
+    def compile(cls, notification, lesson=None, tafseer=None) -> CompiledPayload:
+        """تجميع الحمولة مرة واحدة لكل إشعار لإعادة استخدامها مع كل المستلمين"""
+        return CompiledPayload(notification, lesson=lesson, tafseer=tafseer)
+    
+    @classmethod
+    def build_payload(cls, notification, recipient, lesson=None, tafseer=None) -> Dict[str, Any]:
+        """بناء حمولة البيانات الكاملة لمستلم واحد"""
+        return cls.compile(notification, lesson=lesson, tafseer=tafseer).render(recipient)
     
     @classmethod
     def _build_lesson_data(cls, lesson=None, tafseer=None) -> Optional[Dict[str, Any]]:
@@ -90,10 +201,9 @@ class PayloadBuilder:
         return None
     
     @classmethod
-    def _build_target_data(cls, notification, recipient) -> Dict[str, Any]:
-        """بناء بيانات المستهدفين"""
+    def _build_target_data(cls, notification) -> Dict[str, Any]:
+        """بناء بيانات المستهدفين (بدون دور المستلم)"""
         data = {
-            "role": recipient.user_type,
             "target_type": notification.target_type,
         }
         if notification.target_halaqa:
@@ -119,19 +229,278 @@ class PayloadBuilder:
         return data if data else None
 
 
+class EndpointHealth:
+    """حالة صحة نقطة نهاية واحدة: نسبة الخطأ المتدحرجة، زمن الاستجابة وقاطع الدائرة"""
+    
+    def __init__(self, endpoint: WebhookEndpoint, window_size: int):
+        self.endpoint = endpoint
+        self.outcomes = deque(maxlen=window_size)
+        self.consecutive_failures = 0
+        self.latency_ms = endpoint.avg_latency_ms or 0.0
+        self.open_until = endpoint.circuit_open_until
+        self.success = 0
+        self.failed = 0
+    
+    @property
+    def error_rate(self) -> float:
+        """نسبة الخطأ من النافذة الأخيرة، أو من العدادات الكلية إذا كانت النافذة فارغة"""
+        if self.outcomes:
+            return self.outcomes.count(False) / len(self.outcomes)
+        total = self.endpoint.success_count + self.endpoint.failure_count
+        return self.endpoint.failure_count / total if total else 0.0
+    
+    def is_available(self, now) -> bool:
+        return not self.open_until or self.open_until <= now
+
+
+class TokenBucketLimiter:
+    """
+    محدد معدل (Token bucket بخوارزمية GCRA) لكل نقطة نهاية، مشترك بين العمليات
+    
+    الحالة المشتركة قيمة واحدة (وقت الوصول النظري rate_limit_tat) في صف نقطة النهاية،
+    تُحدّث بعبارة UPDATE شرطية (compare-and-set). كل عملية تحجز كتلة من الفتحات
+    الزمنية دفعة واحدة ثم تنتظر موعد كل فتحة محلياً، فتكون الكتابة مرة لكل كتلة لا لكل طلب.
+    """
+    
+    MAX_CAS_RETRIES = 10
+    MAX_RETRY_AFTER_SECONDS = 300
+    
+    def __init__(self):
+        self._slots: Dict[int, deque] = {}
+        self._blocked_until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+    
+    def acquire(self, endpoint: WebhookEndpoint) -> float:
+        """الانتظار حتى تتوفر فتحة إرسال. يعيد مدة الانتظار بالثواني"""
+        with self._lock:
+            if endpoint.rate_limit_per_second:
+                slots = self._slots.get(endpoint.pk)
+                if not slots:
+                    slots = self._slots[endpoint.pk] = self._reserve(endpoint)
+                wake_at = slots.popleft()
+            else:
+                # بدون حد للمعدل: يُحترم Retry-After فقط (المحلي أو المخزن عند تحميل النقطة)
+                wake_at = self._blocked_until.get(endpoint.pk, endpoint.rate_limit_tat)
+        delay = wake_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+            return delay
+        return 0.0
+    
+    def _reserve(self, endpoint: WebhookEndpoint) -> deque:
+        """حجز كتلة من الفتحات (حوالي ثانية من السعة) بعبارة UPDATE شرطية واحدة"""
+        interval = 1.0 / endpoint.rate_limit_per_second
+        burst = max(endpoint.rate_limit_burst, 1)
+        tolerance = (burst - 1) * interval
+        block = max(1, min(burst, math.ceil(endpoint.rate_limit_per_second)))
+        
+        for _ in range(self.MAX_CAS_RETRIES):
+            stored = WebhookEndpoint.objects.filter(pk=endpoint.pk).values_list('rate_limit_tat', flat=True).first() or 0
+            now = time.time()
+            tat = max(stored, now)
+            claimed = WebhookEndpoint.objects.filter(pk=endpoint.pk, rate_limit_tat=stored).update(
+                rate_limit_tat=tat + block * interval
+            )
+            if claimed:
+                return deque(max(now, tat + i * interval - tolerance) for i in range(block))
+        
+        logger.warning(f"Rate limiter contention on endpoint {endpoint.name}, pacing locally")
+        return deque([time.time() + interval])
+    
+    def penalize(self, endpoint: WebhookEndpoint, retry_after: float):
+        """تطبيق Retry-After: إيقاف كل العمليات عن الإرسال لهذه النقطة حتى انقضاء المدة"""
+        retry_after = min(max(retry_after, 0), self.MAX_RETRY_AFTER_SECONDS)
+        interval = 1.0 / endpoint.rate_limit_per_second if endpoint.rate_limit_per_second else 0
+        tolerance = (max(endpoint.rate_limit_burst, 1) - 1) * interval
+        until = time.time() + retry_after + tolerance
+        WebhookEndpoint.objects.filter(pk=endpoint.pk, rate_limit_tat__lt=until).update(rate_limit_tat=until)
+        with self._lock:
+            if endpoint.rate_limit_per_second:
+                self._slots[endpoint.pk] = deque([time.time() + retry_after])
+            else:
+                self._blocked_until[endpoint.pk] = time.time() + retry_after
+    
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """قراءة ترويسة Retry-After (ثوانٍ أو تاريخ HTTP)"""
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return (parsedate_to_datetime(value) - timezone.now()).total_seconds()
+        except (TypeError, ValueError):
+            return None
+
+
+class EndpointRouter:
+    """
+    اختيار نقطة النهاية للإرسال مع التحويل التلقائي عند الفشل
+    
+    - النقاط الرئيسية أولاً، ثم الثانوية، ونقاط الاختبار فقط إذا لم يوجد غيرها
+    - قاطع دائرة يعزل النقطة بعد فشل متتالٍ أو نسبة خطأ مرتفعة
+    - توزيع حمل موزون اختياري بين نقاط النهاية من نفس النوع
+    """
+    
+    WINDOW_SIZE = 20
+    MIN_SAMPLES = 5
+    ERROR_RATE_THRESHOLD = 0.5
+    LATENCY_ALPHA = 0.2
+    TIER_ORDER = [
+        WebhookEndpoint.EndpointType.PRIMARY,
+        WebhookEndpoint.EndpointType.SECONDARY,
+    ]
+    
+    def __init__(self, endpoints: List[WebhookEndpoint], load_balance: bool = None):
+        if load_balance is None:
+            load_balance = get_notification_setting('LOAD_BALANCE_ENDPOINTS', False)
+        self.load_balance = load_balance
+        self.failure_threshold = get_notification_setting('CIRCUIT_BREAKER_FAILURES', 3)
+        self.rate_limiter = TokenBucketLimiter()
+        # الموجه مشترك بين خيوط الشرائح المتوازية لنفس الإشعار
+        self._lock = threading.RLock()
+        self.cooldown = timedelta(seconds=get_notification_setting('CIRCUIT_BREAKER_COOLDOWN_SECONDS', 60))
+        
+        live = [e for e in endpoints if e.endpoint_type in self.TIER_ORDER]
+        self.health = {e.pk: EndpointHealth(e, self.WINDOW_SIZE) for e in (live or endpoints)}
+        self.tiers = []
+        for endpoint_type in self.TIER_ORDER + [WebhookEndpoint.EndpointType.TEST]:
+            tier = [h for h in self.health.values() if h.endpoint.endpoint_type == endpoint_type]
+            if tier:
+                self.tiers.append(tier)
+        self._load_recent_outcomes()
+    
+    @classmethod
+    def for_active_endpoints(cls, load_balance: bool = None) -> 'EndpointRouter':
+        return cls(list(WebhookEndpoint.objects.filter(is_active=True)), load_balance=load_balance)
+    
+    def __bool__(self):
+        return bool(self.health)
+    
+    def _load_recent_outcomes(self):
+        """تهيئة النافذة المتدحرجة من آخر سجلات الإرسال لكل نقطة"""
+        for health in self.health.values():
+            statuses = NotificationDispatchLog.objects.filter(
+                webhook_url=health.endpoint.url,
+                status__in=[NotificationDispatchLog.Status.SUCCESS, NotificationDispatchLog.Status.FAILED],
+            ).order_by('-created_at').values_list('status', flat=True)[:self.WINDOW_SIZE]
+            health.outcomes.extend(
+                status == NotificationDispatchLog.Status.SUCCESS for status in reversed(statuses)
+            )
+    
+    def choose(self, avoid: Optional[WebhookEndpoint] = None) -> Optional[WebhookEndpoint]:
+        """اختيار أفضل نقطة متاحة، مع تجنب النقطة التي فشلت للتو إن أمكن"""
+        with self._lock:
+            now = timezone.now()
+            fallback = None
+            for tier in self.tiers:
+                candidates = [h for h in tier if h.is_available(now)]
+                if not candidates:
+                    continue
+                preferred = [h for h in candidates if avoid is None or h.endpoint.pk != avoid.pk]
+                if preferred:
+                    return self._pick(preferred).endpoint
+                fallback = fallback or candidates[0].endpoint
+            return fallback
+    
+    def _pick(self, candidates: List[EndpointHealth]) -> EndpointHealth:
+        if not self.load_balance or len(candidates) == 1:
+            return candidates[0]
+        weights = [max(h.endpoint.weight, 0) * (1 - h.error_rate) for h in candidates]
+        if not any(weights):
+            return candidates[0]
+        return random.choices(candidates, weights=weights)[0]
+    
+    def record_success(self, endpoint: WebhookEndpoint, latency_ms: float):
+        with self._lock:
+            health = self.health[endpoint.pk]
+            health.outcomes.append(True)
+            health.consecutive_failures = 0
+            health.success += 1
+            self._record_latency(health, latency_ms)
+            if health.open_until:
+                health.open_until = None
+                WebhookEndpoint.objects.filter(pk=endpoint.pk).update(circuit_open_until=None)
+    
+    def record_failure(self, endpoint: WebhookEndpoint, latency_ms: float):
+        with self._lock:
+            health = self.health[endpoint.pk]
+            health.outcomes.append(False)
+            health.consecutive_failures += 1
+            health.failed += 1
+            self._record_latency(health, latency_ms)
+            
+            tripped = health.consecutive_failures >= self.failure_threshold or (
+                len(health.outcomes) >= self.MIN_SAMPLES and health.error_rate >= self.ERROR_RATE_THRESHOLD
+            )
+            if tripped:
+                health.open_until = timezone.now() + self.cooldown
+                # نشر الحالة فوراً حتى تتوقف بقية العمليات عن استخدام النقطة
+                WebhookEndpoint.objects.filter(pk=endpoint.pk).update(circuit_open_until=health.open_until)
+                logger.warning(
+                    f"Circuit opened for endpoint {endpoint.name} until {health.open_until:%H:%M:%S} "
+                    f"(error rate {health.error_rate:.0%})"
+                )
+    
+    def _record_latency(self, health: EndpointHealth, latency_ms: float):
+        if health.latency_ms:
+            health.latency_ms += self.LATENCY_ALPHA * (latency_ms - health.latency_ms)
+        else:
+            health.latency_ms = latency_ms
+    
+    def flush(self):
+        """حفظ العدادات وزمن الاستجابة المتراكمة باستعلام واحد لكل نقطة مستخدمة"""
+        with self._lock:
+            now = timezone.now()
+            for health in self.health.values():
+                if not health.success and not health.failed:
+                    continue
+                WebhookEndpoint.objects.filter(pk=health.endpoint.pk).update(
+                    success_count=F('success_count') + health.success,
+                    failure_count=F('failure_count') + health.failed,
+                    avg_latency_ms=health.latency_ms,
+                    last_used_at=now,
+                )
+                health.success = health.failed = 0
+
+
 class NotificationDispatchService:
     """خدمة إرسال الإشعارات إلى Webhook"""
     
     DEFAULT_TIMEOUT = 30
     MAX_RETRIES = 3
     RETRY_DELAYS = [5, 15, 30]
+    MAX_RATE_LIMITED_RETRIES = 5
+    CHUNK_SIZE = 500
+    RESULT_FLUSH_SIZE = 25
+    LOG_UPDATE_FIELDS = [
+        'webhook_url', 'payload', 'status', 'attempt_count', 'response_status_code', 'response_body',
+        'error_message', 'first_attempt_at', 'last_attempt_at', 'completed_at',
+    ]
     
-    def __init__(self):
+    def __init__(self, endpoints: Optional[List[WebhookEndpoint]] = None):
+        """endpoints (اختياري) يقصر الإرسال على نقاط نهاية محددة بدلاً من كل النقاط النشطة"""
         self.payload_builder = PayloadBuilder()
+        self.endpoints = endpoints
+    
+    def get_router(self) -> EndpointRouter:
+        if self.endpoints is not None:
+            return EndpointRouter(self.endpoints)
+        return EndpointRouter.for_active_endpoints()
     
-    def dispatch_notification(self, notification: ScheduledNotification, immediate: bool = False) -> Dict[str, Any]:
-        """إرسال إشعار إلى جميع المستلمين"""
-        results = {'total': 0, 'success': 0, 'failed': 0, 'logs': []}
+    def dispatch_notification(self, notification: ScheduledNotification, immediate: bool = False,
+                              on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+                              abort: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        إرسال إشعار إلى جميع المستلمين
+        
+        on_progress (اختياري) يُستدعى بعد كل دفعة بالنتائج المتراكمة.
+        abort (اختياري) يوقف الإرسال قبل التسليم التالي (فقد العامل حجزه)؛ عندها لا تُحدّث
+        حالة الإشعار ويكمل الإرسال من حجزه بعده (الإيصالات تمنع التكرار).
+        """
+        results = {'total': 0, 'success': 0, 'failed': 0, 'duplicates': 0, 'aborted': False}
         
         if not immediate and notification.status != ScheduledNotification.Status.SCHEDULED:
             logger.warning(f"Notification {notification.id} is not scheduled for sending")
@@ -141,32 +510,33 @@ class NotificationDispatchService:
             logger.warning(f"Notification {notification.id} is disabled")
             return results
         
-        recipients = self._get_recipients(notification)
-        results['total'] = len(recipients)
-        
-        if not recipients:
-            logger.warning(f"No recipients found for notification {notification.id}")
+        router = self.get_router()
+        if not router:
+            logger.error("No active webhook endpoints found")
             return results
         
-        endpoints = WebhookEndpoint.objects.filter(is_active=True)
-        if not endpoints:
-            logger.error("No active webhook endpoints found")
+        chunks = self._iter_recipient_chunks(notification)
+        first_chunk = next(chunks, None)
+        if not first_chunk:
+            logger.warning(f"No recipients found for notification {notification.id}")
             return results
         
         notification.status = ScheduledNotification.Status.SENDING
         notification.save(update_fields=['status'])
         
-        for recipient in recipients:
-            try:
-                log = self._send_to_recipient(notification, recipient, endpoints)
-                if log.status == NotificationDispatchLog.Status.SUCCESS:
-                    results['success'] += 1
-                else:
-                    results['failed'] += 1
-                results['logs'].append(log)
-            except Exception as e:
-                logger.exception(f"Error dispatching to {recipient}: {e}")
-                results['failed'] += 1
+        compiled = self.payload_builder.compile(
+            notification, lesson=notification.lesson, tafseer=notification.tafseer
+        )
+        for chunk_results in self._run_shards(notification, first_chunk, chunks, router, compiled, abort):
+            for key in ('total', 'success', 'failed', 'duplicates'):
+                results[key] += chunk_results[key]
+            if on_progress:
+                on_progress(results)
+        
+        if abort is not None and abort.is_set():
+            logger.warning(f"Dispatch of notification {notification.id} aborted (lease lost)")
+            results['aborted'] = True
+            return results
         
         notification.successful_sends = results['success']
         notification.failed_sends = results['failed']
@@ -184,62 +554,264 @@ class NotificationDispatchService:
         notification.save()
         return results
     
-    def _get_recipients(self, notification: ScheduledNotification) -> List[Any]:
-        """الحصول على قائمة المستلمين"""
+    def _get_recipients(self, notification: ScheduledNotification) -> Iterator[Recipient]:
+        """الحصول على المستلمين كتدفق من الصفوف الخفيفة (بدون تحميل كائنات المستخدمين)"""
         from accounts.models import CustomUser
         
         target_type = notification.target_type
+        users = CustomUser.objects.none()
         
         if target_type == ScheduledNotification.TargetType.ALL_STUDENTS:
-            return list(CustomUser.objects.filter(user_type='student', is_active=True))
+            users = CustomUser.objects.filter(user_type='student', is_active=True)
         elif target_type == ScheduledNotification.TargetType.ALL_PARENTS:
-            return list(CustomUser.objects.filter(user_type='parent', is_active=True))
+            users = CustomUser.objects.filter(user_type='parent', is_active=True)
         elif target_type == ScheduledNotification.TargetType.ALL_TEACHERS:
-            return list(CustomUser.objects.filter(user_type='sheikh', is_active=True))
-        elif target_type == ScheduledNotification.TargetType.HALAQA and notification.target_halaqa:
-            enrollments = notification.target_halaqa.enrollments.filter(status='active').select_related('student')
-            return [e.student for e in enrollments]
-        elif target_type == ScheduledNotification.TargetType.COURSE and notification.target_course:
-            enrollments = notification.target_course.enrolled_students.filter(status='active').select_related('student')
-            return [e.student for e in enrollments]
+            users = CustomUser.objects.filter(user_type='sheikh', is_active=True)
+        elif target_type == ScheduledNotification.TargetType.HALAQA and notification.target_halaqa_id:
+            users = CustomUser.objects.filter(
+                halaqa_enrollments__halaqa_id=notification.target_halaqa_id,
+                halaqa_enrollments__status='active',
+            )
+        elif target_type == ScheduledNotification.TargetType.COURSE and notification.target_course_id:
+            users = CustomUser.objects.filter(
+                enrolled_curriculums__curriculum_id=notification.target_course_id,
+                enrolled_curriculums__status='active',
+            )
         elif target_type == ScheduledNotification.TargetType.SPECIFIC_USERS:
-            return list(notification.target_users.filter(is_active=True))
-        return []
+            users = notification.target_users.filter(is_active=True)
+        
+        return self._stream_recipients(users)
     
-    def _send_to_recipient(self, notification, recipient, endpoints):
-        """إرسال إشعار لمستلم محدد"""
-        payload = self.payload_builder.build_payload(
-            notification=notification,
-            recipient=recipient,
-            lesson=notification.lesson,
-            tafseer=notification.tafseer
+    def _stream_recipients(self, users) -> Iterator[Recipient]:
+        """
+        تحويل استعلام المستخدمين إلى تدفق من Recipient دون تحميل الكائنات
+        
+        القراءة بصفحات حسب المفتاح الأساسي (keyset) بدلاً من مؤشر مفتوح طوال الإرسال،
+        حتى لا يحجب قفل القراءة في SQLite كتابات الشرائح المتوازية.
+        """
+        users = users.order_by('pk').values_list(
+            'id', 'first_name', 'last_name', 'email', 'user_type', 'username'
         )
-        endpoint = endpoints.first()
+        last_pk = None
+        while True:
+            page = users if last_pk is None else users.filter(pk__gt=last_pk)
+            rows = list(page[:self.CHUNK_SIZE])
+            for user_id, first_name, last_name, email, user_type, username in rows:
+                yield Recipient(
+                    id=user_id,
+                    name=f"{first_name} {last_name}".strip(),
+                    email=email,
+                    user_type=user_type,
+                    first_name=first_name,
+                    username=username,
+                )
+            if len(rows) < self.CHUNK_SIZE:
+                return
+            last_pk = rows[-1][0]
+    
+    def _iter_recipient_chunks(self, notification: ScheduledNotification) -> Iterator[List[Recipient]]:
+        """تقسيم تدفق المستلمين إلى دفعات بحجم CHUNK_SIZE"""
+        recipients = self._get_recipients(notification)
+        while True:
+            chunk = list(itertools.islice(recipients, self.CHUNK_SIZE))
+            if not chunk:
+                return
+            yield chunk
+    
+    def _run_shards(self, notification, first_chunk: List[Recipient], chunks: Iterator[List[Recipient]],
+                    router: EndpointRouter, compiled: CompiledPayload,
+                    abort: Optional[threading.Event] = None) -> Iterator[Dict[str, int]]:
+        """
+        تنفيذ دفعات المستلمين (الشرائح) بالتوازي على SHARD_WORKERS خيطاً
+        
+        الإشعار الصغير (دفعة واحدة) يُرسل مباشرة دون خيوط. لا تُقرأ أكثر من ضعف
+        عدد الخيوط من الشرائح مقدماً، فتبقى الذاكرة محدودة مهما كان عدد المستلمين.
+        """
+        second_chunk = next(chunks, None)
+        shard_workers = get_notification_setting('SHARD_WORKERS', 4)
+        if second_chunk is None or shard_workers <= 1:
+            for chunk in itertools.chain([first_chunk], [second_chunk] if second_chunk else [], chunks):
+                if abort is not None and abort.is_set():
+                    return
+                yield self._dispatch_chunk(notification, chunk, router, compiled, abort)
+            return
+        
+        with ThreadPoolExecutor(max_workers=shard_workers, thread_name_prefix='notification-shard') as pool:
+            pending = set()
+            for chunk in itertools.chain([first_chunk, second_chunk], chunks):
+                if abort is not None and abort.is_set():
+                    break
+                pending.add(pool.submit(self._dispatch_shard, notification, chunk, router, compiled, abort))
+                if len(pending) >= shard_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    
+    def _dispatch_shard(self, notification, recipients: List[Recipient], router: EndpointRouter,
+                        compiled: CompiledPayload, abort: Optional[threading.Event] = None) -> Dict[str, int]:
+        """تنفيذ شريحة في خيط مستقل مع إغلاق اتصال قاعدة البيانات الخاص بالخيط"""
+        try:
+            return self._dispatch_chunk(notification, recipients, router, compiled, abort)
+        finally:
+            connections.close_all()
+    
+    def _dispatch_chunk(self, notification, recipients: List[Recipient], router: EndpointRouter,
+                        compiled: CompiledPayload, abort: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        إرسال دفعة من المستلمين مع كتابة النتائج كل RESULT_FLUSH_SIZE تسليماً
+        
+        المستلمون الذين لهم إيصال تسليم سابق يُحتسبون ناجحين ولا يُعاد الإرسال إليهم.
+        الكتابة المتقطعة تحصر ما قد يُعاد إرساله عند توقف العامل في آخر دفعة صغيرة
+        بدلاً من الشريحة كلها. عند abort تبقى سجلات من لم يُرسل إليهم معلقة ليعيد
+        استخدامها صاحب الحجز الجديد.
+        """
+        results = {'total': len(recipients), 'success': 0, 'failed': 0, 'duplicates': 0}
+        delivered = self._delivered_recipients(notification, recipients)
+        if delivered:
+            results['success'] += len(delivered)
+            results['duplicates'] += len(delivered)
+            recipients = [recipient for recipient in recipients if recipient.id not in delivered]
+        logs = self._prepare_logs(notification, recipients, router, compiled)
+        flush_size = get_notification_setting('RESULT_FLUSH_SIZE', self.RESULT_FLUSH_SIZE)
+        finished = []
         
-        with transaction.atomic():
-            log, created = NotificationDispatchLog.objects.get_or_create(
+        for recipient in recipients:
+            if abort is not None and abort.is_set():
+                results['total'] -= 1
+                continue
+            log = logs[recipient.id]
+            try:
+                self._deliver(log, router, compiled.render_json(recipient))
+            except Exception as e:
+                logger.exception(f"Error dispatching to {recipient.name or recipient.username}: {e}")
+            if log.status == NotificationDispatchLog.Status.SUCCESS:
+                results['success'] += 1
+            else:
+                results['failed'] += 1
+            finished.append(log)
+            if len(finished) >= flush_size:
+                self._flush_results(finished, router)
+                finished = []
+        
+        self._flush_results(finished, router)
+        return results
+    
+    def _flush_results(self, logs, router: EndpointRouter):
+        """كتابة نتائج السجلات المنتهية وإيصالات الناجح منها"""
+        if logs:
+            NotificationDispatchLog.objects.bulk_update(logs, self.LOG_UPDATE_FIELDS)
+            self._record_receipts(logs)
+        router.flush()
+    
+    def _delivered_recipients(self, notification, recipients: List[Recipient]) -> set:
+        """المستلمون الذين سبق التسليم لهم - استعلام واحد على المفتاح الأساسي لإيصالات التسليم"""
+        keys = {DeliveryReceipt.key_for(notification.id, recipient.id): recipient.id for recipient in recipients}
+        if not keys:
+            return set()
+        return {
+            keys[key]
+            for key in DeliveryReceipt.objects.filter(key__in=keys.keys()).values_list('key', flat=True)
+        }
+    
+    def _record_receipts(self, logs):
+        """تسجيل إيصالات التسليمات الناجحة (مع تجاهل الموجود مسبقاً)"""
+        DeliveryReceipt.objects.bulk_create([
+            DeliveryReceipt(
+                key=DeliveryReceipt.key_for(log.notification_id, log.recipient_id),
+                delivered_at=log.completed_at,
+            )
+            for log in logs
+            if log.status == NotificationDispatchLog.Status.SUCCESS
+        ], batch_size=self.CHUNK_SIZE, ignore_conflicts=True)
+    
+    def _prepare_logs(self, notification, recipients: List[Recipient], router: EndpointRouter,
+                      compiled: CompiledPayload) -> Dict[int, NotificationDispatchLog]:
+        """إنشاء سجلات الإرسال المعلقة دفعة واحدة مع إعادة استخدام السجلات السابقة"""
+        payloads = {recipient.id: compiled.render(recipient) for recipient in recipients}
+        
+        logs = {
+            log.recipient_id: log
+            for log in NotificationDispatchLog.objects.filter(
                 notification=notification,
-                recipient=recipient,
-                webhook_url=endpoint.url,
-                defaults={'payload': payload, 'status': NotificationDispatchLog.Status.PENDING}
+                recipient_id__in=payloads.keys(),
+            ).order_by('created_at')
+        }
+        for recipient_id, log in logs.items():
+            log.payload = payloads[recipient_id]
+        
+        endpoint = router.choose()
+        webhook_url = endpoint.url if endpoint else ''
+        new_logs = [
+            NotificationDispatchLog(
+                notification=notification,
+                recipient_id=recipient_id,
+                webhook_url=webhook_url,
+                payload=payload,
+                status=NotificationDispatchLog.Status.PENDING,
             )
+            for recipient_id, payload in payloads.items()
+            if recipient_id not in logs
+        ]
+        NotificationDispatchLog.objects.bulk_create(new_logs, batch_size=self.CHUNK_SIZE)
+        logs.update((log.recipient_id, log) for log in new_logs)
+        return logs
+    
+    def _execute_send_with_retry(self, log, router: EndpointRouter, payload):
+        """تنفيذ الإرسال مع آلية إعادة المحاولة وحفظ النتيجة"""
+        receipt_key = DeliveryReceipt.key_for(log.notification_id, log.recipient_id)
+        if DeliveryReceipt.objects.filter(key=receipt_key).exists():
+            # تم التسليم عبر مسار آخر (إرسال مكرر أو سجل أحدث)
+            log.status = NotificationDispatchLog.Status.SUCCESS
+            log.error_message = "Already delivered"
+            log.completed_at = timezone.now()
+            log.save(update_fields=self.LOG_UPDATE_FIELDS)
+            return log
         
-        return self._execute_send_with_retry(log, endpoint, payload)
+        self._deliver(log, router, payload)
+        log.save(update_fields=self.LOG_UPDATE_FIELDS)
+        self._record_receipts([log])
+        router.flush()
+        return log
     
-    def _execute_send_with_retry(self, log, endpoint, payload):
-        """تنفيذ الإرسال مع آلية إعادة المحاولة"""
+    def _deliver(self, log, router: EndpointRouter, payload):
+        """
+        محاولات الإرسال مع إعادة المحاولة - تعدّل السجل في الذاكرة فقط
+        
+        عند فشل محاولة يتم التحويل إلى نقطة نهاية سليمة أخرى فوراً إن وجدت،
+        وإلا الانتظار ثم إعادة المحاولة على نفس النقطة.
+        """
         log.first_attempt_at = log.first_attempt_at or timezone.now()
+        endpoint = router.choose()
+        # استجابات 429 لا تستهلك المحاولات (حتى حد معين) - الانتظار يتم عبر محدد المعدل
+        rate_limited = 0
         
         while log.attempt_count < log.max_attempts:
+            if endpoint is None:
+                # جميع الدوائر مفتوحة: فشل سريع دون استهلاك المحاولات المتبقية
+                log.status = NotificationDispatchLog.Status.FAILED
+                log.error_message = "No healthy webhook endpoint available (circuit open)"
+                log.completed_at = timezone.now()
+                return log
+            
+            router.rate_limiter.acquire(endpoint)
             log.attempt_count += 1
             log.last_attempt_at = timezone.now()
+            log.webhook_url = endpoint.url
+            started = time.monotonic()
             
             try:
                 response = self._make_http_request(
                     url=endpoint.url,
                     payload=payload,
                     timeout=endpoint.timeout_seconds or self.DEFAULT_TIMEOUT,
-                    headers=endpoint.headers
+                    headers={
+                        **endpoint.headers,
+                        'Idempotency-Key': idempotency_key(log.notification_id, log.recipient_id, endpoint.pk),
+                    }
                 )
                 
                 log.response_status_code = response.status_code
@@ -248,13 +820,23 @@ class NotificationDispatchService:
                 if response.status_code == 200:
                     log.status = NotificationDispatchLog.Status.SUCCESS
                     log.completed_at = timezone.now()
-                    endpoint.success_count += 1
-                    endpoint.last_used_at = timezone.now()
-                    endpoint.save(update_fields=['success_count', 'last_used_at'])
-                    log.save()
+                    router.record_success(endpoint, (time.monotonic() - started) * 1000)
                     return log
-                else:
-                    log.error_message = f"HTTP {response.status_code}: {response.text[:500]}"
+                
+                log.error_message = f"HTTP {response.status_code}: {response.text[:500]}"
+                retry_after = TokenBucketLimiter.parse_retry_after(response.headers.get('Retry-After'))
+                if response.status_code == 429 or (response.status_code == 503 and retry_after is not None):
+                    router.rate_limiter.penalize(endpoint, retry_after if retry_after is not None else 1)
+                    log.attempt_count -= 1
+                    rate_limited += 1
+                    if rate_limited > self.MAX_RATE_LIMITED_RETRIES:
+                        # نفاد حد إعادة المحاولة: السجل فاشل بمحاولات غير مستهلكة فيلتقطه retry_failed_dispatches
+                        log.status = NotificationDispatchLog.Status.FAILED
+                        log.error_message = f"Rate limited {rate_limited} times, last {log.error_message}"
+                        log.completed_at = timezone.now()
+                        return log
+                    log.status = NotificationDispatchLog.Status.RETRYING
+                    continue
                     
             except requests.exceptions.Timeout:
                 log.error_message = f"Request timeout"
@@ -263,47 +845,52 @@ class NotificationDispatchService:
             except Exception as e:
                 log.error_message = f"Exception: {str(e)[:500]}"
             
+            router.record_failure(endpoint, (time.monotonic() - started) * 1000)
+            failed_endpoint = endpoint
+            endpoint = router.choose(avoid=failed_endpoint)
+            
             if log.attempt_count < log.max_attempts:
                 log.status = NotificationDispatchLog.Status.RETRYING
-                log.save()
-                import time
-                delay = self.RETRY_DELAYS[min(log.attempt_count - 1, len(self.RETRY_DELAYS) - 1)]
-                time.sleep(delay)
+                if endpoint is not None and endpoint.pk == failed_endpoint.pk:
+                    delay = self.RETRY_DELAYS[min(log.attempt_count - 1, len(self.RETRY_DELAYS) - 1)]
+                    time.sleep(delay)
             else:
                 log.status = NotificationDispatchLog.Status.FAILED
                 log.completed_at = timezone.now()
-                endpoint.failure_count += 1
-                endpoint.last_used_at = timezone.now()
-                endpoint.save(update_fields=['failure_count', 'last_used_at'])
-                log.save()
         
         return log
     
-    def _make_http_request(self, url: str, payload: Dict[str, Any], timeout: int, headers: Dict[str, str]):
-        """إجراء طلب HTTP POST"""
+    def _make_http_request(self, url: str, payload, timeout: int, headers: Dict[str, str]):
+        """إجراء طلب HTTP POST - الحمولة قاموس أو نص JSON مُسلسل مسبقاً"""
         default_headers = {
             'Content-Type': 'application/json',
             'Accept': 'application/json',
             'X-Source': 'quran-courses-platform',
         }
         default_headers.update(headers)
+        if isinstance(payload, str):
+            return requests.post(url=url, data=payload.encode('utf-8'), headers=default_headers, timeout=timeout)
         return requests.post(url=url, json=payload, headers=default_headers, timeout=timeout)
     
     def retry_failed_dispatches(self, notification: ScheduledNotification = None):
         """إعادة محاولة الإرسالات الفاشلة"""
         logs = NotificationDispatchLog.objects.filter(
             status=NotificationDispatchLog.Status.FAILED,
-            attempt_count__lt=models.F('max_attempts')
+            attempt_count__lt=F('max_attempts')
         )
         if notification:
             logs = logs.filter(notification=notification)
         
         results = {'retried': 0, 'success': 0, 'failed': 0}
+        router = self.get_router()
+        if not router:
+            logger.error("No active webhook endpoints found")
+            return results
+        
         for log in logs:
             try:
-                endpoint = WebhookEndpoint.objects.filter(is_active=True, url=log.webhook_url).first()
-                if endpoint:
-                    self._execute_send_with_retry(log, endpoint, log.payload)
+                if router.choose():
+                    self._execute_send_with_retry(log, router, log.payload)
                     results['retried'] += 1
                     if log.status == NotificationDispatchLog.Status.SUCCESS:
                         results['success'] += 1
@@ -319,17 +906,89 @@ class SchedulingService:
     """خدمة إدارة جدولة الإشعارات"""
     
     @classmethod
-    def create_recurring_instances(cls, parent_notification: ScheduledNotification) -> List[ScheduledNotification]:
-        """إنشاء نسخ متكررة من الإشعار"""
+    def create_recurring_instances(cls, parent_notification: ScheduledNotification,
+                                   horizon_days: Optional[int] = None) -> List[ScheduledNotification]:
+        """
+        إنشاء النسخ المتكررة القادمة ضمن أفق زمني متدحرج (افتراضياً 7 أيام)
+        
+        لا يتم إنشاء كل التكرارات مقدماً؛ المهمة الدورية تكمل الأفق باستمرار،
+        والتقويم يحسب التكرارات الأبعد افتراضياً دون حفظها.
+        """
         if parent_notification.recurrence_type == ScheduledNotification.RecurrenceType.ONE_TIME:
             return []
         
-        instances = []
+        if horizon_days is None:
+            horizon_days = get_notification_setting('RECURRENCE_HORIZON_DAYS', 7)
+        now = timezone.now()
+        horizon_end = now + timedelta(days=horizon_days)
+        
+        existing = set(
+            parent_notification.child_notifications.filter(
+                scheduled_datetime__gt=now,
+                scheduled_datetime__lte=horizon_end,
+            ).values_list('scheduled_datetime', flat=True)
+        )
+        occurrences = [
+            occ for occ in cls.get_occurrences(parent_notification, now, horizon_end)
+            if occ not in existing
+        ]
+        if not occurrences:
+            return []
+        
+        # القيد الفريد (الأصل، الموعد) يتجاهل ما أنشأته عملية متزامنة أخرى بين الفحص والإدراج
+        built = ScheduledNotification.objects.bulk_create(
+            [cls._build_instance(parent_notification, occ) for occ in occurrences],
+            ignore_conflicts=True,
+        )
+        instances = list(ScheduledNotification.objects.filter(pk__in=[instance.pk for instance in built]))
+        if not instances:
+            return []
+        # bulk_create لا يرسل إشارات post_save
+        CalendarFeedService.invalidate()
+        
+        if parent_notification.target_type == ScheduledNotification.TargetType.SPECIFIC_USERS:
+            through = ScheduledNotification.target_users.through
+            user_ids = list(parent_notification.target_users.values_list('pk', flat=True))
+            through.objects.bulk_create([
+                through(schedulednotification_id=instance.pk, customuser_id=user_id)
+                for instance in instances
+                for user_id in user_ids
+            ], batch_size=500)
+        
+        return instances
+    
+    @classmethod
+    def top_up_recurring_instances(cls, horizon_days: Optional[int] = None) -> int:
+        """إكمال أفق التكرار لجميع الإشعارات المتكررة النشطة - تستدعيها المهمة الدورية"""
+        parents = ScheduledNotification.objects.filter(
+            parent_notification__isnull=True,
+            is_enabled=True,
+        ).exclude(
+            recurrence_type=ScheduledNotification.RecurrenceType.ONE_TIME,
+        ).exclude(
+            status=ScheduledNotification.Status.CANCELLED,
+        ).filter(
+            Q(recurrence_end_date__isnull=True) | Q(recurrence_end_date__gte=timezone.localdate())
+        )
+        
+        created = 0
+        for parent in parents.iterator():
+            try:
+                created += len(cls.create_recurring_instances(parent, horizon_days=horizon_days))
+            except Exception as e:
+                logger.exception(f"Error topping up recurring instances for {parent.id}: {e}")
+        return created
+    
+    @classmethod
+    def get_occurrences(cls, parent_notification: ScheduledNotification, start: datetime, end: datetime) -> List[datetime]:
+        """مواعيد تكرار الإشعار الأصلي الواقعة في الفترة (start, end] دون الموعد الأول"""
         base_datetime = parent_notification.scheduled_datetime
         end_date = parent_notification.recurrence_end_date
-        
         if not end_date:
             end_date = (base_datetime + timedelta(days=90)).date()
+        end_date = min(end_date, end.date())
+        if end_date < base_datetime.date():
+            return []
         
         occurrence_dates = cls._calculate_occurrences(
             start_date=base_datetime,
@@ -337,15 +996,7 @@ class SchedulingService:
             recurrence_type=parent_notification.recurrence_type,
             recurrence_days=parent_notification.recurrence_days
         )
-        
-        for occ_datetime in occurrence_dates[1:]:
-            try:
-                instance = cls._create_instance(parent=parent_notification, scheduled_datetime=occ_datetime)
-                instances.append(instance)
-            except Exception as e:
-                logger.exception(f"Error creating instance for {occ_datetime}: {e}")
-        
-        return instances
+        return [occ for occ in occurrence_dates[1:] if start < occ <= end]
     
     @classmethod
     def _calculate_occurrences(cls, start_date: datetime, end_date, recurrence_type: str, recurrence_days: List[int]):
@@ -382,31 +1033,29 @@ class SchedulingService:
         return [start_date]
     
     @classmethod
-    def _create_instance(cls, parent: ScheduledNotification, scheduled_datetime: datetime) -> ScheduledNotification:
-        """إنشاء نسخة فرعية من الإشعار"""
-        instance = ScheduledNotification.objects.create(
+    def _build_instance(cls, parent: ScheduledNotification, scheduled_datetime: datetime) -> ScheduledNotification:
+        """بناء نسخة فرعية من الإشعار (بدون حفظ)"""
+        return ScheduledNotification(
             title=parent.title,
             content_type=parent.content_type,
-            template=parent.template,
+            template_id=parent.template_id,
             message=parent.message,
             image=parent.image,
             link=parent.link,
-            lesson=parent.lesson,
-            tafseer=parent.tafseer,
+            lesson_id=parent.lesson_id,
+            tafseer_id=parent.tafseer_id,
             scheduled_datetime=scheduled_datetime,
             timezone=parent.timezone,
             recurrence_type=ScheduledNotification.RecurrenceType.ONE_TIME,
             target_type=parent.target_type,
-            target_halaqa=parent.target_halaqa,
-            target_course=parent.target_course,
+            target_halaqa_id=parent.target_halaqa_id,
+            target_course_id=parent.target_course_id,
             status=ScheduledNotification.Status.SCHEDULED,
             is_enabled=parent.is_enabled,
+            priority=parent.priority,
             parent_notification=parent,
-            created_by=parent.created_by,
+            created_by_id=parent.created_by_id,
         )
-        if parent.target_type == ScheduledNotification.TargetType.SPECIFIC_USERS:
-            instance.target_users.set(parent.target_users.all())
-        return instance
     
     @classmethod
     def get_pending_notifications(cls, limit: int = 100) -> List[ScheduledNotification]:
@@ -418,6 +1067,64 @@ class SchedulingService:
             scheduled_datetime__lte=now
         ).order_by('scheduled_datetime')[:limit])
     
+    @classmethod
+    def claim_pending_notifications(cls, worker_id: str, limit: int = 10, lease_seconds: int = 300,
+                                    priority: Optional[int] = None) -> List[ScheduledNotification]:
+        """
+        حجز الإشعارات المستحقة لعامل محدد لمدة lease_seconds
+        
+        يتم الحجز بعبارة UPDATE شرطية واحدة، لذلك لا يحصل عاملان على نفس الإشعار.
+        الإشعارات العالقة في حالة "جاري الإرسال" بعد انتهاء حجزها (توقف العامل) يعاد حجزها.
+        الترتيب حسب دقيقة الجدولة ثم الأولوية، فالعاجل يسبق غيره في نفس الدقيقة؛
+        و priority (اختياري) يقصر الحجز على مسار أولوية واحد.
+        """
+        now = timezone.now()
+        lease_free = Q(lease_until__isnull=True) | Q(lease_until__lt=now)
+        claimable = Q(
+            status=ScheduledNotification.Status.SCHEDULED,
+            is_enabled=True,
+            scheduled_datetime__lte=now,
+        ) | Q(
+            status=ScheduledNotification.Status.SENDING,
+            lease_until__isnull=False,
+            lease_until__lt=now,
+        )
+        candidates = ScheduledNotification.objects.filter(claimable, lease_free)
+        if priority is not None:
+            candidates = candidates.filter(priority=priority)
+        candidate_ids = list(
+            candidates.order_by(TruncMinute('scheduled_datetime'), 'priority', 'scheduled_datetime')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if not candidate_ids:
+            return []
+        
+        lease_until = now + timedelta(seconds=lease_seconds)
+        ScheduledNotification.objects.filter(claimable, lease_free, pk__in=candidate_ids).update(
+            claimed_by=worker_id,
+            lease_until=lease_until,
+        )
+        return list(ScheduledNotification.objects.filter(
+            pk__in=candidate_ids,
+            claimed_by=worker_id,
+            lease_until=lease_until,
+        ).order_by(TruncMinute('scheduled_datetime'), 'priority', 'scheduled_datetime'))
+    
+    @classmethod
+    def renew_lease(cls, notification: ScheduledNotification, worker_id: str, lease_seconds: int = 300) -> bool:
+        """تمديد حجز إشعار أثناء إرساله"""
+        return bool(ScheduledNotification.objects.filter(pk=notification.pk, claimed_by=worker_id).update(
+            lease_until=timezone.now() + timedelta(seconds=lease_seconds)
+        ))
+    
+    @classmethod
+    def release_lease(cls, notification: ScheduledNotification, worker_id: str):
+        """تحرير حجز إشعار بعد انتهاء معالجته"""
+        ScheduledNotification.objects.filter(pk=notification.pk, claimed_by=worker_id).update(
+            claimed_by='',
+            lease_until=None,
+        )
+    
     @classmethod
     def cancel_notification(cls, notification: ScheduledNotification, user=None, cancel_children: bool = True) -> bool:
         """إلغاء إشعار"""
@@ -440,6 +1147,7 @@ class SchedulingService:
             notification.child_notifications.filter(
                 status__in=[ScheduledNotification.Status.SCHEDULED, ScheduledNotification.Status.DRAFT]
             ).update(status=ScheduledNotification.Status.CANCELLED, is_enabled=False)
+            CalendarFeedService.invalidate()
         
         return True
     
@@ -463,6 +1171,7 @@ class SchedulingService:
             target_course=notification.target_course,
             status=ScheduledNotification.Status.DRAFT,
             is_enabled=False,
+            priority=notification.priority,
             created_by=user or notification.created_by,
         )
         if notification.target_type == ScheduledNotification.TargetType.SPECIFIC_USERS:
@@ -470,5 +1179,225 @@ class SchedulingService:
         return new_notification
 
 
-# Import models here to avoid circular import
-from django.db import models
+
+class CalendarFeedService:
+    """
+    بيانات تقويم الإشعارات
+    
+    - فلترة بحدود تاريخ/وقت حقيقية تستخدم الفهرس (scheduled_datetime, status)
+    - جلب الأعمدة المطلوبة فقط وبناء العرض والروابط دون استعلامات إضافية
+    - تخزين مؤقت لكل شهر في الكاش المشترك، يُبطل عبر عداد أجيال عند حفظ أو حذف أي
+      إشعار (من أي عامل ويب أو من عامل الإشعارات)
+    - حد أقصى لمدى الطلب وعدد الأحداث
+    """
+    
+    CACHE_ALIAS = 'shared'
+    CACHE_GENERATION_KEY = 'ns_calendar:generation'
+    CACHE_BUCKET_KEY = 'ns_calendar:{generation}:{month}'
+    CACHE_TIMEOUT = 3600
+    DEFAULT_RANGE_DAYS = 42
+    MAX_RANGE_DAYS = 93
+    MAX_EVENTS = 1000
+    EVENT_DURATION = timedelta(minutes=30)
+    FIELDS = ['id', 'title', 'scheduled_datetime', 'status', 'content_type', 'target_type']
+    _URL_PLACEHOLDER = '00000000-0000-0000-0000-000000000000'
+    STATUS_COLORS = {
+        ScheduledNotification.Status.DRAFT: '#6c757d',
+        ScheduledNotification.Status.SCHEDULED: '#2563eb',
+        ScheduledNotification.Status.SENDING: '#f59e0b',
+        ScheduledNotification.Status.SENT: '#10b981',
+        ScheduledNotification.Status.FAILED: '#ef4444',
+        ScheduledNotification.Status.CANCELLED: '#94a3b8',
+    }
+    
+    # ==================== Range ====================
+    
+    @classmethod
+    def parse_range(cls, start: Optional[str], end: Optional[str]):
+        """تحويل معاملات الطلب إلى حدود زمنية [start, end) مع تطبيق الحد الأقصى"""
+        range_start = cls._parse_bound(start)
+        range_end = cls._parse_bound(end)
+        
+        if range_start is None:
+            today = timezone.localdate()
+            range_start = cls._local_midnight(today.replace(day=1))
+        if range_end is None or range_end <= range_start:
+            range_end = range_start + timedelta(days=cls.DEFAULT_RANGE_DAYS)
+        return range_start, min(range_end, range_start + timedelta(days=cls.MAX_RANGE_DAYS))
+    
+    @classmethod
+    def _parse_bound(cls, value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        try:
+            if 'T' not in value:
+                return cls._local_midnight(datetime.strptime(value, '%Y-%m-%d').date())
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (ValueError, TypeError):
+            return None
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    
+    @staticmethod
+    def _local_midnight(day) -> datetime:
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    
+    # ==================== Events ====================
+    
+    @classmethod
+    def get_events(cls, start: Optional[str], end: Optional[str]) -> List[Dict[str, Any]]:
+        """أحداث التقويم للفترة المطلوبة (المحفوظة + التكرارات الافتراضية)"""
+        range_start, range_end = cls.parse_range(start, end)
+        
+        events = []
+        for month in cls._months(range_start, range_end):
+            for event in cls._get_month_bucket(month):
+                if range_start <= event['_at'] < range_end:
+                    events.append(event)
+        events.sort(key=lambda event: event['_at'])
+        events.extend(cls.get_virtual_events(range_start, range_end))
+        
+        return [
+            {key: value for key, value in event.items() if key != '_at'}
+            for event in events[:cls.MAX_EVENTS]
+        ]
+    
+    @classmethod
+    def _months(cls, range_start: datetime, range_end: datetime):
+        """الأشهر (بالتوقيت المحلي) التي تغطيها الفترة"""
+        month = timezone.localtime(range_start).date().replace(day=1)
+        last = timezone.localtime(range_end - timedelta(microseconds=1)).date().replace(day=1)
+        while month <= last:
+            yield month
+            month = (month + timedelta(days=32)).replace(day=1)
+    
+    @classmethod
+    def _get_month_bucket(cls, month) -> List[Dict[str, Any]]:
+        key = cls.CACHE_BUCKET_KEY.format(generation=cls._generation(), month=f"{month:%Y-%m}")
+        cache = cls.cache()
+        bucket = cache.get(key)
+        if bucket is None:
+            bucket = cls._build_month_bucket(month)
+            cache.set(key, bucket, cls.CACHE_TIMEOUT)
+        return bucket
+    
+    @classmethod
+    def _build_month_bucket(cls, month) -> List[Dict[str, Any]]:
+        month_start = cls._local_midnight(month)
+        month_end = cls._local_midnight((month + timedelta(days=32)).replace(day=1))
+        rows = ScheduledNotification.objects.filter(
+            scheduled_datetime__gte=month_start,
+            scheduled_datetime__lt=month_end,
+        ).order_by('scheduled_datetime').values(*cls.FIELDS)
+        
+        url_template = cls._detail_url_template()
+        content_types = dict(ScheduledNotification._meta.get_field('content_type').flatchoices)
+        statuses = dict(ScheduledNotification.Status.choices)
+        target_types = dict(ScheduledNotification.TargetType.choices)
+        
+        return [
+            cls._event(
+                event_id=str(row['id']),
+                title=row['title'],
+                at=row['scheduled_datetime'],
+                status=row['status'],
+                extended_props={
+                    'type': str(content_types.get(row['content_type'], row['content_type'])),
+                    'status': str(statuses.get(row['status'], row['status'])),
+                    'target': str(target_types.get(row['target_type'], row['target_type'])),
+                },
+                url=url_template.replace(cls._URL_PLACEHOLDER, str(row['id'])),
+            )
+            for row in rows
+        ]
+    
+    @classmethod
+    def get_virtual_events(cls, range_start: datetime, range_end: datetime) -> List[Dict[str, Any]]:
+        """التكرارات المستقبلية المحسوبة من قاعدة التكرار دون حفظها في قاعدة البيانات"""
+        window_start = max(range_start, timezone.now())
+        if window_start >= range_end:
+            return []
+        
+        parents = ScheduledNotification.objects.filter(
+            parent_notification__isnull=True,
+            is_enabled=True,
+            scheduled_datetime__lt=range_end,
+        ).exclude(
+            recurrence_type=ScheduledNotification.RecurrenceType.ONE_TIME,
+        ).exclude(
+            status=ScheduledNotification.Status.CANCELLED,
+        )
+        
+        url_template = cls._detail_url_template()
+        scheduled = ScheduledNotification.Status.SCHEDULED
+        events = []
+        for parent in parents:
+            materialized = set(parent.child_notifications.filter(
+                scheduled_datetime__gt=window_start,
+                scheduled_datetime__lt=range_end,
+            ).values_list('scheduled_datetime', flat=True))
+            for occurrence in SchedulingService.get_occurrences(parent, window_start, range_end):
+                if occurrence in materialized or occurrence >= range_end:
+                    continue
+                events.append(cls._event(
+                    event_id=f"{parent.id}:{occurrence:%Y%m%d%H%M}",
+                    title=parent.title,
+                    at=occurrence,
+                    status=scheduled,
+                    extended_props={
+                        'type': parent.get_content_type_display(),
+                        'status': str(scheduled.label),
+                        'target': parent.get_target_type_display(),
+                        'virtual': True,
+                    },
+                    url=url_template.replace(cls._URL_PLACEHOLDER, str(parent.id)),
+                ))
+        return events
+    
+    @classmethod
+    def _event(cls, event_id, title, at, status, extended_props, url) -> Dict[str, Any]:
+        color = cls.STATUS_COLORS.get(status, '#6c757d')
+        return {
+            'id': event_id,
+            'title': title,
+            'start': at.isoformat(),
+            'end': (at + cls.EVENT_DURATION).isoformat(),
+            'backgroundColor': color,
+            'borderColor': color,
+            'textColor': '#fff',
+            'extendedProps': extended_props,
+            'url': url,
+            '_at': at,
+        }
+    
+    @classmethod
+    def _detail_url_template(cls) -> str:
+        return reverse('notifications_system:detail', kwargs={'pk': cls._URL_PLACEHOLDER})
+    
+    # ==================== Invalidation ====================
+    
+    @classmethod
+    def cache(cls):
+        return caches[cls.CACHE_ALIAS]
+    
+    @classmethod
+    def _generation(cls) -> int:
+        cache = cls.cache()
+        generation = cache.get(cls.CACHE_GENERATION_KEY)
+        if generation is None:
+            generation = 1
+            cache.add(cls.CACHE_GENERATION_KEY, generation, None)
+        return generation
+    
+    @classmethod
+    def invalidate(cls):
+        """إبطال جميع أشهر التقويم المخزنة (زيادة رقم الجيل) بعد نجاح المعاملة الحالية"""
+        # الزيادة قبل الالتزام تسمح لطلب آخر بإعادة بناء الشهر من البيانات القديمة وتخزينه تحت الجيل الجديد
+        transaction.on_commit(cls._bump_generation)
+    
+    @classmethod
+    def _bump_generation(cls):
+        cache = cls.cache()
+        try:
+            cache.incr(cls.CACHE_GENERATION_KEY)
+        except ValueError:
+            cache.set(cls.CACHE_GENERATION_KEY, 2, None)
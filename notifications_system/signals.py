@@ -3,7 +3,7 @@
 Signals for Notification System
 """
 import logging
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
@@ -20,6 +20,14 @@ def log_notification_create(sender, instance, created, **kwargs):
         pass
 
 
+@receiver(post_save, sender=ScheduledNotification)
+@receiver(post_delete, sender=ScheduledNotification)
+def invalidate_calendar_cache(sender, instance, **kwargs):
+    """إبطال أشهر التقويم المخزنة مؤقتاً"""
+    from .services import CalendarFeedService
+    CalendarFeedService.invalidate()
+
+
 @receiver(pre_delete, sender=ScheduledNotification)
 def log_notification_delete(sender, instance, **kwargs):
     """تسجيل حذف الإشعار"""
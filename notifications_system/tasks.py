@@ -2,7 +2,6 @@
 مهام النظام - Tasks for Notification System
 """
 import logging
-from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
@@ -43,24 +42,21 @@ def send_scheduled_notification(notification_id: str, immediate: bool = False):
 
 
 def process_pending_notifications(batch_size: int = 50):
-    """معالجة الإشعارات المعلقة"""
-    from .services import SchedulingService
+    """معالجة الإشعارات المعلقة (بحجز آمن يمنع التكرار مع العمال الآخرين)"""
+    from .worker import NotificationWorker, default_worker_id
     
     try:
-        pending = SchedulingService.get_pending_notifications(limit=batch_size)
-        logger.info(f"Found {len(pending)} pending notifications")
-        
-        results = []
-        for notification in pending:
-            result = send_scheduled_notification(str(notification.id))
-            results.append(result)
-        
-        successful = sum(1 for r in results if r['status'] == 'completed')
+        worker = NotificationWorker(worker_id=default_worker_id('celery'), batch_size=batch_size)
+        try:
+            processed = worker.run_once()
+        finally:
+            worker.shutdown()
+        logger.info(f"Processed {processed} pending notifications")
         
         return {
             'status': 'completed',
-            'processed': len(pending),
-            'successful': successful,
+            'processed': processed,
+            'successful': worker.stats['dispatched'],
         }
         
     except Exception as e:
@@ -116,21 +112,41 @@ def generate_recurring_instances(parent_notification_id: str):
         return {'status': 'error', 'error': str(e)}
 
 
-def cleanup_old_dispatch_logs(days: int = 90):
-    """تنظيف السجلات القديمة"""
-    from datetime import timedelta
-    from .models import NotificationDispatchLog
+def materialize_recurring_notifications(horizon_days: int = None):
+    """
+    إكمال الأفق المتدحرج لنسخ الإشعارات المتكررة (يدوياً)
+    
+    الإكمال الدوري يتولاه عامل الإشعارات (run_notification_worker) وحده، فلا جدولة له في Celery Beat.
+    """
+    from .services import SchedulingService
+    
+    try:
+        created = SchedulingService.top_up_recurring_instances(horizon_days=horizon_days)
+        logger.info(f"Materialized {created} recurring notification instances")
+        return {'status': 'completed', 'instances_created': created}
+        
+    except Exception as e:
+        logger.exception(f"Error materializing recurring notifications: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+
+def cleanup_old_dispatch_logs(days: int = 90, archive: bool = None):
+    """تنظيف السجلات القديمة على دفعات مع الأرشفة"""
+    from .retention import DispatchLogRetention
+    from .services import get_notification_setting
     
     try:
-        cutoff_date = timezone.now() - timedelta(days=days)
+        if archive is None:
+            archive = get_notification_setting('ARCHIVE_DISPATCH_LOGS', True)
         
-        deleted, _ = NotificationDispatchLog.objects.filter(
-            status=NotificationDispatchLog.Status.SUCCESS,
-            created_at__lt=cutoff_date
-        ).delete()
+        results = DispatchLogRetention(
+            older_than_days=days,
+            chunk_size=get_notification_setting('CLEANUP_CHUNK_SIZE', 1000),
+            archive=archive,
+        ).run()
         
-        logger.info(f"Cleaned up {deleted} old dispatch logs")
-        return {'status': 'completed', 'deleted': deleted}
+        logger.info(f"Cleaned up {results['deleted']} old dispatch logs")
+        return {'status': 'completed', **results}
         
     except Exception as e:
         logger.exception(f"Error cleaning up logs: {e}")
@@ -0,0 +1,189 @@
+import gzip
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import DeliverySummary, NotificationDispatchLog, ScheduledNotification, WebhookEndpoint
+from .retention import DispatchLogRetention
+from .services import NotificationDispatchService, SchedulingService
+
+User = get_user_model()
+
+
+class RecurrenceTests(TestCase):
+    """نسخ التكرار: نسخة واحدة لكل (أصل، موعد) مهما تكرر الإكمال"""
+
+    def setUp(self):
+        self.parent = ScheduledNotification.objects.create(
+            title='ورد يومي',
+            message='تذكير بالورد',
+            scheduled_datetime=timezone.now().replace(microsecond=0) - timedelta(days=1),
+            recurrence_type=ScheduledNotification.RecurrenceType.DAILY,
+            target_type=ScheduledNotification.TargetType.ALL_STUDENTS,
+        )
+
+    def occurrences(self):
+        return list(self.parent.child_notifications.values_list('scheduled_datetime', flat=True))
+
+    def test_repeated_top_up_creates_each_occurrence_once(self):
+        created = SchedulingService.create_recurring_instances(self.parent, horizon_days=7)
+        self.assertEqual(len(created), 7)
+        self.assertEqual(SchedulingService.create_recurring_instances(self.parent, horizon_days=7), [])
+        self.assertEqual(SchedulingService.top_up_recurring_instances(horizon_days=7), 0)
+        occurrences = self.occurrences()
+        self.assertEqual(len(occurrences), 7)
+        self.assertEqual(len(set(occurrences)), 7)
+
+    def test_concurrent_top_up_skips_taken_occurrences(self):
+        get_occurrences = SchedulingService.get_occurrences
+
+        def racing(parent, start, end):
+            occurrences = get_occurrences(parent, start, end)
+            # عملية أخرى أنشأت الموعد الأول بعد فحص الموجود وقبل الإدراج
+            SchedulingService._build_instance(parent, occurrences[0]).save()
+            return occurrences
+
+        with mock.patch.object(SchedulingService, 'get_occurrences', side_effect=racing):
+            created = SchedulingService.create_recurring_instances(self.parent, horizon_days=7)
+
+        self.assertEqual(len(created), 6)
+        self.assertTrue(all(instance.pk for instance in created))
+        self.assertEqual(len(set(self.occurrences())), 7)
+        self.assertEqual(len(self.occurrences()), 7)
+
+    def test_duplicate_occurrence_is_rejected(self):
+        occurrence = self.parent.scheduled_datetime + timedelta(days=1)
+        SchedulingService._build_instance(self.parent, occurrence).save()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SchedulingService._build_instance(self.parent, occurrence).save()
+
+
+class DispatchLogRetentionTests(TestCase):
+    """الأرشفة قبل الحذف، وإعادة الدفعة بعد فشل الحذف دون نسخة ثانية"""
+
+    def setUp(self):
+        self.archive_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        recipient = User.objects.create(username='retention_recipient')
+        notification = ScheduledNotification.objects.create(
+            title='إشعار قديم', message='رسالة', scheduled_datetime=timezone.now(),
+        )
+        NotificationDispatchLog.objects.bulk_create([
+            NotificationDispatchLog(
+                notification=notification,
+                recipient=recipient,
+                webhook_url='https://hooks.example.com/notify',
+                payload={'n': i},
+                status=NotificationDispatchLog.Status.SUCCESS,
+                attempt_count=1,
+            )
+            for i in range(5)
+        ])
+        old = timezone.now() - timedelta(days=120)
+        for offset, log in enumerate(NotificationDispatchLog.objects.order_by('pk')):
+            NotificationDispatchLog.objects.filter(pk=log.pk).update(created_at=old + timedelta(minutes=offset))
+
+    def retention(self):
+        return DispatchLogRetention(
+            older_than_days=90, chunk_size=2, pause_seconds=0, archive_dir=self.archive_dir,
+        )
+
+    def archives(self):
+        return sorted(self.archive_dir.rglob('*.ndjson.gz'))
+
+    def archived_lines(self):
+        lines = 0
+        for path in self.archives():
+            with gzip.open(path, 'rt', encoding='utf-8') as archive_file:
+                lines += sum(1 for _ in archive_file)
+        return lines
+
+    def test_archives_then_deletes_in_chunks(self):
+        results = self.retention().run()
+        self.assertEqual(results, {'deleted': 5, 'archived': 5, 'chunks': 3})
+        self.assertFalse(NotificationDispatchLog.objects.exists())
+        self.assertEqual(len(self.archives()), 3)
+        self.assertEqual(self.archived_lines(), 5)
+        self.assertFalse(list(self.archive_dir.rglob('*.partial')))
+        summary = DeliverySummary.objects.get()
+        self.assertEqual((summary.count, summary.total_attempts), (5, 5))
+
+    def test_archive_failure_deletes_nothing(self):
+        retention = self.retention()
+        with mock.patch.object(retention, '_archive', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                retention.run()
+        self.assertEqual(NotificationDispatchLog.objects.count(), 5)
+
+    def test_failed_delete_rewrites_the_same_archive(self):
+        retention = self.retention()
+        with mock.patch.object(retention, '_roll_up', side_effect=IntegrityError('locked')):
+            with self.assertRaises(IntegrityError):
+                retention.run()
+        self.assertEqual(NotificationDispatchLog.objects.count(), 5)
+        first_archives = self.archives()
+        self.assertEqual(len(first_archives), 1)
+
+        self.retention().run()
+        self.assertFalse(NotificationDispatchLog.objects.exists())
+        self.assertEqual(len(self.archives()), 3)
+        self.assertIn(first_archives[0], self.archives())
+        self.assertEqual(self.archived_lines(), 5)
+
+
+class RateLimitBudgetTests(TestCase):
+    """استجابات 429 لا تستهلك المحاولات حتى نفاد حد إعادة المحاولة"""
+
+    def setUp(self):
+        self.endpoint = WebhookEndpoint.objects.create(name='primary', url='https://hooks.example.com/notify')
+        recipient = User.objects.create(username='rate_limited_recipient')
+        notification = ScheduledNotification.objects.create(
+            title='إشعار', message='رسالة', scheduled_datetime=timezone.now(),
+        )
+        self.log = NotificationDispatchLog.objects.create(
+            notification=notification,
+            recipient=recipient,
+            webhook_url=self.endpoint.url,
+            payload={'title': 'إشعار'},
+        )
+        self.service = NotificationDispatchService(endpoints=[self.endpoint])
+
+    @staticmethod
+    def response(status_code, retry_after=None):
+        headers = {'Retry-After': retry_after} if retry_after is not None else {}
+        return SimpleNamespace(status_code=status_code, text='', headers=headers)
+
+    def deliver(self, responses):
+        with mock.patch.object(self.service, '_make_http_request', side_effect=responses) as request:
+            self.service._deliver(self.log, self.service.get_router(), self.log.payload)
+        return request.call_count
+
+    def test_rate_limited_retries_do_not_consume_attempts(self):
+        calls = self.deliver([self.response(429, '0'), self.response(429, '0'), self.response(200)])
+        self.assertEqual(calls, 3)
+        self.assertEqual(self.log.status, NotificationDispatchLog.Status.SUCCESS)
+        self.assertEqual(self.log.attempt_count, 1)
+
+    def test_exhausted_budget_fails_with_attempts_left(self):
+        budget = NotificationDispatchService.MAX_RATE_LIMITED_RETRIES
+        calls = self.deliver([self.response(429, '0')] * (budget + 1))
+        self.assertEqual(calls, budget + 1)
+        self.assertEqual(self.log.status, NotificationDispatchLog.Status.FAILED)
+        self.assertEqual(self.log.attempt_count, 0)
+        self.assertTrue(self.log.error_message.startswith(f'Rate limited {budget + 1} times'))
+
+        # المحاولات غير المستهلكة تجعل السجل ضمن إعادة المحاولة لاحقاً
+        self.log.save()
+        with mock.patch.object(self.service, '_make_http_request', return_value=self.response(200)):
+            results = self.service.retry_failed_dispatches(self.log.notification)
+        self.assertEqual(results, {'retried': 1, 'success': 1, 'failed': 0})
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.status, NotificationDispatchLog.Status.SUCCESS)
@@ -3,7 +3,7 @@
 Dashboard Views for Notification System
 """
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import (
     ListView, CreateView, UpdateView, DetailView, DeleteView, View, TemplateView
@@ -11,7 +11,7 @@ from django.views.generic import (
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.http import JsonResponse
-from django.urls import reverse_lazy, reverse
+from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Q, Count
@@ -30,7 +30,7 @@ from .forms import (
     QuickSendForm,
     NotificationFilterForm,
 )
-from .services import SchedulingService, NotificationDispatchService
+from .services import SchedulingService, NotificationDispatchService, CalendarFeedService
 from .tasks import send_scheduled_notification
 
 
@@ -81,66 +81,11 @@ class NotificationCalendarDataView(LoginRequiredMixin, AdminRequiredMixin, View)
     """بيانات التقويم (JSON)"""
     
     def get(self, request):
-        start = request.GET.get('start')
-        end = request.GET.get('end')
-        
-        queryset = ScheduledNotification.objects.all()
-        
-        if start and end:
-            # Parse ISO format dates (handle timezone offset)
-            from datetime import datetime
-            try:
-                # Handle both ISO format with timezone and simple date format
-                if 'T' in start:
-                    start_date = datetime.fromisoformat(start.replace('Z', '+00:00')).date()
-                else:
-                    start_date = datetime.strptime(start, '%Y-%m-%d').date()
-                
-                if 'T' in end:
-                    end_date = datetime.fromisoformat(end.replace('Z', '+00:00')).date()
-                else:
-                    end_date = datetime.strptime(end, '%Y-%m-%d').date()
-                
-                queryset = queryset.filter(
-                    scheduled_datetime__date__range=[start_date, end_date]
-                )
-            except (ValueError, TypeError):
-                # If parsing fails, return all notifications
-                pass
-        
-        events = []
-        for notification in queryset:
-            # تحديد اللون حسب الحالة
-            color = self._get_event_color(notification)
-            
-            events.append({
-                'id': str(notification.id),
-                'title': notification.title,
-                'start': notification.scheduled_datetime.isoformat(),
-                'end': (notification.scheduled_datetime + timedelta(minutes=30)).isoformat(),
-                'backgroundColor': color,
-                'borderColor': color,
-                'textColor': '#fff',
-                'extendedProps': {
-                    'type': notification.get_content_type_display(),
-                    'status': notification.get_status_display(),
-                    'target': notification.get_target_type_display(),
-                },
-                'url': reverse('notifications_system:detail', kwargs={'pk': notification.pk}),
-            })
-        
+        events = CalendarFeedService.get_events(
+            start=request.GET.get('start'),
+            end=request.GET.get('end'),
+        )
         return JsonResponse(events, safe=False)
-    
-    def _get_event_color(self, notification):
-        colors = {
-            ScheduledNotification.Status.DRAFT: '#6c757d',
-            ScheduledNotification.Status.SCHEDULED: '#2563eb',
-            ScheduledNotification.Status.SENDING: '#f59e0b',
-            ScheduledNotification.Status.SENT: '#10b981',
-            ScheduledNotification.Status.FAILED: '#ef4444',
-            ScheduledNotification.Status.CANCELLED: '#94a3b8',
-        }
-        return colors.get(notification.status, '#6c757d')
 
 
 # ==================== List Views ====================
@@ -227,10 +172,9 @@ class ScheduledNotificationCreateView(LoginRequiredMixin, AdminRequiredMixin, Cr
             action=NotificationAuditLog.ActionType.CREATED
         )
         
-        # إذا كان متكرر، إنشاء النسخ الفرعية
+        # إذا كان متكرر، إنشاء نسخ الأيام القادمة فقط (تُكمل دورياً)
         if self.object.recurrence_type != ScheduledNotification.RecurrenceType.ONE_TIME:
-            from .tasks import generate_recurring_instances
-            generate_recurring_instances.delay(str(self.object.id))
+            SchedulingService.create_recurring_instances(self.object)
             messages.info(
                 self.request,
                 _('تم إنشاء الإشعار وسيتم إنشاء النسخ المتكررة')
@@ -0,0 +1,324 @@
+"""
+عامل الإشعارات المستقل - بديل عن خيوط الخلفية داخل gunicorn
+Durable lease-based notification worker (no Redis/Celery required)
+
+يعمل كعملية مستقلة عبر أمر الإدارة run_notification_worker، ويحجز الإشعارات
+المستحقة بحجز مؤقت (claimed_by / lease_until) بحيث يمكن تشغيل أكثر من عامل بأمان.
+لكل مسار أولوية (عاجل، عادي، جماعي) مجموعة خيوط مستقلة، فلا ينتظر التذكير العاجل
+خلف إشعار جماعي كبير.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+from django.core.cache import caches
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from .models import ScheduledNotification
+from .services import SchedulingService, NotificationDispatchService, get_notification_setting
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id(prefix: str = 'worker') -> str:
+    """معرف فريد للعامل: النوع:المضيف:رقم العملية"""
+    return f"{prefix}:{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseHeartbeat:
+    """
+    تمديد حجز إشعار من خيط مستقل كل ثلث مدة الحجز طوال الإرسال
+
+    الدفعة الواحدة قد تطول أكثر من مدة الحجز (مهلات الطلبات وانتظار إعادة المحاولة)،
+    لذلك لا يُربط التمديد بانتهاء الدفعات. إذا رُفض التمديد (حجزه عامل آخر) أو تعذر
+    حتى اقتراب انتهاء الحجز يُرفع lost فيتوقف الإرسال قبل التسليم التالي.
+    """
+
+    def __init__(self, notification: ScheduledNotification, worker_id: str, lease_seconds: int):
+        self.notification = notification
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = max(lease_seconds / 3, 1)
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'LeaseHeartbeat':
+        self._thread = threading.Thread(
+            target=self._run, name=f"lease-heartbeat-{self.notification.pk}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        last_renewed = time.monotonic()
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    renewed = SchedulingService.renew_lease(self.notification, self.worker_id, self.lease_seconds)
+                except Exception as e:
+                    logger.warning(f"Lease renewal for {self.notification.pk} failed: {e}")
+                    # الحجز السابق ما زال سارياً حتى اقتراب انتهائه
+                    renewed = None if time.monotonic() - last_renewed < self.lease_seconds - self.interval else False
+                if renewed:
+                    last_renewed = time.monotonic()
+                elif renewed is False:
+                    logger.error(f"Worker {self.worker_id} lost lease on notification {self.notification.pk}")
+                    self.lost.set()
+                    return
+        finally:
+            connections.close_all()
+
+
+class NotificationWorker:
+    """حلقة العامل: حجز ← إرسال ← تحرير، مع عدادات الإنتاجية"""
+
+    STATS_CACHE_ALIAS = 'shared'
+    STATS_CACHE_KEY = 'notifications_worker:{worker_id}'
+    STATS_CACHE_TIMEOUT = 300
+    RECURRENCE_TOP_UP_INTERVAL = 3600
+    RECURRENCE_TOP_UP_KEY = 'notifications_worker:recurrence_top_up'
+    DEFAULT_LANE_CONCURRENCY = {'urgent': 2, 'normal': 2, 'bulk': 1}
+
+    def __init__(self, worker_id: Optional[str] = None, batch_size: int = 10,
+                 lease_seconds: int = 300, poll_interval: float = 5.0):
+        self.worker_id = worker_id or default_worker_id()
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.dispatch_service = NotificationDispatchService()
+        self._stop = threading.Event()
+        self._last_top_up = None
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'started_at': timezone.now(),
+            'claimed': 0,
+            'dispatched': 0,
+            'failed': 0,
+            'errors': 0,
+            'released': 0,
+            'instances_materialized': 0,
+            'deliveries_success': 0,
+            'deliveries_failed': 0,
+            'lease_lost': 0,
+        }
+
+        concurrency = {**self.DEFAULT_LANE_CONCURRENCY, **get_notification_setting('LANE_CONCURRENCY', {})}
+        self.lane_sizes = {
+            priority: max(concurrency[priority.name.lower()], 1)
+            for priority in ScheduledNotification.Priority
+        }
+        self.lanes = {
+            priority: ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"notification-{priority.name.lower()}")
+            for priority, size in self.lane_sizes.items()
+        }
+        self._in_flight = {priority: set() for priority in self.lanes}
+
+    # ==================== Control ====================
+
+    def request_stop(self, *args):
+        """إيقاف آمن: إنهاء الإشعارات الجارية ثم التوقف (يصلح كمعالج إشارة)"""
+        if not self._stop.is_set():
+            logger.info(f"Worker {self.worker_id} stopping after current notifications")
+        self._stop.set()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop.is_set()
+
+    def run(self, max_iterations: Optional[int] = None):
+        """الحلقة الرئيسية حتى طلب الإيقاف"""
+        logger.info(f"Notification worker {self.worker_id} started")
+        iterations = 0
+        while not self.stopping:
+            close_old_connections()
+            try:
+                submitted = self.run_once(wait_for_completion=False)
+            except Exception as e:
+                logger.exception(f"Worker {self.worker_id} loop error: {e}")
+                self._bump('errors')
+                submitted = 0
+            self.publish_stats()
+
+            iterations += 1
+            if max_iterations and iterations >= max_iterations:
+                break
+            if not submitted:
+                in_flight = set().union(*self._in_flight.values())
+                if in_flight:
+                    # انتظار تحرر مكان في أحد المسارات
+                    wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self._stop.wait(self.poll_interval)
+
+        self.shutdown()
+        close_old_connections()
+        self.publish_stats()
+        logger.info(f"Notification worker {self.worker_id} stopped: {self.format_stats()}")
+
+    def run_once(self, wait_for_completion: bool = True) -> int:
+        """
+        دورة واحدة: حجز ما يتسع له كل مسار (العاجل أولاً) وتوزيعه على خيوط المسار
+
+        عند wait_for_completion تُملأ المسارات كلما تحرر مكان حتى استنفاد batch_size،
+        ويعيد عدد الإشعارات المعالجة. وإلا يعيد عدد ما بدأت معالجته دون انتظار.
+        """
+        self._maybe_top_up_recurrences()
+        if not wait_for_completion:
+            return len(self._fill_lanes(self.batch_size)[0])
+
+        budget = self.batch_size
+        submitted = []
+        while True:
+            started, claimed = self._fill_lanes(budget)
+            budget -= claimed
+            submitted.extend(started)
+            in_flight = set().union(*self._in_flight.values())
+            if not in_flight:
+                break
+            wait(in_flight, return_when=FIRST_COMPLETED)
+        return sum(1 for future in submitted if future.result())
+
+    def _fill_lanes(self, budget: int):
+        """حجز إشعارات بقدر المكان الشاغر في كل مسار. يعيد (المهام المبدوءة، عدد المحجوز)"""
+        started = []
+        claimed_total = 0
+        for priority in ScheduledNotification.Priority:
+            lane = self._in_flight[priority]
+            lane.difference_update([future for future in lane if future.done()])
+            capacity = min(self.lane_sizes[priority] - len(lane), budget - claimed_total)
+            if capacity <= 0 or self.stopping:
+                continue
+
+            claimed = SchedulingService.claim_pending_notifications(
+                worker_id=self.worker_id,
+                limit=capacity,
+                lease_seconds=self.lease_seconds,
+                priority=priority,
+            )
+            self._bump('claimed', len(claimed))
+            claimed_total += len(claimed)
+            for notification in claimed:
+                if self.stopping:
+                    # تحرير ما لم يُعالج ليلتقطه عامل آخر فوراً
+                    SchedulingService.release_lease(notification, self.worker_id)
+                    self._bump('released')
+                    continue
+                future = self.lanes[priority].submit(self._process_in_thread, notification)
+                lane.add(future)
+                started.append(future)
+        return started, claimed_total
+
+    def shutdown(self):
+        """انتظار انتهاء الإشعارات الجارية وإيقاف خيوط المسارات"""
+        for executor in self.lanes.values():
+            executor.shutdown(wait=True)
+
+    # ==================== Processing ====================
+
+    def _maybe_top_up_recurrences(self):
+        """
+        إكمال أفق الإشعارات المتكررة مرة كل ساعة، من عامل واحد فقط
+
+        مفتاح في الكاش المشترك يحجز الدورة لأول عامل يصلها؛ والقيد الفريد على
+        (الأصل، الموعد) يمنع النسخ المكررة إن تزامن عاملان رغم ذلك.
+        """
+        now = timezone.now()
+        if self._last_top_up and (now - self._last_top_up).total_seconds() < self.RECURRENCE_TOP_UP_INTERVAL:
+            return
+        self._last_top_up = now
+        cache = caches[self.STATS_CACHE_ALIAS]
+        if not cache.add(self.RECURRENCE_TOP_UP_KEY, self.worker_id, self.RECURRENCE_TOP_UP_INTERVAL):
+            return
+        self._bump('instances_materialized', SchedulingService.top_up_recurring_instances())
+
+    def _process_in_thread(self, notification: ScheduledNotification) -> bool:
+        try:
+            return self._process(notification)
+        finally:
+            connections.close_all()
+
+    def _process(self, notification: ScheduledNotification) -> bool:
+        """إرسال إشعار محجوز. يعيد False إذا بقي الإشعار مجدولاً (لا مستلمين أو لا نقاط نهاية)"""
+        # الإشعار العالق في "جاري الإرسال" من عامل متوقف يعاد إرساله مباشرة
+        recovering = notification.status == ScheduledNotification.Status.SENDING
+        if recovering:
+            logger.warning(f"Recovering notification {notification.id} from expired lease")
+
+        deferred = False
+        try:
+            with LeaseHeartbeat(notification, self.worker_id, self.lease_seconds) as heartbeat:
+                results = self.dispatch_service.dispatch_notification(
+                    notification=notification,
+                    immediate=recovering,
+                    abort=heartbeat.lost,
+                )
+            self._bump('deliveries_success', results['success'])
+            self._bump('deliveries_failed', results['failed'])
+            if results.get('aborted'):
+                self._bump('lease_lost')
+                return True
+            if notification.status == ScheduledNotification.Status.SCHEDULED:
+                deferred = True
+                return False
+            self._bump('failed' if notification.status == ScheduledNotification.Status.FAILED else 'dispatched')
+            return True
+        except Exception as e:
+            logger.exception(f"Worker {self.worker_id} failed to dispatch {notification.id}: {e}")
+            self._bump('errors')
+            return True
+        finally:
+            if deferred:
+                # إبقاء الحجز حتى الدورة القادمة بدلاً من إعادة حجزه فوراً
+                SchedulingService.renew_lease(notification, self.worker_id, self.poll_interval)
+            else:
+                SchedulingService.release_lease(notification, self.worker_id)
+
+    # ==================== Counters ====================
+
+    def _bump(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """لقطة من العدادات مع معدل الإنتاجية"""
+        uptime = max((timezone.now() - self.stats['started_at']).total_seconds(), 1e-6)
+        deliveries = self.stats['deliveries_success'] + self.stats['deliveries_failed']
+        return {
+            **self.stats,
+            'worker_id': self.worker_id,
+            'started_at': self.stats['started_at'].isoformat(),
+            'uptime_seconds': round(uptime, 1),
+            'notifications_per_minute': round((self.stats['dispatched'] + self.stats['failed']) * 60 / uptime, 2),
+            'deliveries_per_second': round(deliveries / uptime, 2),
+            'in_flight': {
+                priority.name.lower(): sum(1 for future in futures if not future.done())
+                for priority, futures in self._in_flight.items()
+            },
+        }
+
+    def publish_stats(self):
+        """نشر العدادات في الكاش المشترك لمراقبتها من خارج العملية"""
+        caches[self.STATS_CACHE_ALIAS].set(
+            self.STATS_CACHE_KEY.format(worker_id=self.worker_id),
+            self.snapshot(),
+            self.STATS_CACHE_TIMEOUT,
+        )
+
+    def format_stats(self) -> str:
+        data = self.snapshot()
+        return (
+            f"claimed={data['claimed']} dispatched={data['dispatched']} failed={data['failed']} "
+            f"errors={data['errors']} released={data['released']} "
+            f"deliveries={data['deliveries_success']}/{data['deliveries_success'] + data['deliveries_failed']} "
+            f"rate={data['deliveries_per_second']}/s"
+        )
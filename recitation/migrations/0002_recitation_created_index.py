@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recitation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recitationrecord',
+            index=models.Index(fields=['created_at', 'id'], name='recitation_created_idx'),
+        ),
+    ]
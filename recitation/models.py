@@ -79,6 +79,10 @@ class RecitationRecord(models.Model):
         verbose_name = _('سجل تسميع')
         verbose_name_plural = _('سجلات التسميع')
         ordering = ['-created_at']
+        indexes = [
+            # قائمة التسميعات في لوحة التحكم بالمؤشر
+            models.Index(fields=['created_at', 'id'], name='recitation_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.get_full_name()} - {self.surah_start.name_arabic}"
@@ -13,4 +13,4 @@ python manage.py collectstatic --noinput
 python manage.py migrate --noinput
 
 # Start Gunicorn
-exec gunicorn tartil.wsgi:application -c gunicorn.conf.py
+exec gunicorn tartil.asgi:application -c gunicorn.conf.py
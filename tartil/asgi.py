@@ -3,6 +3,11 @@ ASGI config for tartil project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+This is the production entry point (gunicorn with uvicorn workers, see
+deploy/gunicorn.service): sync views run in a thread pool, while the async
+notification stream (dashboard.live) keeps idle SSE connections on the event
+loop instead of holding a worker each.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -61,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.middleware.NotificationOutboxMiddleware',
 ]
 
 ROOT_URLCONF = 'tartil.urls'
@@ -80,6 +81,7 @@ TEMPLATES = [
                 'courses.context_processors.notifications_context',
                 'courses.context_processors.courses_context',
                 'dashboard.context_processors.dashboard_notifications',
+                'dashboard.context_processors.active_alerts',
                 'core.context_processors.site_settings',
             ],
         },
@@ -115,6 +117,16 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# المُجزّئ الأول هو المفضل؛ كلمات المرور المجزأة بغيره تُرقّى عند أول دخول ناجح
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'accounts.hashers.FirstLoginPBKDF2PasswordHasher',
+]
+
 # Internationalization - Arabic
 LANGUAGE_CODE = 'ar'
 TIME_ZONE = 'Asia/Riyadh'
@@ -196,7 +208,12 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    # كاش مشترك بين العمال (لقطة إحصائيات لوحة التحكم)
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SHARED_CACHE_DIR', str(BASE_DIR / 'cache')),
+    },
 }
 
 # إعدادات الملفات المرفوعة
@@ -240,8 +257,52 @@ NOTIFICATIONS_SETTINGS = {
     'RETRY_DELAY_SECONDS': [5, 15, 30],
     'BATCH_SIZE': 50,
     'CLEANUP_OLDER_THAN_DAYS': 90,
+    'CLEANUP_CHUNK_SIZE': 1000,  # عدد السجلات المحذوفة في كل دفعة
+    'ARCHIVE_DISPATCH_LOGS': True,  # أرشفة السجلات قبل حذفها
+    'ARCHIVE_DIR': BASE_DIR / 'archives' / 'dispatch_logs',
+    'LOAD_BALANCE_ENDPOINTS': False,  # توزيع الحمل الموزون بين نقاط النهاية من نفس النوع
+    'CIRCUIT_BREAKER_FAILURES': 3,  # عدد الفشل المتتالي لفتح الدائرة
+    'CIRCUIT_BREAKER_COOLDOWN_SECONDS': 60,
+    'RECURRENCE_HORIZON_DAYS': 7,  # عدد الأيام القادمة التي تُنشأ لها نسخ الإشعارات المتكررة
+    'SHARD_WORKERS': 4,  # عدد الخيوط لإرسال شرائح المستلمين للإشعار الكبير بالتوازي
+    'RESULT_FLUSH_SIZE': 25,  # عدد التسليمات بين كل كتابة لنتائج السجلات وإيصالاتها
+    'LANE_CONCURRENCY': {'urgent': 2, 'normal': 2, 'bulk': 1},  # عدد الإشعارات المتزامنة لكل مسار أولوية
 }
 
+# In-app Notification Outbox (accounts.outbox)
+NOTIFICATION_OUTBOX_BACKGROUND = os.getenv('NOTIFICATION_OUTBOX_BACKGROUND', 'False').lower() == 'true'  # الكتابة في خيط خلفي
+NOTIFICATION_OUTBOX_BATCH_SIZE = 500
+
+# Activity Log Buffer (accounts.activity)
+ACTIVITY_LOG_BUFFERED = os.getenv('ACTIVITY_LOG_BUFFERED', 'True').lower() == 'true'  # الكتابة المؤجلة على دفعات
+ACTIVITY_LOG_BUFFER_SIZE = 10000  # أقصى عدد سجلات معلقة قبل الإسقاط
+ACTIVITY_LOG_FLUSH_SIZE = 200
+ACTIVITY_LOG_FLUSH_INTERVAL = 2.0  # ثوانٍ
+# الأحداث التي تُسجل تلقائياً (login, logout, recitation, attendance)، مفصولة بفواصل؛ لا شيء افتراضياً
+ACTIVITY_LOG_EVENTS = [e.strip() for e in os.getenv('ACTIVITY_LOG_EVENTS', '').split(',') if e.strip()]
+
+# إحصائيات لوحة التحكم
+DASHBOARD_STATS_BACKGROUND_REFRESH = os.getenv('DASHBOARD_STATS_BACKGROUND_REFRESH', 'False').lower() == 'true'  # إعادة الحساب في خيط خلفي
+
+# تصدير التقارير
+EXPORT_BACKGROUND_THRESHOLD = 20000  # عدد الصفوف الذي يُنقل بعده التصدير إلى الخلفية
+# التنفيذ في خيط داخل عملية الويب بدلاً من run_export_worker (للتطوير فقط)
+EXPORT_RUN_IN_WEB = os.getenv('EXPORT_RUN_IN_WEB', str(DEBUG)).lower() == 'true'
+
+# تجهيز الحسابات بالجملة (accounts.provisioning)
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or None  # None = عدد الأنوية
+PROVISIONING_FAST_HASHER = os.getenv('PROVISIONING_FAST_HASHER', 'False').lower() == 'true'  # مُجزّئ أرخص يُرقّى عند أول دخول
+PROVISIONING_FAST_HASH_ITERATIONS = 10000
+
+# استيراد Excel في الخلفية (dashboard.importer)
+IMPORT_CHECKPOINT_ROWS = 500  # عدد الصفوف بين نقاط الحفظ (الإلغاء والاستئناف على حدودها)
+# التنفيذ في خيط داخل عملية الويب بدلاً من run_import_worker (للتطوير فقط)
+IMPORT_RUN_IN_WEB = os.getenv('IMPORT_RUN_IN_WEB', str(DEBUG)).lower() == 'true'
+
+# ترقيم قوائم لوحة التحكم بالمؤشر (dashboard.pagination)
+KEYSET_COUNT_LIMIT = 10000  # يتوقف العد عنده ويُعرض "أكثر من ..."
+KEYSET_COUNT_CACHE_TIMEOUT = 300  # مدة تخزين العدد لكل تصفية (ثوانٍ)
+
 # Site Settings
 SITE_NAME = 'إدارة الدورات القرآنية'
 SITE_LOGO = 'images/logo3_final.png'